@@ -1,6 +1,7 @@
-import json
 import logging
 from config import settings
+from utils.audit_store import AuditStore, new_run_id
+from utils.serialization import OutputWriter, read_document
 
 class AuditLoggerAgent:
     """
@@ -21,11 +22,13 @@ class AuditLoggerAgent:
         "Compliance Check"
     ]
 
-    def __init__(self, agent_id="AuditLogger01"):
+    def __init__(self, agent_id="AuditLogger01", run_id=None):
         self.agent_id = agent_id
         self.logger = logging.getLogger(self.agent_id)
         self.input_file = settings.UNIFIED_LOG_FILE
         self.output_file = settings.AUDIT_TRAIL_FILE
+        # Key of this run in the audit store; main passes the one kept in the checkpoint state
+        self.run_id = run_id or new_run_id()
 
     def _process_single_workflow(self, workflow):
         """Processes the logs for one workflow to create a summary."""
@@ -56,21 +59,35 @@ class AuditLoggerAgent:
             "final_status": overall_status
         }
 
+    def _record_in_store(self, audit_trails, unified_log):
+        """Appends this run to the SQLite audit store; the JSON export above stays authoritative on failure."""
+        store = AuditStore()
+        try:
+            counts = store.record_run(self.run_id, audit_trails,
+                                      unified_log if settings.AUDIT_STORE_UNIFIED_LOG else None)
+            self.logger.info(f"Audit store updated: run {self.run_id}, {counts['workflows']} workflows, "
+                             f"{counts['events']} events, {counts['log_records']} log records in '{store.db_path}'.")
+        except Exception as e:
+            self.logger.error(f"Failed to update audit store '{store.db_path}': {e}")
+
     def run(self):
         """Main execution method for the Audit Logger Agent."""
         self.logger.info("--- Agent execution started ---")
+        success = False
         try:
-            with open(self.input_file, "r") as f:
-                data = json.load(f)
+            data = read_document(self.input_file)
 
             audit_trails = []
             for workflow in data.get("workflows", []):
                 audit_trails.append(self._process_single_workflow(workflow))
 
-            with open(self.output_file, "w") as f:
-                json.dump(audit_trails, f, indent=4)
+            output_file = OutputWriter().write(self.output_file, audit_trails)
+
+            self.logger.info(f"Action successful. Audit trails for {len(audit_trails)} workflows written to '{output_file}'.")
+            success = True
 
-            self.logger.info(f"Action successful. Audit trails for {len(audit_trails)} workflows written to '{self.output_file}'.")
+            if settings.AUDIT_STORE_ENABLED:
+                self._record_in_store(audit_trails, data)
 
         except FileNotFoundError:
             self.logger.error(f"Critical data source not found: {self.input_file}. Terminating.")
@@ -78,3 +95,4 @@ class AuditLoggerAgent:
             self.logger.error(f"An unexpected error occurred: {e}")
 
         self.logger.info("--- Agent execution finished ---")
+        return success
@@ -9,45 +9,158 @@ Date: January 11, 2026
 Agent ID: ExposureAggregator01
 """
 
+import heapq
 import json
-import csv
 import logging
+import operator
 from datetime import datetime
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List
-from openai import AzureOpenAI
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from config import settings
+from utils.csv_index import read_keys
+from utils.dates import to_day
+from utils.fast_csv import iter_csv_partials, parse_csv
+from utils.fx import FxRateTable
+from utils.llm_gateway import get_gateway
+from utils.money import from_cents, to_cents
+from utils.schema import Quarantine, read_json_records
+from utils.serialization import OutputWriter, iter_records, write_csv
+from utils.spill import MemoryBudget, SpillingAggregator
+
+CUSTOMER_COLUMNS = {'CUSTOMER_ID': 'str', 'NAME': 'str', 'COUNTRY': 'str'}
+AR_COLUMNS = {'CUSTOMER_ID': 'str', 'AMOUNT': 'cents', 'STATUS': 'str', 'DUE_DATE': 'day'}
+
+# Foreign-currency buckets converted per convert_batch call
+FX_CONVERT_BATCH = 50_000
+
+
+def _reduce_customer_chunk(columns: Dict) -> Dict:
+    """Partial aggregate of customer_id_list.csv rows: customer -> name/country"""
+    return {customer_id: {'name': name, 'country': country}
+            for customer_id, name, country in zip(columns['CUSTOMER_ID'], columns['NAME'], columns['COUNTRY'])}
+
+
+def _merge_customer_chunks(first: Dict, second: Dict) -> Dict:
+    first.update(second)
+    return first
+
+
+def _reduce_ar_chunk(columns: Dict, fx_customers: frozenset = frozenset(), valuation_day: int = 0) -> Dict:
+    """
+    Partial aggregate of AR rows: per-customer totals in integer cents
+    (original currency) plus invoice counts. Amounts of `fx_customers` are
+    also summed per (customer, rate day), so each distinct date is converted
+    only once.
+    """
+    totals = {}
+    fx_buckets = {}
+    overdue = 0
+    for customer_id, cents, status, due_day in zip(columns['CUSTOMER_ID'], columns['AMOUNT'],
+                                                   columns['STATUS'], columns['DUE_DATE']):
+        totals[customer_id] = totals.get(customer_id, 0) + cents
+        if customer_id in fx_customers:
+            key = (customer_id, valuation_day or due_day)
+            fx_buckets[key] = fx_buckets.get(key, 0) + cents
+        if status == 'OVERDUE':
+            overdue += 1
+    return {'totals': totals, 'fx_buckets': fx_buckets, 'invoices': len(columns['CUSTOMER_ID']), 'overdue': overdue}
+
+
+def _merge_ar_chunks(first: Dict, second: Dict) -> Dict:
+    for field in ('totals', 'fx_buckets'):
+        merged = first[field]
+        for key, cents in second[field].items():
+            merged[key] = merged.get(key, 0) + cents
+    first['invoices'] += second['invoices']
+    first['overdue'] += second['overdue']
+    return first
+
+
+def _combine_exposure(first: List, second: List) -> List:
+    """Combine per-customer entries [open AR cents, name, country]; a later name/country wins"""
+    return [first[0] + second[0],
+            first[1] if second[1] is None else second[1],
+            first[2] if second[2] is None else second[2]]
+
+
+def _batches(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class _ExposureSummary:
+    """Customer count, total and largest exposures, accumulated while the report is produced"""
+    
+    TOP_N = 5
+    
+    def __init__(self):
+        self.customers = 0
+        self.total_cents = 0
+        self._top = []  # min-heap of (exposure cents, -position, row); earlier rows win ties
+    
+    def add(self, row: Dict, cents: int) -> None:
+        item = (cents, -self.customers, row)
+        if len(self._top) < self.TOP_N:
+            heapq.heappush(self._top, item)
+        elif item[:2] > self._top[0][:2]:
+            heapq.heapreplace(self._top, item)
+        self.customers += 1
+        self.total_cents += cents
+    
+    @property
+    def total_exposure(self) -> float:
+        return from_cents(self.total_cents)
+    
+    @property
+    def average_exposure(self) -> float:
+        return self.total_exposure / self.customers if self.customers else 0
+    
+    def top_customers(self) -> List[Dict]:
+        return [row for _, _, row in sorted(self._top, key=lambda item: item[:2], reverse=True)]
 
 
 class ExposureAggregatorAgent:
     """Exposure Aggregator Agent - Aggregates customer AR exposure data"""
     
-    def __init__(self, agent_id: str = "ExposureAggregator01"):
+    CSV_FIELDNAMES = ['customer_id', 'total_open_AR', 'currency', 'original_currency',
+                      'total_open_AR_original', 'validation_status', 'timestamp', 'agent_id']
+    
+    def __init__(self, agent_id: str = "ExposureAggregator01", customers: Optional[Iterable[str]] = None):
         self.agent_id = agent_id
+        # Targeted aggregation (e.g. a cluster shard): only these customers are reported
+        self.customers = set(customers) if customers else None
         self.timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
         self.logger = logging.getLogger(self.agent_id)
-        self.customers = {}
-        self.customer_names = {}
-        self.invoice_details = []
-        self.report_data = []
+        # With settings.MEMORY_BUDGET_MB, per-customer aggregates spill to disk above the budget
+        self.budget = MemoryBudget()
+        # customer -> [open AR in cents of the customer's billing currency, name, country]
+        self.exposure = SpillingAggregator("exposure", _combine_exposure, self.budget)
+        # "customer<TAB>rate day number" -> cents, for customers billed in another currency
+        self.fx_buckets = SpillingAggregator("fx_buckets", operator.add, self.budget)
+        self.customer_currency = {}
+        # Valid customer-list IDs; AR rows of other customers are quarantined
+        self.known_customers = set()
+        self.reporting_currency = settings.REPORTING_CURRENCY
+        self.fx = None
+        self.invoice_count = 0
+        self.overdue_count = 0
+        self.summary = None
+        self.output_data = []
+        self.writer = OutputWriter()
         
-        # Initialize Azure OpenAI client if configured
-        try:
-            if settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT:
-                self.llm_client = AzureOpenAI(
-                    api_key=settings.AZURE_OPENAI_API_KEY,
-                    api_version=settings.AZURE_OPENAI_API_VERSION,
-                    azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
-                )
-                self.engine = settings.AZURE_OPENAI_DEPLOYMENT_NAME
-                self.llm_enabled = True
-                self.logger.info("Azure OpenAI initialized successfully")
-            else:
-                self.llm_enabled = False
-                self.logger.warning("Azure OpenAI not configured")
-        except Exception as e:
-            self.logger.warning(f"Azure OpenAI initialization failed: {e}")
-            self.llm_enabled = False
+        # Shared LLM gateway (timeouts, retries, circuit breaker, metrics)
+        self.llm = get_gateway()
+        self.llm_enabled = self.llm.enabled
+        if self.llm_enabled:
+            self.logger.info("LLM gateway available for AI insights")
+        else:
+            self.logger.warning("Azure OpenAI not configured")
     
     def _perceive(self):
         """Perception phase: Load input data sources"""
@@ -57,6 +170,10 @@ class ExposureAggregatorAgent:
             self.logger.info(f"Loading customer list from {settings.CUSTOMER_LIST_FILE}...")
             self.load_customer_list(str(settings.CUSTOMER_LIST_FILE))
             
+            # Billing currency per customer
+            self.logger.info(f"Loading customer currencies from {settings.ERP_CUSTOMER_FILE}...")
+            self.load_customer_currencies(str(settings.ERP_CUSTOMER_FILE))
+            
             # Load JSON AR extract
             self.logger.info(f"Loading JSON AR extract from {settings.JSON_EXTRACT_FILE}...")
             self.load_json_data(str(settings.JSON_EXTRACT_FILE))
@@ -71,47 +188,79 @@ class ExposureAggregatorAgent:
             self.logger.error(f"Error in perception phase: {e}")
             return False
     
+    def _references(self) -> Dict:
+        return {'customers': self.known_customers}
+    
+    def _csv_partials(self, filepath: str, converters: Dict, reducer, merge) -> Iterable[Dict]:
+        """Validated whole-file aggregate, or chunk by chunk under a memory budget"""
+        quarantine = Quarantine(filepath)
+        if self.budget.enabled:
+            return iter_csv_partials(filepath, converters, reducer, quarantine=quarantine,
+                                     references=self._references())
+        return [parse_csv(filepath, converters, reducer, merge, quarantine=quarantine,
+                          references=self._references())]
+    
     def load_customer_list(self, filepath: str) -> None:
         """Load customer ID list with names and countries"""
-        with open(filepath, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                customer_id = row['CUSTOMER_ID']
-                self.customer_names[customer_id] = {
-                    'name': row['NAME'],
-                    'country': row['COUNTRY']
-                }
-                if customer_id not in self.customers:
-                    self.customers[customer_id] = 0.0
+        for customers in self._csv_partials(filepath, CUSTOMER_COLUMNS, _reduce_customer_chunk,
+                                            _merge_customer_chunks):
+            for customer_id, info in customers.items():
+                if self.customers is None or customer_id in self.customers:
+                    self.exposure.add(customer_id, [0, info['name'], info['country']])
+                self.known_customers.add(customer_id)
+    
+    def load_customer_currencies(self, filepath: str) -> None:
+        """Load each customer's billing currency from the ERP customer master"""
+        for customer in read_json_records(filepath, self._references()):
+            self.customer_currency[customer['customer_id']] = (customer.get('currency') or self.reporting_currency).upper()
+    
+    def _fx_customers(self) -> frozenset:
+        return frozenset(c for c, currency in self.customer_currency.items() if currency != self.reporting_currency)
+    
+    def _valuation_day(self) -> int:
+        """Day number of FX_VALUATION_DATE, or 0 to convert each invoice as of its due date"""
+        return to_day(settings.FX_VALUATION_DATE) if settings.FX_VALUATION_DATE else 0
     
     def load_json_data(self, filepath: str) -> None:
         """Load AR data from JSON extract"""
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-            
-        for record in data['records']:
+        records = read_json_records(filepath, self._references())
+        
+        fx_customers = self._fx_customers()
+        valuation_day = self._valuation_day()
+        for record in records:
             customer_id = record['CUSTOMER_ID']
-            amount = record['AMOUNT']
-            
-            if customer_id not in self.customers:
-                self.customers[customer_id] = 0.0
+            if self.customers is not None and customer_id not in self.customers:
+                continue
+            cents = record['AMOUNT']  # typed by the schema: cents and a day number
             
-            self.customers[customer_id] += amount
-            self.invoice_details.append(record)
+            self.exposure.add(customer_id, [cents, None, None])
+            if customer_id in fx_customers:
+                self.fx_buckets.add(f"{customer_id}\t{valuation_day or record['DUE_DATE']}", cents)
+            self.invoice_count += 1
+            if record.get('STATUS') == 'OVERDUE':
+                self.overdue_count += 1
     
     def load_csv_data(self, filepath: str) -> None:
-        """Load AR data from CSV records"""
-        with open(filepath, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                customer_id = row['CUSTOMER_ID']
-                amount = float(row['AMOUNT'])
-                
-                if customer_id not in self.customers:
-                    self.customers[customer_id] = 0.0
-                
-                self.customers[customer_id] += amount
-                self.invoice_details.append(dict(row))
+        """
+        Load AR data from CSV records (parsed in parallel chunks for large
+        files), or only the rows of the targeted customers via the offset index
+        """
+        reducer = partial(_reduce_ar_chunk, fx_customers=self._fx_customers(),
+                          valuation_day=self._valuation_day())
+        if self.customers is not None:
+            # Only part of the file is read, so the full run's quarantine file is left alone
+            results = [read_keys(filepath, 'CUSTOMER_ID', self.customers, AR_COLUMNS, reducer,
+                                 index_path=settings.CSV_RECORDS_INDEX_FILE,
+                                 quarantine=Quarantine(filepath, persist=False), references=self._references())]
+        else:
+            results = self._csv_partials(filepath, AR_COLUMNS, reducer, _merge_ar_chunks)
+        for result in results:
+            for customer_id, cents in result['totals'].items():
+                self.exposure.add(customer_id, [cents, None, None])
+            for (customer_id, rate_day), cents in result['fx_buckets'].items():
+                self.fx_buckets.add(f"{customer_id}\t{rate_day}", cents)
+            self.invoice_count += result['invoices']
+            self.overdue_count += result['overdue']
     
     def validate_record(self, customer_id: str, total_amount: float) -> str:
         """Validate aggregated record"""
@@ -119,104 +268,208 @@ class ExposureAggregatorAgent:
             return "PASS"
         return "FAIL"
     
-    def _reason(self) -> List[Dict]:
-        """Reasoning phase: Generate aggregated exposure report"""
-        self.logger.info("Reasoning phase: Aggregating exposure data...")
-        
-        report = []
-        for customer_id in sorted(self.customers.keys()):
-            total_amount = round(self.customers[customer_id], 2)
+    def iter_converted(self) -> Iterator[Tuple[str, float]]:
+        """
+        Yield (customer, open AR in the reporting currency) for foreign-currency
+        customers in customer order, converting their (customer, rate day)
+        buckets in batches. Customers whose currency has no rates are left out
+        (and fail validation).
+        """
+        missing = set()
+        converted_buckets = 0
+        current, total = None, 0.0
+        for batch in _batches(self.fx_buckets.items(), FX_CONVERT_BATCH):
+            if self.fx is None:
+                self.fx = FxRateTable.load()
+            known = set(self.fx.currencies())
+            keys, amounts = [], []
+            for key, cents in batch:
+                customer_id, rate_day = key.split('\t')
+                if self.customer_currency[customer_id] in known:
+                    keys.append((customer_id, int(rate_day)))
+                    amounts.append(from_cents(cents))
+                else:
+                    missing.add(self.customer_currency[customer_id])
+            converted = self.fx.convert_batch([self.customer_currency[customer_id] for customer_id, _ in keys],
+                                              [rate_day for _, rate_day in keys],
+                                              amounts, self.reporting_currency)
+            for (customer_id, _), amount in zip(keys, converted):
+                if customer_id != current:
+                    if current is not None:
+                        yield current, total
+                    current, total = customer_id, 0.0
+                total += amount
+            converted_buckets += len(keys)
+        if current is not None:
+            yield current, total
+        if missing:
+            self.logger.error(f"No FX rates for {', '.join(sorted(missing))} in {settings.FX_RATES_FILE}; "
+                              f"affected customers cannot be reported in {self.reporting_currency}.")
+        if converted_buckets:
+            self.logger.info(f"Converted {converted_buckets} customer/date buckets to {self.reporting_currency} "
+                             f"({self.fx.lookups} rate lookups, {self.fx.extrapolated} before the first rate)")
+    
+    def _iter_report(self) -> Iterator[Dict]:
+        """Report rows in customer order, merged with the converted foreign-currency totals"""
+        converted = self.iter_converted()
+        pending = next(converted, None)
+        for customer_id, (cents, name, country) in self.exposure.items():
+            original_amount = from_cents(cents)
+            original_currency = self.customer_currency.get(customer_id, self.reporting_currency)
+            if original_currency == self.reporting_currency:
+                total_cents = cents
+            else:
+                while pending is not None and pending[0] < customer_id:
+                    pending = next(converted, None)
+                matched = pending is not None and pending[0] == customer_id
+                total_cents = to_cents(round(pending[1], 2)) if matched else 0
+            total_amount = from_cents(total_cents)
             validation_status = self.validate_record(customer_id, total_amount)
             
-            customer_info = self.customer_names.get(customer_id, {})
-            
-            report.append({
+            row = {
                 'customer_id': customer_id,
-                'customer_name': customer_info.get('name', 'Unknown'),
-                'country': customer_info.get('country', 'Unknown'),
+                'customer_name': 'Unknown' if name is None else name,
+                'country': 'Unknown' if country is None else country,
                 'total_open_AR': total_amount,
-                'currency': 'USD',
+                'currency': self.reporting_currency,
+                'original_currency': original_currency,
+                'total_open_AR_original': original_amount,
                 'validation_status': validation_status,
                 'timestamp': self.timestamp,
                 'agent_id': self.agent_id
-            })
-        
-        self.report_data = report
-        
-        # Calculate statistics
-        total_exposure = sum(r['total_open_AR'] for r in report)
-        avg_exposure = total_exposure / len(report) if report else 0
+            }
+            self.summary.add(row, total_cents)
+            yield row
+        # Finish the conversion stream for its log lines
+        for _ in converted:
+            pass
+        self.exposure.close()
+        self.fx_buckets.close()
+    
+    def adopt_report(self, report: List[Dict], invoices: int = 0, overdue: int = 0) -> List[Dict]:
+        """Take over report rows aggregated elsewhere (e.g. by cluster workers) for _act and the AI insights"""
+        self.invoice_count = invoices
+        self.overdue_count = overdue
+        self.summary = _ExposureSummary()
+        for row in report:
+            self.summary.add(row, to_cents(row['total_open_AR']))
+        self._log_summary()
+        return report
+    
+    def _log_summary(self) -> None:
+        self.logger.info(f"Generated report for {self.summary.customers} customers")
+        self.logger.info(f"Total Exposure: {self.summary.total_exposure:,.2f} {self.reporting_currency}")
+        self.logger.info(f"Average Exposure: {self.summary.average_exposure:,.2f} {self.reporting_currency}")
+    
+    def _reason(self) -> Iterable[Dict]:
+        """Reasoning phase: Generate aggregated exposure report"""
+        self.logger.info("Reasoning phase: Aggregating exposure data...")
         
-        self.logger.info(f"Generated report for {len(report)} customers")
-        self.logger.info(f"Total Exposure: ${total_exposure:,.2f}")
-        self.logger.info(f"Average Exposure: ${avg_exposure:,.2f}")
+        self.summary = _ExposureSummary()
+        report = self._iter_report()
+        if self.budget.enabled:
+            # Streamed into the output by _act; statistics are logged once it is written
+            return report
         
+        report = list(report)
+        self._log_summary()
         return report
     
-    def _act(self, report: List[Dict]) -> bool:
+    def _act(self, report: Iterable[Dict], write_csv_copy: bool = True, generate_insights: bool = True) -> bool:
         """Action phase: Save exposure report to output files"""
         self.logger.info("Action phase: Saving exposure report...")
         try:
             # Save JSON report (for next agent)
             json_path = settings.EXPOSURE_REPORT_OUTPUT_FILE
-            Path(json_path).parent.mkdir(parents=True, exist_ok=True)
             
             # Format for next agent (risk scoring)
-            output_data = []
-            for row in report:
-                output_data.append({
-                    'customer_id': row['customer_id'],
-                    'total_open_AR': row['total_open_AR'],
-                    'currency': row['currency'],
-                    'validation_status': row['validation_status'],
-                    'timestamp': row['timestamp'],
-                    'agent_id': row['agent_id']
-                })
+            output_data = ({
+                'customer_id': row['customer_id'],
+                'total_open_AR': row['total_open_AR'],
+                'currency': row['currency'],
+                'original_currency': row['original_currency'],
+                'total_open_AR_original': row['total_open_AR_original'],
+                'validation_status': row['validation_status'],
+                'timestamp': row['timestamp'],
+                'agent_id': row['agent_id']
+            } for row in report)
+            if not self.budget.enabled:
+                output_data = list(output_data)
+                self.output_data = output_data
             
-            with open(json_path, 'w') as f:
-                json.dump(output_data, f, indent=4)
+            written_path = self.writer.write_records(json_path, output_data)
             
-            self.logger.info(f"JSON report saved: {json_path}")
+            self.logger.info(f"JSON report saved: {written_path}")
+            if self.budget.enabled:
+                self._log_summary()
+                if not self.summary.customers:
+                    self.logger.error("No customers in the exposure report.")
+                    return False
             
             # Save CSV report (optional)
-            csv_path = str(Path(json_path).parent / "exposure_report.csv")
-            fieldnames = ['customer_id', 'total_open_AR', 'currency', 
-                         'validation_status', 'timestamp', 'agent_id']
-            
-            with open(csv_path, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                for row in output_data:
-                    writer.writerow(row)
-            
-            self.logger.info(f"CSV report saved: {csv_path}")
+            if write_csv_copy:
+                self.write_csv_report()
             
             # Generate AI insights if enabled
-            if self.llm_enabled:
-                self._generate_ai_insights(report)
+            if generate_insights:
+                self.generate_ai_insights()
             
             return True
         except Exception as e:
             self.logger.error(f"Error in action phase: {e}")
             return False
     
-    def _generate_ai_insights(self, report: List[Dict]):
+    def write_csv_report(self) -> bool:
+        """Write the CSV copy of the exposure report (for Excel/BI tools)"""
+        output_data = self.output_data
+        if not output_data:
+            # The JSON report came from an earlier (resumed) run or was streamed under a memory budget
+            output_data = iter_records(settings.EXPOSURE_REPORT_OUTPUT_FILE)
+        csv_path = str(Path(settings.EXPOSURE_REPORT_OUTPUT_FILE).parent / "exposure_report.csv")
+        write_csv(csv_path, self.CSV_FIELDNAMES, output_data)
+        self.logger.info(f"CSV report saved: {csv_path}")
+        return True
+    
+    def generate_ai_insights(self) -> bool:
+        """Generate AI insights for the current report if Azure OpenAI is configured"""
+        if not self.llm_enabled:
+            return True
+        if self.summary is None or not self.summary.customers:
+            self.logger.info("No exposure data in memory (stage resumed). Skipping AI insights.")
+            return True
+        self._generate_ai_insights(self.summary)
+        return True
+    
+    def _local_executive_summary(self, statistics: Dict, top_customers: List[Dict]) -> str:
+        """Deterministic summary used when the LLM is unavailable or failing"""
+        currency = self.reporting_currency
+        top = ", ".join(f"{c['customer_id']} ({c['total_open_AR']:,.2f} {currency})" for c in top_customers)
+        overdue_share = (statistics['overdue_invoices'] / statistics['total_invoices'] * 100
+                         if statistics['total_invoices'] else 0)
+        return (f"Total open AR exposure is {statistics['total_exposure']:,.2f} {currency} across "
+                f"{statistics['total_customers']} customers "
+                f"(average {statistics['average_exposure']:,.2f} {currency}). "
+                f"{statistics['overdue_invoices']} of {statistics['total_invoices']} invoices "
+                f"({overdue_share:.1f}%) are overdue. Largest exposures: {top}. "
+                f"Generated locally because the AI service was unavailable.")
+    
+    def _generate_ai_insights(self, summary: _ExposureSummary):
         """Generate AI-powered insights (optional)"""
         try:
             self.logger.info("Generating AI insights...")
             
-            total_exposure = sum(r['total_open_AR'] for r in report)
-            avg_exposure = total_exposure / len(report) if report else 0
-            top_5_customers = sorted(report, key=lambda x: x['total_open_AR'], reverse=True)[:5]
+            total_exposure = summary.total_exposure
+            avg_exposure = summary.average_exposure
+            top_5_customers = summary.top_customers()
             
-            overdue_count = sum(1 for inv in self.invoice_details if inv.get('STATUS') == 'OVERDUE')
-            total_invoices = len(self.invoice_details)
+            overdue_count = self.overdue_count
+            total_invoices = self.invoice_count
             
             context = f"""
-            Customer Exposure Report Analysis:
-            - Total Customers: {len(report)}
-            - Total Exposure: ${total_exposure:,.2f}
-            - Average Exposure per Customer: ${avg_exposure:,.2f}
+            Customer Exposure Report Analysis (amounts in {self.reporting_currency}):
+            - Total Customers: {summary.customers}
+            - Total Exposure: {total_exposure:,.2f} {self.reporting_currency}
+            - Average Exposure per Customer: {avg_exposure:,.2f} {self.reporting_currency}
             - Total Invoices: {total_invoices}
             - Overdue Invoices: {overdue_count}
             
@@ -231,39 +484,46 @@ Data:
 
 Provide a professional summary in 200-300 words."""
             
-            response = self.llm_client.chat.completions.create(
-                model=self.engine,
+            statistics = {
+                "total_customers": summary.customers,
+                "total_exposure": total_exposure,
+                "average_exposure": avg_exposure,
+                "total_invoices": total_invoices,
+                "overdue_invoices": overdue_count
+            }
+            
+            insight_text, used_fallback = self.llm.complete(
                 messages=[
                     {"role": "system", "content": "You are a financial analyst specializing in credit risk and accounts receivable management."},
                     {"role": "user", "content": prompt}
                 ],
+                fallback=lambda: self._local_executive_summary(statistics, top_5_customers),
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=500,
+                label="AI insights"
             )
             
             insights = {
                 "agent_id": self.agent_id,
                 "timestamp": self.timestamp,
-                "executive_summary": response.choices[0].message.content.strip(),
-                "statistics": {
-                    "total_customers": len(report),
-                    "total_exposure": total_exposure,
-                    "average_exposure": avg_exposure,
-                    "total_invoices": total_invoices,
-                    "overdue_invoices": overdue_count
-                }
+                "executive_summary": insight_text,
+                "summary_source": "local" if used_fallback else "llm",
+                "statistics": statistics
             }
             
             insights_path = str(Path(settings.EXPOSURE_REPORT_OUTPUT_FILE).parent / "ai_insights.json")
-            with open(insights_path, 'w') as f:
-                json.dump(insights, f, indent=4)
+            written_path = self.writer.write(insights_path, insights)
             
-            self.logger.info(f"AI insights saved: {insights_path}")
+            self.logger.info(f"AI insights saved: {written_path}")
         except Exception as e:
             self.logger.warning(f"Failed to generate AI insights: {e}")
     
-    def run(self):
-        """Main execution method following PAR-A pattern"""
+    def run(self, write_csv_copy: bool = True, generate_insights: bool = True):
+        """
+        Main execution method following PAR-A pattern.
+        The orchestrator disables the CSV copy and AI insights here and
+        schedules them as separate tasks that overlap with later stages.
+        """
         self.logger.info("="*60)
         self.logger.info(f"=== STARTING {self.agent_id} ===")
         self.logger.info("="*60)
@@ -280,7 +540,7 @@ Provide a professional summary in 200-300 words."""
             return False
         
         # Act
-        if not self._act(report):
+        if not self._act(report, write_csv_copy, generate_insights):
             self.logger.error("Action phase failed. Terminating.")
             return False
         
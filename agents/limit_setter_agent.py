@@ -2,53 +2,72 @@ import json
 import logging
 import time
 from datetime import datetime
-from openai import AzureOpenAI
 from config import settings
+from utils.llm_gateway import get_gateway
+from utils.log_setup import CustomerProgress
+from utils.schema import read_json_records
+from utils.serialization import OutputWriter, read_document, read_records, upsert_records
 
 DEMO_MODE = True # Keep this for your presentation
 
-try:
-    azure_client = AzureOpenAI(
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version=settings.AZURE_OPENAI_API_VERSION,
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
-    )
-    if not settings.AZURE_OPENAI_DEPLOYMENT_NAME:
-        azure_client = None
-        logging.warning("AZURE_OPENAI_DEPLOYMENT_NAME not found. AI summaries will be disabled.")
-except Exception as e:
-    azure_client = None
-    logging.error(f"Failed to configure Azure OpenAI client: {e}")
+
+def parse_increase_percentage(action):
+    """'Increase limit by 30%' -> 0.30; any other action (e.g. 'No increase') -> 0.0. Raises on malformed amounts."""
+    if "Increase limit by" not in action:
+        return 0.0
+    return float(action.split("by ")[1].replace('%', '')) / 100
+
 
 class LimitSetterAgent:
-    def __init__(self, agent_id="LimitSetter01"):
+    def __init__(self, agent_id="LimitSetter01", checkpoint=None, resume=False, customers=None):
         self.agent_id = agent_id
+        # Targeted re-scoring: only these customers are decided and updated in the output
+        self.customers = set(customers) if customers else None
         self.timestamp = datetime.now().isoformat()
         self.logger = logging.getLogger(self.agent_id)
         self.risk_scores = []
         self.policy_rules = {}
         self.erp_customer_map = {}
+        self.policy_data_loaded = False
+        # Optional CheckpointManager; completed decisions are persisted in chunks
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.checkpoint_chunk_size = settings.CHECKPOINT_CHUNK_SIZE
+        self.progress = CustomerProgress(self.logger, "Limit decisions")
+
+    def load_policy_data(self):
+        """Loads credit policy rules and the ERP customer master; independent of upstream agents."""
+        with open(settings.CREDIT_POLICY_FILE, 'r') as f:
+            credit_policies = json.load(f)
+            self.policy_rules = {rule['condition']: rule['action'] for rule in credit_policies['rules']}
+        # The exposure aggregator writes the quarantine file of the customer master
+        erp_customers = read_json_records(settings.ERP_CUSTOMER_FILE, persist=False)
+        self.erp_customer_map = {customer['customer_id']: customer for customer in erp_customers}
+        self.policy_data_loaded = True
+        return True
 
     def _perceive(self):
         self.logger.info("Perception phase: Loading data sources...")
         try:
-            with open(settings.RISK_SCORE_FILE, 'r') as f:
-                self.risk_scores = json.load(f)
-            with open(settings.CREDIT_POLICY_FILE, 'r') as f:
-                credit_policies = json.load(f)
-                self.policy_rules = {rule['condition']: rule['action'] for rule in credit_policies['rules']}
-            with open(settings.ERP_CUSTOMER_FILE, 'r') as f:
-                erp_customers = json.load(f)
-                self.erp_customer_map = {customer['customer_id']: customer for customer in erp_customers}
+            self.risk_scores = read_records(settings.RISK_SCORE_FILE)
+            if self.customers is not None:
+                self.risk_scores = [r for r in self.risk_scores if r['customer_id'] in self.customers]
+            if not self.policy_data_loaded:
+                self.load_policy_data()
             self.logger.info("Successfully loaded all data sources.")
             return True
         except Exception as e:
             self.logger.error(f"Error in perception phase: {e}. Terminating.")
             return False
 
+    def _limit_currency(self, customer_id):
+        """Currency of the customer's credit limit: their billing currency in the ERP customer master"""
+        customer_info = self.erp_customer_map.get(customer_id) or {}
+        return str(customer_info.get('currency') or settings.REPORTING_CURRENCY).upper()
+
     def _generate_decision_summary_local(self, customer_id, risk_category, rule_applied, previous_limit, new_limit):
-        self.logger.info(f"Generating summary for {customer_id} using LOCAL generator (Demo Mode)...")
-        currency = "USD"
+        self.progress.detail(customer_id, "Generating summary for %s using LOCAL generator (Demo Mode)...", customer_id)
+        currency = self._limit_currency(customer_id)
         if new_limit > previous_limit:
             increase_percent = round(((new_limit / previous_limit) - 1) * 100)
             summary = (f"The credit limit for {risk_category} Risk customer {customer_id} was increased by {increase_percent}% "
@@ -61,34 +80,33 @@ class LimitSetterAgent:
     def _generate_decision_summary(self, customer_id, risk_category, rule_applied, previous_limit, new_limit):
         if DEMO_MODE:
             return self._generate_decision_summary_local(customer_id, risk_category, rule_applied, previous_limit, new_limit)
-        if not azure_client:
+        gateway = get_gateway()
+        if not gateway.enabled:
             return "Generative summary unavailable due to client configuration issue."
         
+        currency = self._limit_currency(customer_id)
         system_prompt = "You are a professional Financial Risk Analyst writing a concise, one-sentence summary for an audit log."
         user_prompt = (f"Generate the summary for this event: "
                        f"Customer ID: {customer_id}, "
                        f"Risk Assessment: {risk_category} Risk, "
                        f"Policy Applied: {rule_applied}, "
-                       f"Previous Limit: {previous_limit:,.2f} USD, "
-                       f"New Limit: {new_limit:,.2f} USD.")
-        try:
-            self.logger.info(f"Generating summary for {customer_id} with Azure OpenAI (gpt-4o)...")
-            response = azure_client.chat.completions.create(
-                model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-                messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-                max_tokens=100, temperature=0.7,
-            )
-            summary = response.choices[0].message.content.strip()
-            return summary
-        except Exception as e:
-            self.logger.error(f"Azure OpenAI API call failed for {customer_id}: {e}")
-            return "Automated summary generation failed; manual review may be required."
+                       f"Previous Limit: {previous_limit:,.2f} {currency}, "
+                       f"New Limit: {new_limit:,.2f} {currency}.")
+        self.progress.detail(customer_id, "Generating summary for %s with Azure OpenAI (gpt-4o)...", customer_id)
+        # Timeouts, retries and the circuit breaker live in the gateway; on failure
+        # the local generator provides the summary so the decision is never blocked
+        summary, _ = gateway.complete(
+            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+            fallback=lambda: self._generate_decision_summary_local(
+                customer_id, risk_category, rule_applied, previous_limit, new_limit),
+            max_tokens=100, temperature=0.7, label=customer_id,
+        )
+        return summary
             
     def _write_to_unified_log(self, log_entry):
         """Reads the unified log, finds a matching workflow to append to, and writes back."""
         try:
-            with open(settings.UNIFIED_LOG_FILE, 'r') as f:
-                data = json.load(f)
+            data = read_document(settings.UNIFIED_LOG_FILE)
 
             # Find the correct workflow based on customer_id and append the log
             log_appended = False
@@ -105,26 +123,56 @@ class LimitSetterAgent:
             if not log_appended:
                 self.logger.warning(f"No existing workflow found for {log_entry.get('customer_id')} in unified log. Log not appended.")
 
-            with open(settings.UNIFIED_LOG_FILE, 'w') as f:
-                json.dump(data, f, indent=2)
+            OutputWriter().write(settings.UNIFIED_LOG_FILE, data, indent=2)
 
             if log_appended:
-                self.logger.info(f"Successfully appended log for {log_entry['customer_id']} to unified log file.")
+                self.logger.debug("Successfully appended log for %s to unified log file.", log_entry['customer_id'])
         except Exception as e:
             self.logger.error(f"Failed to write to unified log file: {e}")
 
+    def _restore_checkpoint(self):
+        """Returns decisions completed by an interrupted run, keyed by customer_id"""
+        if not self.checkpoint:
+            return {}
+        completed = {}
+        if self.resume:
+            state = self.checkpoint.load_state(self.agent_id)
+            if state:
+                # Reuse the original run timestamp so resumed output matches an uninterrupted run
+                self.timestamp = state['timestamp']
+                completed = {d['customer_id']: d for d in self.checkpoint.load_chunks(self.agent_id)}
+                self.logger.info(f"Resuming: restored {len(completed)} completed decisions from checkpoint.")
+        else:
+            self.checkpoint.clear_agent(self.agent_id)
+        if not completed:
+            self.checkpoint.save_state(self.agent_id, {"timestamp": self.timestamp})
+        return completed
+
+    def _flush_checkpoint(self, pending):
+        if self.checkpoint and pending:
+            self.checkpoint.append_chunk(self.agent_id, pending)
+        return []
+
     def _reason_and_decide(self):
         self.logger.info(f"Reasoning phase: Processing {len(self.risk_scores)} customers.")
         credit_limit_updates = []
+        completed = self._restore_checkpoint()
+        pending = []
+        self.progress = CustomerProgress(self.logger, "Limit decisions", total=len(self.risk_scores))
 
         # Process all customers from the primary risk score input file
         for risk_data in self.risk_scores:
             customer_id = risk_data['customer_id']
+            if customer_id in completed:
+                credit_limit_updates.append(completed[customer_id])
+                self.progress.advance()
+                continue
             
             risk_category = risk_data.get('risk_category', 'Unknown')
             customer_info = self.erp_customer_map.get(customer_id)
             if not customer_info:
-                self.logger.warning(f"Customer {customer_id} from risk score file not found in ERP data. Skipping.")
+                self.progress.warning(customer_id, "Customer %s from risk score file not found in ERP data. Skipping.", customer_id)
+                self.progress.advance()
                 continue
             
             current_limit = float(customer_info['current_limit'])
@@ -137,7 +185,7 @@ class LimitSetterAgent:
                 rule_applied = f"{risk_category} Risk Policy"
                 if "Increase limit by" in action:
                     try:
-                        increase_percentage = float(action.split("by ")[1].replace('%', '')) / 100
+                        increase_percentage = parse_increase_percentage(action)
                         new_limit = current_limit * (1 + increase_percentage)
                     except (ValueError, IndexError):
                         self.logger.error(f"Malformed action string for rule '{risk_category}': {action}")
@@ -147,7 +195,7 @@ class LimitSetterAgent:
                 customer_id, risk_category, rule_applied, current_limit, new_limit
             )
             
-            credit_limit_updates.append({
+            decision = {
                 "customer_id": customer_id,
                 "previous_limit": current_limit,
                 "new_limit": round(new_limit, 2),
@@ -156,27 +204,40 @@ class LimitSetterAgent:
                 "validation_status": validation_status,
                 "timestamp": self.timestamp,
                 "agent_id": self.agent_id
-            })
+            }
+            credit_limit_updates.append(decision)
+            pending.append(decision)
+            if len(pending) >= self.checkpoint_chunk_size:
+                pending = self._flush_checkpoint(pending)
 
+            self.progress.advance()
 
             if not DEMO_MODE: time.sleep(3)
             else: time.sleep(1)
 
+        self._flush_checkpoint(pending)
+        self.progress.finish()
         return credit_limit_updates
         
     def _act(self, data):
         self.logger.info(f"Action phase: Writing results for {len(data)} customers to output file.")
         try:
-            with open(settings.OUTPUT_FILE, 'w') as f:
-                json.dump(data, f, indent=4)
-            self.logger.info(f"Action successful. Output written to '{settings.OUTPUT_FILE}'.")
+            if self.customers is not None:
+                # Replace only the re-decided customers in the existing output
+                data = upsert_records(read_records(settings.OUTPUT_FILE), data)
+            output_file = OutputWriter().write(settings.OUTPUT_FILE, data)
+            self.logger.info(f"Action successful. Output written to '{output_file}'.")
+            return True
         except IOError as e:
             self.logger.error(f"Failed to write to output file: {e}.")
+            return False
 
     def run(self):
         self.logger.info(f"--- Agent execution started ---")
+        success = False
         if self._perceive():
             decisions = self._reason_and_decide()
             if decisions:
-                self._act(decisions)
-        self.logger.info(f"--- Agent execution finished ---")
\ No newline at end of file
+                success = self._act(decisions)
+        self.logger.info(f"--- Agent execution finished ---")
+        return success
\ No newline at end of file
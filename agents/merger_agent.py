@@ -2,6 +2,7 @@ import json
 import logging
 from collections import defaultdict
 from config import settings # <-- Use our centralized settings
+from utils.serialization import OutputWriter, read_records
 
 class MergerAgent:
     """
@@ -23,8 +24,7 @@ class MergerAgent:
     def _load_json(self, file_path):
         """Loads a JSON file with error handling."""
         try:
-            with open(file_path, "r") as f:
-                return json.load(f)
+            return read_records(file_path)
         except FileNotFoundError:
             self.logger.warning(f"Data file not found: {file_path}. This agent's data will be skipped.")
             return []
@@ -62,11 +62,13 @@ class MergerAgent:
                 "logs": sorted(logs, key=lambda x: x.get("timestamp", ""))
             })
 
+        success = False
         try:
-            with open(self.output_file, "w") as f:
-                json.dump(unified_log, f, indent=2)
-            self.logger.info(f"Action successful. Unified log file created/updated at '{self.output_file}'.")
+            output_file = OutputWriter().write(self.output_file, unified_log, indent=2)
+            self.logger.info(f"Action successful. Unified log file created/updated at '{output_file}'.")
+            success = True
         except Exception as e:
             self.logger.error(f"Failed to write unified log file: {e}")
             
-        self.logger.info("--- Agent execution finished ---")
\ No newline at end of file
+        self.logger.info("--- Agent execution finished ---")
+        return success
\ No newline at end of file
@@ -0,0 +1,283 @@
+"""
+Preview Estimator Agent
+=======================
+Agent that estimates from stratified samples what a full run would report:
+the portfolio exposure (Exposure Aggregator), the risk-category mix (Risk
+Scoring Agent) and the total limit uplift of the credit policy (Limit
+Setter), each with a confidence interval.
+
+Customers are sampled per country from the customer list and scored with the
+Risk Scoring Agent's formulas, reading only their payment history rows
+through the offset index. Invoices are sampled as byte blocks of the CSV AR
+file, stratified by file position; the JSON extract is read completely and
+adds no uncertainty. The invoice and payment files are therefore read in
+proportion to the sample fraction; the per-customer feeds (customer list,
+ERP master, credit bureau) are read completely.
+
+Author: Preview Estimator Agent
+Date: January 11, 2026
+Agent ID: PreviewEstimator01
+"""
+
+import logging
+import random
+import time
+from datetime import datetime
+from functools import partial
+from typing import Dict, List
+from config import settings
+from agents.exposure_aggregator_agent import AR_COLUMNS, ExposureAggregatorAgent, _reduce_ar_chunk
+from agents.limit_setter_agent import LimitSetterAgent, parse_increase_percentage
+from agents.risk_scoring_agent import PAYMENT_COLUMNS, RiskScoringAgent, _reduce_payment_chunk
+from utils.csv_index import read_keys
+from utils.fast_csv import iter_range_partials
+from utils.fx import FxRateTable
+from utils.money import from_cents
+from utils.sampling import block_strata, interval, sample_strata, stratified_total
+from utils.schema import Quarantine, read_json_records
+from utils.serialization import OutputWriter
+
+CATEGORIES = ("Low", "Medium", "High")
+
+
+class PreviewEstimatorAgent:
+    """Preview Estimator Agent - Estimates exposure, risk mix and limit uplift from samples"""
+
+    def __init__(self, agent_id: str = "PreviewEstimator01", sample_fraction: float = None):
+        self.agent_id = agent_id
+        self.timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        self.logger = logging.getLogger(self.agent_id)
+        self.sample_fraction = sample_fraction or settings.PREVIEW_SAMPLE_FRACTION
+        self.confidence = settings.PREVIEW_CONFIDENCE
+        self.rng = random.Random(settings.PREVIEW_SEED)
+        self.exposure_agent = ExposureAggregatorAgent()
+        self.risk_agent = RiskScoringAgent()
+        self.limit_agent = LimitSetterAgent()
+        self.reporting_currency = settings.REPORTING_CURRENCY
+        self.countries: Dict[str, List[str]] = {}  # country -> customer IDs (the customer strata)
+        self.json_exposure = 0.0  # open AR of the JSON extract, in the reporting currency
+        self.json_invoices = 0
+        self.json_overdue = 0
+        self.started = time.perf_counter()
+
+    # ---------- Perceive ----------
+
+    def _perceive(self) -> bool:
+        """Perception phase: Load the per-customer feeds and the JSON AR extract"""
+        self.logger.info("Perception phase: Loading customer feeds...")
+        exposure = self.exposure_agent
+        try:
+            exposure.load_customer_list(str(settings.CUSTOMER_LIST_FILE))
+            exposure.load_customer_currencies(str(settings.ERP_CUSTOMER_FILE))
+            exposure.load_json_data(str(settings.JSON_EXTRACT_FILE))
+            try:
+                credit_list = read_json_records(settings.CREDIT_BUREAU_FILE, exposure._references())
+                self.risk_agent.credit_data = {item['customer_id']: item for item in credit_list}
+            except FileNotFoundError:
+                self.logger.warning("Credit bureau data not found. Continuing without it.")
+            self.limit_agent.load_policy_data()
+        except Exception as e:
+            self.logger.error(f"Error in perception phase: {e}")
+            return False
+
+        for customer_id, (cents, _, country) in exposure.exposure.items():
+            self.countries.setdefault(country, []).append(customer_id)
+            if exposure.customer_currency.get(customer_id, self.reporting_currency) == self.reporting_currency:
+                self.json_exposure += from_cents(cents)
+        for _, amount in exposure.iter_converted():
+            self.json_exposure += round(amount, 2)
+        exposure.exposure.close()
+        exposure.fx_buckets.close()
+        self.json_invoices, self.json_overdue = exposure.invoice_count, exposure.overdue_count
+        self.logger.info(f"Loaded {len(exposure.known_customers)} customers in {len(self.countries)} countries.")
+        return True
+
+    # ---------- Reason ----------
+
+    def _block_values(self, result: Dict, fx: FxRateTable) -> float:
+        """Open AR of one AR block's partial aggregate in the reporting currency"""
+        currencies = self.exposure_agent.customer_currency
+        total = sum(from_cents(cents) for customer_id, cents in result['totals'].items()
+                    if currencies.get(customer_id, self.reporting_currency) == self.reporting_currency)
+        known = set(fx.currencies())
+        buckets = [(currencies[customer_id], rate_day, from_cents(cents))
+                   for (customer_id, rate_day), cents in result['fx_buckets'].items()
+                   if currencies[customer_id] in known]
+        if buckets:
+            total += sum(fx.convert_batch([c for c, _, _ in buckets], [d for _, d, _ in buckets],
+                                          [a for _, _, a in buckets], self.reporting_currency))
+        return total
+
+    def estimate_exposure(self) -> Dict:
+        """Portfolio open AR and invoice counts from a stratified sample of AR file blocks"""
+        exposure = self.exposure_agent
+        path = settings.CSV_RECORDS_FILE
+        strata = block_strata(path, settings.PREVIEW_BLOCK_BYTES, self.sample_fraction, settings.PREVIEW_MAX_STRATA)
+        sample = sample_strata(strata, self.sample_fraction, self.rng)
+        ranges = [block for blocks in sample.values() for block in blocks]
+        reducer = partial(_reduce_ar_chunk, fx_customers=exposure._fx_customers(),
+                          valuation_day=exposure._valuation_day())
+        fx = FxRateTable.load()
+        # Only part of the file is read, so the full run's quarantine file is left alone
+        partials = iter_range_partials(path, ranges, AR_COLUMNS, reducer,
+                                       quarantine=Quarantine(path, persist=False), references=exposure._references())
+        values = {key: [] for key in ('open_ar', 'invoices', 'overdue')}
+        for result in partials:
+            values['open_ar'].append(self._block_values(result, fx))
+            values['invoices'].append(result['invoices'])
+            values['overdue'].append(result['overdue'])
+
+        def total(field: str, known: float):
+            position, per_stratum = 0, []
+            for key, blocks in strata.items():
+                taken = len(sample[key])
+                per_stratum.append((len(blocks), values[field][position:position + taken]))
+                position += taken
+            estimate, standard_error = stratified_total(per_stratum)
+            return known + estimate, standard_error
+
+        customers = len(exposure.known_customers)
+        open_ar, open_ar_se = total('open_ar', self.json_exposure)
+        return {
+            'sample': {'blocks': len(ranges), 'block_population': sum(len(b) for b in strata.values()),
+                       'strata': len(strata), 'bytes_read': sum(end - start for start, end in ranges),
+                       'bytes_total': sum(end - start for blocks in strata.values() for start, end in blocks)},
+            'customers': customers,
+            'total_open_AR': interval(open_ar, open_ar_se, self.confidence),
+            'average_open_AR': interval(open_ar / customers if customers else 0.0,
+                                        open_ar_se / customers if customers else 0.0, self.confidence),
+            'invoices': interval(*total('invoices', self.json_invoices), self.confidence, digits=1, minimum=0),
+            'overdue_invoices': interval(*total('overdue', self.json_overdue), self.confidence, digits=1,
+                                         minimum=0),
+        }
+
+    def _limit_uplift(self, customer_id: str, category: str) -> float:
+        """new_limit - previous_limit the Limit Setter would decide (0 for customers missing from the ERP master)"""
+        customer_info = self.limit_agent.erp_customer_map.get(customer_id)
+        if not customer_info:
+            return 0.0
+        current_limit = float(customer_info['current_limit'])
+        try:
+            increase_percentage = parse_increase_percentage(self.limit_agent.policy_rules.get(category, ''))
+        except (ValueError, IndexError):
+            increase_percentage = 0.0
+        return round(current_limit * (1 + increase_percentage), 2) - current_limit
+
+    def estimate_risk_and_limits(self) -> Dict:
+        """Risk-category mix and limit uplift from a sample of customers stratified by country"""
+        risk = self.risk_agent
+        sample = sample_strata(self.countries, self.sample_fraction, self.rng)
+        sampled = [customer_id for customers in sample.values() for customer_id in customers]
+        # Only part of the file is read, so the full run's quarantine file is left alone
+        delays = read_keys(settings.PAYMENT_HISTORY_FILE, 'CUSTOMER_ID', sampled, PAYMENT_COLUMNS,
+                           _reduce_payment_chunk, index_path=settings.PAYMENT_HISTORY_INDEX_FILE,
+                           quarantine=Quarantine(settings.PAYMENT_HISTORY_FILE, persist=False),
+                           references=self.exposure_agent._references())
+
+        indicators = {category: [] for category in CATEGORIES}
+        uplifts = []
+        for country, customers in sample.items():
+            counts = {category: [] for category in CATEGORIES}
+            country_uplifts = []
+            for customer_id in customers:
+                customer_delays = delays.get(customer_id, [])
+                # The exposure ratio depends only on the credit score for any non-zero open AR
+                risk_score = risk.calculate_risk_score(risk.calculate_payment_delay_factor(customer_delays),
+                                                       risk.exposure_ratio_or_zero(1.0, customer_id),
+                                                       risk.calculate_avg_risk_weight(customer_delays, customer_id))
+                category = risk.determine_risk_category(risk_score)
+                for name in CATEGORIES:
+                    counts[name].append(1.0 if name == category else 0.0)
+                country_uplifts.append(self._limit_uplift(customer_id, category))
+            size = len(self.countries[country])
+            for name in CATEGORIES:
+                indicators[name].append((size, counts[name]))
+            uplifts.append((size, country_uplifts))
+
+        population = sum(len(customers) for customers in self.countries.values())
+        categories = {}
+        for name in CATEGORIES:
+            estimate, standard_error = stratified_total(indicators[name])
+            categories[name] = {
+                'customers': interval(estimate, standard_error, self.confidence, digits=1, minimum=0),
+                'share_pct': interval(estimate / population * 100 if population else 0.0,
+                                      standard_error / population * 100 if population else 0.0, self.confidence,
+                                      minimum=0),
+            }
+        limit_before = sum(float(info['current_limit']) for customer_id, info in self.limit_agent.erp_customer_map.items()
+                           if customer_id in self.exposure_agent.known_customers)
+        uplift, uplift_se = stratified_total(uplifts)
+        return {
+            'sample': {'customers': len(sampled), 'customer_population': population, 'strata': len(sample)},
+            'risk_categories': categories,
+            'limits': {
+                'total_limit_before': round(limit_before, 2),
+                'total_limit_uplift': interval(uplift, uplift_se, self.confidence),
+                'total_limit_after': interval(limit_before + uplift, uplift_se, self.confidence),
+            },
+        }
+
+    def _reason(self) -> Dict:
+        """Reasoning phase: Estimate the full run's aggregates from the samples"""
+        self.logger.info(f"Reasoning phase: Estimating from a {self.sample_fraction:.1%} stratified sample...")
+        exposure = self.estimate_exposure()
+        risk = self.estimate_risk_and_limits()
+        return {
+            'generated_at': self.timestamp,
+            'agent_id': self.agent_id,
+            'sample_fraction': self.sample_fraction,
+            'confidence': self.confidence,
+            'seed': settings.PREVIEW_SEED,
+            'currency': self.reporting_currency,
+            'sample': {'customers': risk.pop('sample'), 'ar_blocks': exposure.pop('sample')},
+            'exposure': exposure,
+            **risk,
+            'elapsed_seconds': round(time.perf_counter() - self.started, 3),
+        }
+
+    # ---------- Act ----------
+
+    def _act(self, report: Dict) -> bool:
+        """Action phase: Save the preview report and log the estimates"""
+        try:
+            output_file = OutputWriter().write(settings.PREVIEW_REPORT_FILE, report)
+        except Exception as e:
+            self.logger.error(f"Error in action phase: {e}")
+            return False
+        level = f"{report['confidence']:.0%}"
+        currency = report['currency']
+
+        def describe(bounds: Dict, unit: str = "") -> str:
+            return (f"{bounds['estimate']:,.2f}{unit} ({level} CI {bounds['low']:,.2f} - "
+                    f"{bounds['high']:,.2f}{unit})")
+
+        customers, blocks = report['sample']['customers'], report['sample']['ar_blocks']
+        self.logger.info(f"Sampled {customers['customers']} of {customers['customer_population']} customers "
+                         f"and {blocks['blocks']} of {blocks['block_population']} AR blocks "
+                         f"({blocks['bytes_read']:,} of {blocks['bytes_total']:,} bytes)")
+        self.logger.info(f"Total open AR: {describe(report['exposure']['total_open_AR'], ' ' + currency)}")
+        for name, category in report['risk_categories'].items():
+            self.logger.info(f"{name} risk: {describe(category['share_pct'], '%')} of customers")
+        self.logger.info(f"Total limit uplift: {describe(report['limits']['total_limit_uplift'], ' ' + currency)}")
+        self.logger.info(f"Preview report saved: {output_file} ({report['elapsed_seconds']}s)")
+        return True
+
+    def run(self) -> bool:
+        """Main execution method following PAR-A pattern"""
+        self.logger.info("=" * 60)
+        self.logger.info(f"=== STARTING {self.agent_id} ===")
+        self.logger.info("=" * 60)
+        self.started = time.perf_counter()
+        if not self._perceive():
+            self.logger.error("Perception phase failed. Terminating.")
+            return False
+        try:
+            report = self._reason()
+        except Exception as e:
+            self.logger.error(f"Error in reasoning phase: {e}")
+            return False
+        if not self._act(report):
+            self.logger.error("Action phase failed. Terminating.")
+            return False
+        self.logger.info(f"=== {self.agent_id} COMPLETED SUCCESSFULLY ===")
+        return True
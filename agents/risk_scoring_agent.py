@@ -9,20 +9,48 @@ Date: January 11, 2026
 Agent ID: RiskScoring01
 """
 
-import json
-import csv
 import logging
 from datetime import datetime
-from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple
 from config import settings
+from utils.csv_index import read_keys
+from utils.fast_csv import iter_csv_partials, parse_csv
+from utils.log_setup import CustomerProgress
+from utils.schema import Quarantine, known_customers, read_json_records
+from utils.serialization import OutputWriter, read_records, upsert_records
+from utils.spill import MemoryBudget, SpillingAggregator
+
+# Payment history columns used for scoring, with their parsed types
+PAYMENT_COLUMNS = {'CUSTOMER_ID': 'str', 'DUE_DATE': 'day', 'PAYMENT_DATE': 'day'}
+
+
+def _reduce_payment_chunk(columns: Dict) -> Dict:
+    """Partial aggregate of payment history rows: customer -> payment delays in days"""
+    delays = {}
+    for customer_id, due_day, payment_day in zip(columns['CUSTOMER_ID'], columns['DUE_DATE'],
+                                                 columns['PAYMENT_DATE']):
+        delays.setdefault(customer_id, []).append(payment_day - due_day)
+    return delays
+
+
+def _merge_payment_chunks(first: Dict, second: Dict) -> Dict:
+    for customer_id, delays in second.items():
+        first.setdefault(customer_id, []).extend(delays)
+    return first
+
+
+def _concat_delays(first: List, second: List) -> List:
+    first.extend(second)
+    return first
 
 
 class RiskScoringAgent:
     """Risk Scoring Agent - Calculates customer risk scores"""
     
-    def __init__(self, agent_id: str = "RiskScoring01"):
+    def __init__(self, agent_id: str = "RiskScoring01", customers: Optional[Iterable[str]] = None):
         self.agent_id = agent_id
+        # Targeted re-scoring: only these customers are scored and updated in the output
+        self.customers = set(customers) if customers else None
         self.timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
         self.logger = logging.getLogger(self.agent_id)
         
@@ -38,8 +66,10 @@ class RiskScoringAgent:
             'High': 0       # Risk Score <= 60
         }
         
+        # With settings.MEMORY_BUDGET_MB, payment delays spill to disk above the budget
+        self.budget = MemoryBudget()
         self.exposure_data = {}
-        self.payment_data = {}
+        self.payment_data = {}  # customer -> payment delays (dict or SpillingAggregator)
         self.credit_data = {}
         self.results = []
     
@@ -49,45 +79,62 @@ class RiskScoringAgent:
         try:
             # Load exposure data from previous agent
             self.logger.info(f"Loading exposure data from {settings.EXPOSURE_REPORT_OUTPUT_FILE}...")
-            with open(settings.EXPOSURE_REPORT_OUTPUT_FILE, 'r') as f:
-                exposure_list = json.load(f)
-                self.exposure_data = {item['customer_id']: item for item in exposure_list}
-            
-            # Load payment history
-            self.logger.info(f"Loading payment history from {settings.PAYMENT_HISTORY_FILE}...")
-            with open(settings.PAYMENT_HISTORY_FILE, 'r') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    customer_id = row['CUSTOMER_ID']
-                    if customer_id not in self.payment_data:
-                        self.payment_data[customer_id] = []
-                    self.payment_data[customer_id].append(row)
-            
-            # Load credit bureau data (optional)
-            try:
-                self.logger.info(f"Loading credit bureau data from {settings.CREDIT_BUREAU_FILE}...")
-                with open(settings.CREDIT_BUREAU_FILE, 'r') as f:
-                    credit_list = json.load(f)
-                    self.credit_data = {item['customer_id']: item for item in credit_list}
-            except FileNotFoundError:
-                self.logger.warning("Credit bureau data not found. Continuing without it.")
-            
+            exposure_list = read_records(settings.EXPOSURE_REPORT_OUTPUT_FILE)
+            self.exposure_data = {item['customer_id']: item for item in exposure_list
+                                  if self.customers is None or item['customer_id'] in self.customers}
+            self.load_scoring_inputs()
             self.logger.info("Successfully loaded all data sources.")
             return True
         except Exception as e:
             self.logger.error(f"Error in perception phase: {e}")
             return False
     
-    def calculate_payment_delay_factor(self, payments):
-        """Calculate payment delay factor"""
-        total_delay = 0
-        invoice_count = len(payments)
+    def load_scoring_inputs(self) -> None:
+        """Loads payment history and credit bureau data for the customers in self.exposure_data"""
+        # Rows of customers missing from the customer list are quarantined
+        references = {'customers': known_customers()}
         
-        for payment in payments:
-            due_date = datetime.strptime(payment['DUE_DATE'], '%Y-%m-%d')
-            payment_date = datetime.strptime(payment['PAYMENT_DATE'], '%Y-%m-%d')
-            delay_days = (payment_date - due_date).days
-            total_delay += delay_days
+        # Load payment history
+        if self.customers is None and self.budget.enabled:
+            self.logger.info(f"Loading payment history from {settings.PAYMENT_HISTORY_FILE} "
+                             f"(memory budget {self.budget.limit_mb} MB)...")
+            self.payment_data = SpillingAggregator("payment_delays", _concat_delays, self.budget)
+            for delays in iter_csv_partials(settings.PAYMENT_HISTORY_FILE, PAYMENT_COLUMNS,
+                                            _reduce_payment_chunk,
+                                            quarantine=Quarantine(settings.PAYMENT_HISTORY_FILE),
+                                            references=references):
+                self.payment_data.update(delays)
+        elif self.customers is None:
+            self.logger.info(f"Loading payment history from {settings.PAYMENT_HISTORY_FILE}...")
+            self.payment_data = parse_csv(settings.PAYMENT_HISTORY_FILE, PAYMENT_COLUMNS,
+                                          _reduce_payment_chunk, _merge_payment_chunks,
+                                          quarantine=Quarantine(settings.PAYMENT_HISTORY_FILE),
+                                          references=references)
+        else:
+            missing = sorted(self.customers - set(self.exposure_data))
+            if missing:
+                self.logger.warning(f"Not in the exposure report, skipped: {', '.join(missing)}")
+            self.logger.info(f"Loading payment history for {len(self.exposure_data)} customers "
+                             f"via {settings.PAYMENT_HISTORY_INDEX_FILE}...")
+            # Only part of the file is read, so the full run's quarantine file is left alone
+            self.payment_data = read_keys(settings.PAYMENT_HISTORY_FILE, 'CUSTOMER_ID', self.exposure_data,
+                                          PAYMENT_COLUMNS, _reduce_payment_chunk,
+                                          index_path=settings.PAYMENT_HISTORY_INDEX_FILE,
+                                          quarantine=Quarantine(settings.PAYMENT_HISTORY_FILE, persist=False),
+                                          references=references)
+        
+        # Load credit bureau data (optional)
+        try:
+            self.logger.info(f"Loading credit bureau data from {settings.CREDIT_BUREAU_FILE}...")
+            credit_list = read_json_records(settings.CREDIT_BUREAU_FILE, references)
+            self.credit_data = {item['customer_id']: item for item in credit_list}
+        except FileNotFoundError:
+            self.logger.warning("Credit bureau data not found. Continuing without it.")
+    
+    def calculate_payment_delay_factor(self, delays):
+        """Calculate payment delay factor from per-invoice payment delays (days)"""
+        total_delay = sum(delays)
+        invoice_count = len(delays)
         
         if invoice_count == 0:
             return 0
@@ -107,15 +154,17 @@ class RiskScoringAgent:
         exposure_ratio = total_open_ar / credit_limit
         return round(exposure_ratio, 2)
     
-    def calculate_avg_risk_weight(self, payments, customer_id):
-        """Calculate average risk weight"""
-        if len(payments) > 0:
-            delays = []
-            for payment in payments:
-                due_date = datetime.strptime(payment['DUE_DATE'], '%Y-%m-%d')
-                payment_date = datetime.strptime(payment['PAYMENT_DATE'], '%Y-%m-%d')
-                delays.append((payment_date - due_date).days)
-            
+    def exposure_ratio_or_zero(self, total_open_ar, customer_id):
+        """Exposure ratio, or 0.0 where it is undefined"""
+        try:
+            return self.calculate_exposure_ratio(total_open_ar, customer_id)
+        except ZeroDivisionError:
+            # No open AR, or a credit score that leaves no credit multiplier
+            return 0.0
+    
+    def calculate_avg_risk_weight(self, delays, customer_id):
+        """Calculate average risk weight from per-invoice payment delays (days)"""
+        if len(delays) > 0:
             avg_delay = sum(delays) / len(delays)
             variance = sum((d - avg_delay) ** 2 for d in delays) / len(delays)
             std_dev = variance ** 0.5
@@ -134,6 +183,22 @@ class RiskScoringAgent:
         
         return round(avg_risk_weight, 2)
     
+    def payment_factors(self) -> Dict[str, Tuple[float, float]]:
+        """
+        customer -> (payment delay factor, avg risk weight) for the customers in
+        the exposure report, reading each customer's delays once (in customer
+        order when they were spilled to disk).
+        """
+        factors = {}
+        for customer_id, delays in self.payment_data.items():
+            if customer_id in self.exposure_data:
+                factors[customer_id] = (self.calculate_payment_delay_factor(delays),
+                                        self.calculate_avg_risk_weight(delays, customer_id))
+        if isinstance(self.payment_data, SpillingAggregator):
+            self.payment_data.close()
+        self.payment_data = {}
+        return factors
+    
     def calculate_risk_score(self, payment_delay_factor, exposure_ratio, avg_risk_weight):
         """Calculate overall risk score"""
         risk_score = (
@@ -145,13 +210,19 @@ class RiskScoringAgent:
     
     def determine_risk_category(self, risk_score):
         """Determine risk category based on score"""
-        if risk_score >= 80:
+        if risk_score >= self.RISK_THRESHOLDS['Low']:
             return "Low"
-        elif risk_score >= 61:
+        elif risk_score >= self.RISK_THRESHOLDS['Medium']:
             return "Medium"
         else:
             return "High"
     
+    def validate_score(self, exposure: Dict, exposure_ratio: float) -> str:
+        """Validate a scored record: its exposure passed validation and has a positive exposure ratio"""
+        if exposure.get('validation_status') == "PASS" and exposure_ratio > 0:
+            return "PASS"
+        return "FAIL"
+    
     def _reason(self) -> List[Dict]:
         """Reasoning phase: Calculate risk scores for all customers"""
         self.logger.info("Reasoning phase: Calculating risk scores...")
@@ -159,17 +230,20 @@ class RiskScoringAgent:
         results = []
         
         self.logger.info(f"Processing {len(self.exposure_data)} customers...")
+        progress = CustomerProgress(self.logger, "Risk scoring", total=len(self.exposure_data))
+        payment_factors = self.payment_factors()
         
         for customer_id, exposure in self.exposure_data.items():
-            self.logger.debug(f"Processing {customer_id}...")
             
             total_open_ar = exposure['total_open_AR']
-            payments = self.payment_data.get(customer_id, [])
             
             # Calculate risk factors
-            payment_delay_factor = self.calculate_payment_delay_factor(payments)
-            exposure_ratio = self.calculate_exposure_ratio(total_open_ar, customer_id)
-            avg_risk_weight = self.calculate_avg_risk_weight(payments, customer_id)
+            if customer_id in payment_factors:
+                payment_delay_factor, avg_risk_weight = payment_factors[customer_id]
+            else:
+                payment_delay_factor = self.calculate_payment_delay_factor([])
+                avg_risk_weight = self.calculate_avg_risk_weight([], customer_id)
+            exposure_ratio = self.exposure_ratio_or_zero(total_open_ar, customer_id)
             
             # Calculate risk score
             risk_score = self.calculate_risk_score(
@@ -180,6 +254,7 @@ class RiskScoringAgent:
             
             # Determine risk category
             risk_category = self.determine_risk_category(risk_score)
+            validation_status = self.validate_score(exposure, exposure_ratio)
             
             # Create result record
             result = {
@@ -190,14 +265,16 @@ class RiskScoringAgent:
                 "exposure_ratio": exposure_ratio,
                 "avg_risk_weight": avg_risk_weight,
                 "calculation_logic": "Risk Score = (Payment Delay Factor*0.3)+(Exposure Ratio*100*0.4)+(Avg Risk Weight*100*0.3)",
-                "validation_status": "PASS",
+                "validation_status": validation_status,
                 "timestamp": exposure['timestamp'],
                 "agent_id": self.agent_id
             }
             
             results.append(result)
-            self.logger.debug(f"  Risk Score: {risk_score} | Category: {risk_category}")
+            progress.detail(customer_id, "%s - Risk Score: %s | Category: %s", customer_id, risk_score, risk_category)
+            progress.advance()
         
+        progress.finish()
         self.results = results
         
         # Display summary
@@ -219,11 +296,10 @@ class RiskScoringAgent:
         """Action phase: Save risk scores to output file"""
         self.logger.info("Action phase: Saving risk scores...")
         try:
-            output_file = settings.RISK_SCORE_OUTPUT_FILE
-            Path(output_file).parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(output_file, 'w') as f:
-                json.dump(results, f, indent=4)
+            if self.customers is not None:
+                # Replace only the re-scored customers in the existing output
+                results = upsert_records(read_records(settings.RISK_SCORE_OUTPUT_FILE), results)
+            output_file = OutputWriter().write(settings.RISK_SCORE_OUTPUT_FILE, results)
             
             self.logger.info(f"Risk scores saved: {output_file}")
             self.logger.info(f"Total customers processed: {len(results)}")
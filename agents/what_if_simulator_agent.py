@@ -0,0 +1,242 @@
+"""
+What-If Simulator Agent
+=======================
+Agent that evaluates alternative risk weights, category thresholds and credit
+policy percentages in one pass, without re-running the workflow.
+
+The per-customer risk factors (payment delay factor, exposure ratio, average
+risk weight) are computed once with the Risk Scoring Agent's formulas. The
+scenario grid is then evaluated in layers: scores once per weight set,
+categories once per threshold pair, and per-category limit and exposure
+totals, so each policy combination costs a few multiplications. Each
+scenario reports category migration against the current configuration, the
+total limit change and the exposure at risk (open AR of High-risk customers).
+
+Author: What-If Simulator Agent
+Date: January 11, 2026
+Agent ID: WhatIfSimulator01
+"""
+
+import itertools
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List
+from config import settings
+from agents.limit_setter_agent import LimitSetterAgent, parse_increase_percentage
+from agents.risk_scoring_agent import RiskScoringAgent
+from utils.serialization import OutputWriter
+
+CATEGORIES = ("Low", "Medium", "High")
+
+
+class WhatIfSimulatorAgent:
+    """What-If Simulator Agent - Evaluates weight, threshold and policy scenarios"""
+
+    def __init__(self, agent_id: str = "WhatIfSimulator01", scenarios_file=None):
+        self.agent_id = agent_id
+        self.timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        self.logger = logging.getLogger(self.agent_id)
+        self.scenarios_file = scenarios_file or settings.WHAT_IF_SCENARIOS_FILE
+        self.risk_agent = RiskScoringAgent()
+        self.limit_agent = LimitSetterAgent()
+        self.grid = {}
+        # Per-customer factor columns, aligned by position
+        self.customer_ids: List[str] = []
+        self.delay_factors: List[float] = []
+        self.exposure_ratios: List[float] = []
+        self.avg_risk_weights: List[float] = []
+        self.open_ar: List[float] = []
+        self.current_limits: List[float] = []  # 0.0 for customers missing from the ERP master
+
+    # ---------- Perceive ----------
+
+    def _perceive(self) -> bool:
+        """Perception phase: Load inputs and compute the per-customer risk factors once"""
+        self.logger.info("Perception phase: Loading data sources and computing risk factors...")
+        try:
+            with open(self.scenarios_file, 'r') as f:
+                self.grid = json.load(f)
+            if not self.risk_agent._perceive():
+                return False
+            self.limit_agent.load_policy_data()
+        except Exception as e:
+            self.logger.error(f"Error in perception phase: {e}")
+            return False
+
+        risk = self.risk_agent
+        payment_factors = risk.payment_factors()
+        for customer_id, exposure in risk.exposure_data.items():
+            customer_info = self.limit_agent.erp_customer_map.get(customer_id)
+            if customer_id in payment_factors:
+                delay_factor, avg_risk_weight = payment_factors[customer_id]
+            else:
+                delay_factor = risk.calculate_payment_delay_factor([])
+                avg_risk_weight = risk.calculate_avg_risk_weight([], customer_id)
+            self.customer_ids.append(customer_id)
+            self.delay_factors.append(delay_factor)
+            self.exposure_ratios.append(risk.exposure_ratio_or_zero(exposure['total_open_AR'], customer_id))
+            self.avg_risk_weights.append(avg_risk_weight)
+            self.open_ar.append(exposure['total_open_AR'])
+            self.current_limits.append(float(customer_info['current_limit']) if customer_info else 0.0)
+        self.logger.info(f"Computed risk factors for {len(self.customer_ids)} customers.")
+        return True
+
+    # ---------- Reason ----------
+
+    def _policy_percentage(self, category: str) -> float:
+        """Current limit increase of a category in percent; 0 for a malformed action, as the Limit Setter does"""
+        action = self.limit_agent.policy_rules.get(category, '')
+        try:
+            return round(parse_increase_percentage(action) * 100, 4)
+        except (ValueError, IndexError):
+            self.logger.error(f"Malformed action string for rule '{category}': {action}")
+            return 0.0
+
+    def baseline(self) -> Dict:
+        """The configuration the workflow currently runs with"""
+        risk = self.risk_agent
+        return {
+            'weights': {'payment_delay': risk.PAYMENT_DELAY_WEIGHT,
+                        'exposure_ratio': risk.EXPOSURE_RATIO_WEIGHT,
+                        'avg_risk': risk.AVG_RISK_WEIGHT},
+            'thresholds': {'Low': risk.RISK_THRESHOLDS['Low'], 'Medium': risk.RISK_THRESHOLDS['Medium']},
+            'policy': {category: self._policy_percentage(category) for category in CATEGORIES},
+        }
+
+    def _grid_values(self, section: str, key: str, default) -> List:
+        values = self.grid.get(section, {}).get(key)
+        return list(values) if values else [default]
+
+    def _scores(self, weights: Dict) -> List[int]:
+        """Risk scores of all customers for one weight set (same expression as RiskScoringAgent)"""
+        w_delay, w_ratio, w_avg = weights['payment_delay'], weights['exposure_ratio'], weights['avg_risk']
+        return [round(delay * w_delay + ratio * 100 * w_ratio + avg * 100 * w_avg)
+                for delay, ratio, avg in zip(self.delay_factors, self.exposure_ratios, self.avg_risk_weights)]
+
+    @staticmethod
+    def _categories(scores: List[int], thresholds: Dict) -> List[str]:
+        low, medium = thresholds['Low'], thresholds['Medium']
+        return ["Low" if s >= low else "Medium" if s >= medium else "High" for s in scores]
+
+    def _category_totals(self, categories: List[str]) -> Dict:
+        totals = {category: {'customers': 0, 'limit': 0.0, 'open_ar': 0.0} for category in CATEGORIES}
+        for category, limit, ar in zip(categories, self.current_limits, self.open_ar):
+            bucket = totals[category]
+            bucket['customers'] += 1
+            bucket['limit'] += limit
+            bucket['open_ar'] += ar
+        return totals
+
+    @staticmethod
+    def _migration(base_categories: List[str], categories: List[str]) -> Dict[str, int]:
+        moves = {}
+        for before, after in zip(base_categories, categories):
+            if before != after:
+                key = f"{before}->{after}"
+                moves[key] = moves.get(key, 0) + 1
+        return dict(sorted(moves.items()))
+
+    def _reason(self) -> Dict:
+        """Reasoning phase: Evaluate every scenario of the grid in layered batches"""
+        self.logger.info("Reasoning phase: Evaluating scenarios...")
+        started = time.perf_counter()
+        base = self.baseline()
+        base_categories = self._categories(self._scores(base['weights']), base['thresholds'])
+        total_limit_before = sum(self.current_limits)
+        base_totals = self._category_totals(base_categories)
+        base_exposure_at_risk = base_totals['High']['open_ar']
+
+        weight_sets = [dict(zip(('payment_delay', 'exposure_ratio', 'avg_risk'), combo)) for combo in itertools.product(
+            self._grid_values('weights', 'payment_delay', base['weights']['payment_delay']),
+            self._grid_values('weights', 'exposure_ratio', base['weights']['exposure_ratio']),
+            self._grid_values('weights', 'avg_risk', base['weights']['avg_risk']))]
+        threshold_sets = [{'Low': low, 'Medium': medium} for low, medium in itertools.product(
+            self._grid_values('thresholds', 'Low', base['thresholds']['Low']),
+            self._grid_values('thresholds', 'Medium', base['thresholds']['Medium'])) if medium < low]
+        policy_sets = [dict(zip(CATEGORIES, combo)) for combo in itertools.product(
+            *(self._grid_values('policy', category, base['policy'][category]) for category in CATEGORIES))]
+
+        def evaluate(scenario_id, weights, thresholds, totals, migration, policy):
+            total_limit_after = sum(totals[c]['limit'] * (1 + policy[c] / 100) for c in CATEGORIES)
+            return {
+                'scenario_id': scenario_id,
+                'weights': weights,
+                'thresholds': thresholds,
+                'policy': policy,
+                'category_counts': {c: totals[c]['customers'] for c in CATEGORIES},
+                'migration': migration,
+                'migrated_customers': sum(migration.values()),
+                'total_limit_before': round(total_limit_before, 2),
+                'total_limit_after': round(total_limit_after, 2),
+                'total_limit_change': round(total_limit_after - total_limit_before, 2),
+                'total_limit_change_pct': round((total_limit_after / total_limit_before - 1) * 100, 2)
+                if total_limit_before else 0.0,
+                'exposure_at_risk': round(totals['High']['open_ar'], 2),
+                'exposure_at_risk_change': round(totals['High']['open_ar'] - base_exposure_at_risk, 2),
+            }
+
+        scenarios = []
+        for weights in weight_sets:
+            scores = self._scores(weights)
+            for thresholds in threshold_sets:
+                categories = self._categories(scores, thresholds)
+                totals = self._category_totals(categories)
+                migration = self._migration(base_categories, categories)
+                for policy in policy_sets:
+                    scenarios.append(evaluate(f"S{len(scenarios) + 1:05d}", weights, thresholds,
+                                              totals, migration, policy))
+
+        elapsed = time.perf_counter() - started
+        self.logger.info(f"Evaluated {len(scenarios)} scenarios ({len(weight_sets)} weight sets x "
+                         f"{len(threshold_sets)} threshold pairs x {len(policy_sets)} policies) "
+                         f"for {len(self.customer_ids)} customers in {elapsed:.3f}s")
+        return {
+            'generated_at': self.timestamp,
+            'agent_id': self.agent_id,
+            'customers': len(self.customer_ids),
+            'scenario_count': len(scenarios),
+            'evaluation_seconds': round(elapsed, 4),
+            'baseline': evaluate("BASELINE", base['weights'], base['thresholds'], base_totals, {},
+                                 base['policy']),
+            'scenarios': scenarios,
+        }
+
+    # ---------- Act ----------
+
+    def _act(self, report: Dict) -> bool:
+        """Action phase: Save the scenario report and log the extremes"""
+        try:
+            output_file = OutputWriter().write(settings.WHAT_IF_REPORT_FILE, report)
+        except Exception as e:
+            self.logger.error(f"Error in action phase: {e}")
+            return False
+        baseline = report['baseline']
+        self.logger.info(f"Baseline: limits {baseline['total_limit_before']:,.2f} -> "
+                         f"{baseline['total_limit_after']:,.2f}, exposure at risk {baseline['exposure_at_risk']:,.2f}")
+        if report['scenarios']:
+            by_change = sorted(report['scenarios'], key=lambda s: s['total_limit_change'])
+            by_risk = max(report['scenarios'], key=lambda s: s['exposure_at_risk'])
+            for label, s in (("Smallest limit change", by_change[0]), ("Largest limit change", by_change[-1]),
+                             ("Highest exposure at risk", by_risk)):
+                self.logger.info(f"{label}: {s['scenario_id']} change {s['total_limit_change']:,.2f} "
+                                 f"({s['total_limit_change_pct']}%), exposure at risk {s['exposure_at_risk']:,.2f}, "
+                                 f"{s['migrated_customers']} customers migrated")
+        self.logger.info(f"Scenario report saved: {output_file}")
+        return True
+
+    def run(self) -> bool:
+        """Main execution method following PAR-A pattern"""
+        self.logger.info("=" * 60)
+        self.logger.info(f"=== STARTING {self.agent_id} ===")
+        self.logger.info("=" * 60)
+        if not self._perceive():
+            self.logger.error("Perception phase failed. Terminating.")
+            return False
+        report = self._reason()
+        if not self._act(report):
+            self.logger.error("Action phase failed. Terminating.")
+            return False
+        self.logger.info(f"=== {self.agent_id} COMPLETED SUCCESSFULLY ===")
+        return True
@@ -0,0 +1,95 @@
+"""
+Audit Store Query Tool
+======================
+Command-line queries against the SQLite audit store written by the Audit
+Logger Agent (settings.AUDIT_DB_FILE).
+
+Examples:
+    python audit_query.py --status FAIL --since 2026-01-01 --until 2026-01-31
+    python audit_query.py --customer CUST1004
+    python audit_query.py --step "Limit Setting" --run latest
+    python audit_query.py --logs --customer CUST1004 --format json
+    python audit_query.py --runs
+
+Author: System Orchestrator
+Date: January 11, 2026
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from config import settings
+from utils.audit_store import AuditStore
+
+
+def print_table(rows, columns):
+    widths = [max(len(column), *(len(str(row.get(column, ''))) for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(str(row.get(column, '')).ljust(width) for column, width in zip(columns, widths)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query the audit store")
+    parser.add_argument('--db', default=str(settings.AUDIT_DB_FILE), help="Path of the SQLite audit store")
+    parser.add_argument('--runs', action='store_true', help="List the recorded runs")
+    parser.add_argument('--logs', action='store_true', help="Query unified log records instead of audit trails")
+    parser.add_argument('--customer', help="Customer ID, e.g. CUST1004")
+    parser.add_argument('--status', type=str.upper, help="Final status of the workflow (PASS / FAIL)")
+    parser.add_argument('--step', help="Workflow step, e.g. 'Risk Scoring'")
+    parser.add_argument('--agent', help="Agent ID (with --logs), e.g. LimitSetter01")
+    parser.add_argument('--since', help="Earliest timestamp or date (YYYY-MM-DD), inclusive")
+    parser.add_argument('--until', help="Latest timestamp (exclusive) or date (YYYY-MM-DD, inclusive)")
+    parser.add_argument('--run', default='all', help="Run ID, 'latest' or 'all' (default)")
+    parser.add_argument('--limit', type=int, help="Maximum number of rows")
+    parser.add_argument('--format', choices=['table', 'json'], default='table')
+    return parser.parse_args()
+
+
+def query(store, args):
+    """Rows and table columns for the requested records"""
+    if args.runs:
+        return store.runs(), ['run_id', 'recorded_at', 'workflows', 'log_records']
+    run_id = None if args.run == 'all' else store.latest_run_id() if args.run == 'latest' else args.run
+    if args.logs:
+        rows = store.log_records(customer_id=args.customer, agent_id=args.agent, since=args.since,
+                                 until=args.until, run_id=run_id, limit=args.limit)
+        return rows, ['run_id', 'customer_id', 'agent_id', 'validation_status', 'timestamp']
+    rows = store.workflows(customer_id=args.customer, status=args.status, step=args.step,
+                           since=args.since, until=args.until, run_id=run_id, limit=args.limit)
+    for row in rows:
+        row['steps'] = ", ".join(event['step'] for event in row['events'])
+    return rows, ['run_id', 'workflow_id', 'customer_id', 'final_status', 'last_event_at', 'steps']
+
+
+def main():
+    args = parse_args()
+    store = AuditStore(args.db, read_only=True)
+    try:
+        rows, columns = query(store, args)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Cannot read the audit store: {e}", file=sys.stderr)
+        return False
+    except ValueError as e:
+        # e.g. an --until date that is not YYYY-MM-DD
+        print(f"Invalid query: {e}", file=sys.stderr)
+        return False
+
+    if args.format == 'json':
+        if not args.logs:
+            for row in rows:
+                row.pop('steps', None)
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    elif rows:
+        print_table(rows, columns)
+        print(f"\n{len(rows)} row(s)")
+    else:
+        print("No matching records.")
+    return True
+
+
+if __name__ == '__main__':
+    exit(0 if main() else 1)
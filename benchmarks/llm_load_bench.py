@@ -0,0 +1,186 @@
+"""
+LLM Path Load Benchmark
+=======================
+Drives the two LLM call sites of the workflow, the Limit Setter's decision
+summaries (as with DEMO_MODE off) and the Exposure Aggregator's AI insights,
+through the LLM gateway against the mock chat-completions server
+(benchmarks/mock_llm_server.py).
+
+    python benchmarks/llm_load_bench.py                       # every mock profile
+    python benchmarks/llm_load_bench.py --profile throttled --calls 1000 --concurrency 16
+    python benchmarks/llm_load_bench.py --base-url http://127.0.0.1:8089/v1   # a server started separately
+
+Each profile and path gets a fresh mock server and gateway, with the
+timeouts, retries and circuit breaker from the LLM_* settings. Calls are made
+from `--concurrency` threads, as by several workers at once (the agents
+themselves make one call at a time). Reported per run: calls per second,
+end-to-end latency percentiles per call (including retries and backoff), the
+fallback rate, retries, errors, calls short-circuited by the breaker, breaker
+openings and the server's responses by status.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import agents.limit_setter_agent as limit_setter_agent  # noqa: E402
+from agents.exposure_aggregator_agent import ExposureAggregatorAgent  # noqa: E402
+from agents.limit_setter_agent import LimitSetterAgent  # noqa: E402
+from config import settings  # noqa: E402
+from mock_llm_server import PROFILES, MockLLMServer  # noqa: E402
+from run_benchmarks import print_table  # noqa: E402
+from utils.llm_gateway import LLMGateway, set_gateway  # noqa: E402
+
+CATEGORIES = ('Low', 'Medium', 'High')
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def limit_summary_calls():
+    """One decision summary per call, as LimitSetterAgent._reason_and_decide requests them"""
+    agent = LimitSetterAgent()
+
+    def call(i):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        previous = 50_000.0 + (i % 100) * 1_000
+        new = previous * 1.3 if category == 'Low' else previous
+        agent._generate_decision_summary(f"CUST{i:06d}", category, f"{category} Risk Policy", previous, new)
+    return call
+
+
+def insight_calls():
+    """One executive summary per call, for a synthetic exposure report"""
+    agent = ExposureAggregatorAgent()
+    rows = [{'customer_id': f"CUST{i:06d}", 'customer_name': f"Customer_{i}", 'total_open_AR': 1_000.0 + i * 37.5}
+            for i in range(500)]
+    agent.adopt_report(rows, invoices=25_000, overdue=6_000)
+
+    def call(i):
+        agent.generate_ai_insights()
+    return call
+
+
+PATHS = {'limit_summaries': limit_summary_calls, 'ai_insights': insight_calls}
+
+
+def server_stats(base_url):
+    root = base_url.rstrip('/')
+    root = root[:-len('/v1')] if root.endswith('/v1') else root
+    with urllib.request.urlopen(root + '/stats', timeout=5) as response:
+        return json.load(response)
+
+
+def run_path(profile, path, base_url, calls, concurrency):
+    """Drive one call site against the server at base_url; returns a result row"""
+    gateway = LLMGateway.from_settings()
+    set_gateway(gateway)
+    call = PATHS[path]()
+    before = server_stats(base_url)
+    latencies = [0.0] * calls
+
+    def timed_call(i):
+        started = time.perf_counter()
+        call(i)
+        latencies[i] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed_call, range(calls)))
+    seconds = time.perf_counter() - started
+    after = server_stats(base_url)
+    metrics = gateway.metrics_snapshot()
+    latencies.sort()
+    return {
+        'profile': profile,
+        'path': path,
+        'calls': calls,
+        'concurrency': concurrency,
+        'seconds': round(seconds, 3),
+        'calls_per_second': round(calls / seconds, 1),
+        'latency_p50': round(percentile(latencies, 0.50), 3),
+        'latency_p95': round(percentile(latencies, 0.95), 3),
+        'latency_p99': round(percentile(latencies, 0.99), 3),
+        'latency_max': round(latencies[-1], 3),
+        'fallback_rate': metrics['fallback_rate'],
+        'retries': metrics['retries'],
+        'errors': metrics['errors'],
+        'short_circuited': metrics['short_circuited'],
+        'breaker_opened': metrics['breaker_opened'],
+        'responses': {status: count - before.get(status, 0) for status, count in after.items()
+                      if count - before.get(status, 0)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the LLM call sites against a mock server")
+    parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                        help="Mock server profile (repeatable; default: all)")
+    parser.add_argument('--path', action='append', choices=sorted(PATHS),
+                        help="Call site to drive (repeatable; default: both)")
+    parser.add_argument('--calls', type=int, default=100, help="Calls per profile and path")
+    parser.add_argument('--concurrency', type=int, default=8, help="Threads making calls at once")
+    parser.add_argument('--base-url', help="Use a running server instead of starting the mock per profile")
+    parser.add_argument('--output', help="Also save the results as JSON")
+    parser.add_argument('--verbose', action='store_true', help="Show the gateway's warnings")
+    args = parser.parse_args()
+    if args.calls < 1 or args.concurrency < 1:
+        parser.error("--calls and --concurrency must be at least 1")
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    saved = {name: getattr(settings, name) for name in ('LLM_BASE_URL', 'LLM_MODEL', 'EXPOSURE_REPORT_OUTPUT_FILE')}
+    demo_mode = limit_setter_agent.DEMO_MODE
+    # The decision summaries only reach the gateway with DEMO_MODE off
+    limit_setter_agent.DEMO_MODE = False
+    settings.LLM_MODEL = settings.LLM_MODEL or 'mock'
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            # AI insights are written next to the exposure report
+            settings.EXPOSURE_REPORT_OUTPUT_FILE = Path(workdir) / 'exposure_report.json'
+            profiles = ['external'] if args.base_url else (args.profile or list(PROFILES))
+            for profile in profiles:
+                for path in args.path or list(PATHS):
+                    print(f"Running {path} against {profile} ({args.calls} calls, "
+                          f"concurrency {args.concurrency})...", flush=True)
+                    server = None if args.base_url else MockLLMServer.from_profile(profile, seed=1).start()
+                    settings.LLM_BASE_URL = args.base_url or server.base_url
+                    try:
+                        results.append(run_path(profile, path, settings.LLM_BASE_URL, args.calls, args.concurrency))
+                    finally:
+                        if server:
+                            server.stop()
+    finally:
+        set_gateway(None)
+        limit_setter_agent.DEMO_MODE = demo_mode
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+    print()
+    print_table([{'benchmark': f"{row['path']}, {row['profile']}", 'rows': row['calls'], 'seconds': row['seconds'],
+                  'rows_per_second': row['calls_per_second'],
+                  **{key: value for key, value in row.items()
+                     if key not in ('profile', 'path', 'calls', 'seconds', 'calls_per_second', 'responses')},
+                  'responses': ' '.join(f"{status}:{count}" for status, count in row['responses'].items())}
+                 for row in results])
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'settings': {name: getattr(settings, name) for name in (
+                'LLM_TIMEOUT_SECONDS', 'LLM_CALL_DEADLINE_SECONDS', 'LLM_MAX_RETRIES', 'LLM_BREAKER_ERROR_RATE',
+                'LLM_BREAKER_WINDOW', 'LLM_BREAKER_COOLDOWN_SECONDS')}, 'results': results}, f, indent=4)
+    return True
+
+
+if __name__ == '__main__':
+    exit(0 if main() else 1)
@@ -0,0 +1,259 @@
+"""
+Mock Chat-Completions Server
+============================
+Local stand-in for an OpenAI-compatible chat-completions endpoint, for
+performance-testing the LLM paths of the workflow without Azure.
+
+    python benchmarks/mock_llm_server.py --profile flaky --port 8089
+    python benchmarks/mock_llm_server.py --latency lognormal:0.4,0.8 --error-rate 0.05 --rate-limit-rps 20
+
+then point the workflow at it with LLM_BASE_URL=http://127.0.0.1:8089/v1 and
+LLM_MODEL=mock. Each request is answered after a delay drawn from the latency
+model; a share of requests fails with 500 (`error_rate`) or 429
+(`rate_limit_rate`), and with `rate_limit_rps` requests above that rate (a
+token bucket holding one second of requests) get a 429 with a Retry-After
+header. GET /stats returns the response counts by status.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# Named server behaviours; the load-test harness runs each of them by default
+PROFILES = {
+    'healthy': {'latency': 'lognormal:0.25,0.4'},
+    'slow-tail': {'latency': 'lognormal:0.25,1.2'},
+    'flaky': {'latency': 'lognormal:0.25,0.4', 'error_rate': 0.1, 'rate_limit_rate': 0.05},
+    'throttled': {'latency': 'lognormal:0.25,0.4', 'rate_limit_rps': 10},
+    'outage': {'latency': 'fixed:0.05', 'error_rate': 1.0},
+}
+
+_COMPLETIONS_PATH = re.compile(r'^(/v1)?/chat/completions$|^/openai/deployments/[^/]+/chat/completions$')
+
+
+class LatencyModel:
+    """
+    Response delay in seconds from a spec: 'fixed:S', 'uniform:LOW,HIGH',
+    'lognormal:MEDIAN,SIGMA' or 'exponential:MEAN'.
+    """
+
+    KINDS = {'fixed': 1, 'uniform': 2, 'lognormal': 2, 'exponential': 1}
+
+    def __init__(self, spec: str):
+        kind, _, values = spec.partition(':')
+        try:
+            params = [float(value) for value in values.split(',')] if values else []
+        except ValueError:
+            params = None
+        if kind not in self.KINDS or params is None or len(params) != self.KINDS[kind] or min(params) < 0:
+            raise ValueError(f"Invalid latency spec '{spec}' (expected e.g. fixed:0.2, uniform:0.1,0.5, "
+                             f"lognormal:0.3,0.6 or exponential:0.3)")
+        self.spec = spec
+        self.kind = kind
+        self.params = params
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return rng.uniform(*self.params)
+        if self.kind == 'lognormal':
+            median, sigma = self.params
+            return median * math.exp(rng.gauss(0, sigma)) if median else 0.0
+        return rng.expovariate(1 / self.params[0]) if self.params[0] else 0.0
+
+
+class _TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> float:
+        """0 if a request may pass, otherwise the seconds until the next one may"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class MockLLMServer:
+    """Threaded HTTP server answering chat completions with the configured latency and failures"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: str = 'fixed:0.1',
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, rate_limit_rps: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.bucket = _TokenBucket(rate_limit_rps) if rate_limit_rps else None
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.stats_lock = threading.Lock()
+        self.responses: Dict[str, int] = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @classmethod
+    def from_profile(cls, name: str, **overrides) -> "MockLLMServer":
+        return cls(**{**PROFILES[name], **overrides})
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """Serve in a background thread"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-llm", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        with self.stats_lock:
+            return dict(sorted(self.responses.items()))
+
+    def _count(self, status: int) -> None:
+        with self.stats_lock:
+            self.responses[str(status)] = self.responses.get(str(status), 0) + 1
+
+    def _draw(self):
+        """(delay, failure status or None) for one request"""
+        with self.rng_lock:
+            delay = self.latency.sample(self.rng)
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            return delay, 500
+        if roll < self.error_rate + self.rate_limit_rate:
+            return delay, 429
+        return delay, None
+
+    def completion(self, request: Dict) -> Dict:
+        """An OpenAI-style chat.completion echoing the start of the last user message"""
+        messages = request.get('messages') or [{}]
+        prompt = " ".join(str(m.get('content', '')) for m in messages)
+        words = str(messages[-1].get('content', '')).split()
+        limit = max(1, min(int(request.get('max_tokens') or 100), 60))
+        content = "Mock summary: " + " ".join(words[:limit])
+        prompt_tokens = len(prompt.split())
+        completion_tokens = len(content.split())
+        return {
+            'id': f"chatcmpl-mock-{next(self.ids)}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model') or 'mock',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                         'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: Dict, headers: Optional[Dict] = None, count: bool = True) -> None:
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+                if count:
+                    server._count(status)
+
+            def do_GET(self):
+                if self.path.rstrip('/') == '/stats':
+                    self._reply(200, server.stats(), count=False)
+                else:
+                    self._reply(404, {'error': {'message': 'not found'}})
+
+            def do_POST(self):
+                path = self.path.split('?')[0]
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._reply(400, {'error': {'message': 'invalid JSON body', 'type': 'invalid_request_error'}})
+                    return
+                if not _COMPLETIONS_PATH.match(path):
+                    self._reply(404, {'error': {'message': f"unknown path {path}"}})
+                    return
+                if server.bucket is not None:
+                    wait = server.bucket.take()
+                    if wait:
+                        self._reply(429, {'error': {'message': 'Rate limit exceeded', 'type': 'rate_limit_error'}},
+                                    {'Retry-After': f"{wait:.2f}"})
+                        return
+                delay, failure = server._draw()
+                time.sleep(delay)
+                if failure == 500:
+                    self._reply(500, {'error': {'message': 'Mock server error', 'type': 'server_error'}})
+                elif failure == 429:
+                    self._reply(429, {'error': {'message': 'Rate limit exceeded', 'type': 'rate_limit_error'}},
+                                {'Retry-After': '1'})
+                else:
+                    self._reply(200, server.completion(request))
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat-completions server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='healthy',
+                        help="Named behaviour; the options below override its values")
+    parser.add_argument('--latency', help="fixed:S | uniform:LOW,HIGH | lognormal:MEDIAN,SIGMA | exponential:MEAN")
+    parser.add_argument('--error-rate', type=float, help="Share of requests answered with 500")
+    parser.add_argument('--rate-limit-rate', type=float, help="Share of requests answered with 429")
+    parser.add_argument('--rate-limit-rps', type=float, help="Requests per second above which 429 is returned")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    overrides = {name: value for name, value in (
+        ('latency', args.latency), ('error_rate', args.error_rate), ('rate_limit_rate', args.rate_limit_rate),
+        ('rate_limit_rps', args.rate_limit_rps)) if value is not None}
+    try:
+        server = MockLLMServer.from_profile(args.profile, host=args.host, port=args.port, seed=args.seed,
+                                            **overrides)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Mock chat-completions server ({args.profile}) at {server.base_url}; stats at /stats", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats()), file=sys.stderr)
+    return True
+
+
+if __name__ == '__main__':
+    exit(0 if main() else 1)
@@ -0,0 +1,354 @@
+"""
+Benchmarks
+==========
+Micro and stage-level benchmarks on synthetic data of configurable size.
+
+    python benchmarks/run_benchmarks.py                 # all benchmarks
+    python benchmarks/run_benchmarks.py fx --rows 2000000
+    python benchmarks/run_benchmarks.py --output data/output/benchmarks.json
+
+Each benchmark returns a list of result rows (name, rows, seconds, rows/s
+plus benchmark-specific fields), which are printed as a table and optionally
+saved as JSON. Synthetic inputs are written to a temporary directory.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.exposure_aggregator_agent import AR_COLUMNS, _merge_ar_chunks, _reduce_ar_chunk  # noqa: E402
+from config import settings  # noqa: E402
+from utils.cluster import ShardCoordinator  # noqa: E402
+from utils.csv_index import load_index  # noqa: E402
+from utils.dates import to_day  # noqa: E402
+from utils.fast_csv import iter_range_partials, parse_csv  # noqa: E402
+from utils.fx import FxRateTable  # noqa: E402
+from utils.money import from_cents  # noqa: E402
+from utils.sampling import block_strata, interval, sample_strata, stratified_total  # noqa: E402
+from utils.schema import Quarantine, load_schemas  # noqa: E402
+
+CURRENCIES = ['USD', 'EUR', 'GBP', 'JPY', 'CAD', 'CHF', 'INR', 'AUD']
+FIRST_DAY = date(2025, 1, 1).toordinal()
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def result_row(name, rows, seconds, **extra):
+    return {'benchmark': name, 'rows': rows, 'seconds': round(seconds, 4),
+            'rows_per_second': round(rows / seconds) if seconds else None, **extra}
+
+
+def synthetic_rate_table(days: int = 400) -> FxRateTable:
+    rng = random.Random(1)
+    rates = {}
+    for currency in CURRENCIES[1:]:
+        value = rng.uniform(0.005, 1.5)
+        points = []
+        for day in range(FIRST_DAY, FIRST_DAY + days):
+            value *= 1 + rng.uniform(-0.005, 0.005)
+            points.append((day, value))
+        rates[currency] = points
+    return FxRateTable(rates, base_currency='USD')
+
+
+def write_synthetic_ar(path: Path, rows: int, customers: int, days: int = 400) -> None:
+    rng = random.Random(2)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['CUSTOMER_ID', 'INVOICE_NO', 'AMOUNT', 'DUE_DATE', 'STATUS', 'AGING_BUCKET', 'RISK_WEIGHT'])
+        for i in range(rows):
+            due = date.fromordinal(FIRST_DAY + rng.randrange(days)).isoformat()
+            writer.writerow([f"CUST{rng.randrange(customers):06d}", f"INV{i:08d}", round(rng.uniform(10, 50000), 2),
+                             due, rng.choice(['OPEN', 'OVERDUE']), '0-30 days', 0.1])
+
+
+@benchmark('fx')
+def bench_fx(rows: int, workdir: Path):
+    """FX conversion: per-invoice lookups vs the cached, batched conversion used by the aggregator"""
+    rng = random.Random(3)
+    currencies = [rng.choice(CURRENCIES) for _ in range(rows)]
+    days = [FIRST_DAY + rng.randrange(400) for _ in range(rows)]
+    amounts = [rng.uniform(10, 50000) for _ in range(rows)]
+    results = []
+
+    table = synthetic_rate_table()
+    uncached = min(rows, 200_000)
+
+    def per_invoice_uncached():
+        total = 0.0
+        for currency, day, amount in zip(currencies[:uncached], days[:uncached], amounts[:uncached]):
+            table.cache.clear()
+            total += amount * table.rate(currency, 'USD', day)
+        return total
+    _, seconds = timed(per_invoice_uncached)
+    results.append(result_row('fx: per-invoice lookup, no cache', uncached, seconds))
+
+    table = synthetic_rate_table()
+
+    def per_invoice_cached():
+        return sum(amount * table.rate(currency, 'USD', day)
+                   for currency, day, amount in zip(currencies, days, amounts))
+    _, seconds = timed(per_invoice_cached)
+    results.append(result_row('fx: per-invoice lookup, cached', rows, seconds, rate_lookups=table.lookups))
+
+    table = synthetic_rate_table()
+    _, seconds = timed(table.convert_batch, currencies, days, amounts, 'USD')
+    results.append(result_row('fx: convert_batch', rows, seconds, rate_lookups=table.lookups))
+
+    # End to end: AR CSV aggregation with every customer in the reporting currency vs all foreign
+    customers = max(1, rows // 50)
+    ar_file = workdir / 'ar.csv'
+    write_synthetic_ar(ar_file, rows, customers)
+    _, base_seconds = timed(parse_csv, ar_file, AR_COLUMNS, _reduce_ar_chunk, _merge_ar_chunks)
+    results.append(result_row('fx: AR aggregation, reporting currency only', rows, base_seconds))
+
+    customer_ids = [f"CUST{i:06d}" for i in range(customers)]
+    customer_currency = {c: CURRENCIES[1 + i % (len(CURRENCIES) - 1)] for i, c in enumerate(customer_ids)}
+    table = synthetic_rate_table()
+
+    def aggregate_and_convert():
+        result = parse_csv(ar_file, AR_COLUMNS, partial(_reduce_ar_chunk, fx_customers=frozenset(customer_ids)),
+                           _merge_ar_chunks)
+        keys = list(result['fx_buckets'])
+        return table.convert_batch([customer_currency[c] for c, _ in keys], [d for _, d in keys],
+                                   [from_cents(result['fx_buckets'][k]) for k in keys], 'USD')
+    _, seconds = timed(aggregate_and_convert)
+    results.append(result_row('fx: AR aggregation, all customers converted', rows, seconds,
+                              overhead_pct=round((seconds / base_seconds - 1) * 100, 1), rate_lookups=table.lookups))
+    return results
+
+
+@benchmark('dates')
+def bench_dates(rows: int, workdir: Path):
+    """Date column conversion: strptime and fromisoformat per row vs the memoised day table"""
+    rng = random.Random(4)
+    dates = [date.fromordinal(FIRST_DAY + rng.randrange(400)).isoformat() for _ in range(rows)]
+    days, memo_seconds = timed(lambda: list(map(to_day, dates)))
+    expected, iso_seconds = timed(lambda: [date.fromisoformat(value).toordinal() for value in dates])
+    _, strptime_seconds = timed(lambda: [datetime.strptime(value, '%Y-%m-%d').toordinal() for value in dates])
+    assert days == expected
+    return [result_row('dates: datetime.strptime per row', rows, strptime_seconds),
+            result_row('dates: date.fromisoformat per row', rows, iso_seconds),
+            result_row('dates: memoised to_day', rows, memo_seconds, distinct_dates=len(set(dates)),
+                       speedup_vs_strptime=round(strptime_seconds / memo_seconds, 1))]
+
+
+@benchmark('cents')
+def bench_cents(rows: int, workdir: Path):
+    """Per-customer AR totals: float accumulation vs exact integer cents"""
+    customers = max(1, rows // 50)
+    ar_file = workdir / 'ar_cents.csv'
+    write_synthetic_ar(ar_file, rows, customers)
+
+    # Same reducer, with amounts parsed as floats instead of cents
+    floats, float_seconds = timed(parse_csv, ar_file, dict(AR_COLUMNS, AMOUNT='float'),
+                                  _reduce_ar_chunk, _merge_ar_chunks)
+    result, cents_seconds = timed(parse_csv, ar_file, AR_COLUMNS, _reduce_ar_chunk, _merge_ar_chunks)
+
+    # Customers whose float total, rounded at the end as before, is off by a cent or more
+    drifted = sum(1 for customer_id, cents in result['totals'].items()
+                  if round(floats['totals'][customer_id], 2) != from_cents(cents))
+    return [result_row('cents: AR totals, float accumulation', rows, float_seconds),
+            result_row('cents: AR totals, integer cents', rows, cents_seconds,
+                       overhead_pct=round((cents_seconds / float_seconds - 1) * 100, 1),
+                       drifted_customers=drifted)]
+
+
+@benchmark('validation')
+def bench_validation(rows: int, workdir: Path):
+    """AR ingest with and without schema validation and quarantine"""
+    customers = max(1, rows // 50)
+    ar_file = workdir / 'ar_validation.csv'
+    write_synthetic_ar(ar_file, rows, customers)
+    schema = load_schemas()['open_AR_records_sample.csv']
+    customer_ids = [f"CUST{i:06d}" for i in range(customers)]
+
+    # Unchecked parsing would stop at the bad rows, so they go into a copy
+    bad_file = workdir / 'ar_validation_bad.csv'
+    shutil.copyfile(ar_file, bad_file)
+    bad_rows = [['CUST999999', 'INVBAD1', '10.00', '2025-01-01', 'OPEN', '0-30 days', 0.1],
+                ['CUST000001', 'INVBAD2', 'n/a', '2025-01-01', 'OPEN', '0-30 days', 0.1],
+                ['CUST000001', 'INVBAD3', '10.00', '2025-02-30', 'OPEN', '0-30 days', 0.1],
+                ['CUST000001', 'INVBAD4', '10.00', '2025-01-01', 'PAID', '0-30 days', 1.5]]
+    with open(bad_file, 'a', newline='') as f:
+        csv.writer(f).writerows(bad_rows)
+    # Best of five interleaved runs each, as the difference is small next to timing noise
+    plain_runs, validated_runs = [], []
+    for _ in range(5):
+        plain_runs.append(timed(parse_csv, ar_file, AR_COLUMNS, _reduce_ar_chunk, _merge_ar_chunks)[1])
+        quarantine = Quarantine(bad_file, schema=schema, persist=False)
+        # A new set of known customers each run, so no run reuses the check tables of the last
+        references = {'customers': frozenset(customer_ids)}
+        validated_runs.append(timed(parse_csv, bad_file, AR_COLUMNS, _reduce_ar_chunk, _merge_ar_chunks,
+                                    quarantine=quarantine, references=references)[1])
+    plain_seconds, validated_seconds = min(plain_runs), min(validated_runs)
+    return [result_row('validation: AR ingest, unchecked', rows, plain_seconds),
+            result_row('validation: AR ingest, schema + quarantine', rows + len(bad_rows), validated_seconds,
+                        overhead_pct=round((validated_seconds / plain_seconds - 1) * 100, 1),
+                        rejected_rows=len(quarantine.rejected))]
+
+
+@benchmark('preview')
+def bench_preview(rows: int, workdir: Path):
+    """Total open AR: full parse vs the preview's stratified sample of file blocks"""
+    customers = max(1, rows // 50)
+    ar_file = workdir / 'ar_preview.csv'
+    write_synthetic_ar(ar_file, rows, customers)
+    result, full_seconds = timed(parse_csv, ar_file, AR_COLUMNS, _reduce_ar_chunk, _merge_ar_chunks)
+    exact = from_cents(sum(result['totals'].values()))
+
+    def estimate():
+        strata = block_strata(ar_file, settings.PREVIEW_BLOCK_BYTES, settings.PREVIEW_SAMPLE_FRACTION,
+                              settings.PREVIEW_MAX_STRATA)
+        sample = sample_strata(strata, settings.PREVIEW_SAMPLE_FRACTION, random.Random(settings.PREVIEW_SEED))
+        per_stratum = []
+        for key, blocks in sample.items():
+            values = [from_cents(sum(result['totals'].values()))
+                      for result in iter_range_partials(ar_file, blocks, AR_COLUMNS, _reduce_ar_chunk)]
+            per_stratum.append((len(strata[key]), values))
+        return interval(*stratified_total(per_stratum), settings.PREVIEW_CONFIDENCE)
+    preview, preview_seconds = timed(estimate)
+    return [result_row('preview: total open AR, full parse', rows, full_seconds),
+            result_row('preview: total open AR, block sample', rows, preview_seconds,
+                       fraction_of_full_pct=round(preview_seconds / full_seconds * 100, 1),
+                       error_pct=round((preview['estimate'] / exact - 1) * 100, 3),
+                       within_interval=preview['low'] <= exact <= preview['high'])]
+
+
+def write_synthetic_inputs(workdir: Path, rows: int, customers: int) -> None:
+    """Customer list, ERP master, credit bureau, AR records and payment history under their input file names"""
+    rng = random.Random(4)
+    ids = [f"CUST{i:06d}" for i in range(customers)]
+    with open(workdir / 'customer_id_list.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['CUSTOMER_ID', 'NAME', 'COUNTRY'])
+        writer.writerows([customer_id, f"Customer_{i}", 'US'] for i, customer_id in enumerate(ids))
+    with open(workdir / 'ERP_customer_master.json', 'w') as f:
+        json.dump([{'customer_id': c, 'current_limit': rng.randrange(10_000, 500_000), 'currency': 'USD'}
+                   for c in ids], f)
+    with open(workdir / 'credit_bureau_api_response.json', 'w') as f:
+        json.dump([{'customer_id': c, 'credit_score': rng.randrange(600, 850)} for c in ids], f)
+    with open(workdir / 'ERP_AR_extract.json', 'w') as f:
+        json.dump({'records': []}, f)
+    write_synthetic_ar(workdir / 'open_AR_records_sample.csv', rows, customers)
+    with open(workdir / 'payment_history.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['CUSTOMER_ID', 'INVOICE_NO', 'AMOUNT', 'DUE_DATE', 'PAYMENT_DATE', 'STATUS'])
+        for i in range(rows // 2):
+            due = FIRST_DAY + rng.randrange(400)
+            writer.writerow([rng.choice(ids), f"PAY{i:08d}", round(rng.uniform(10, 50000), 2),
+                             date.fromordinal(due).isoformat(),
+                             date.fromordinal(due + rng.randrange(-5, 60)).isoformat(), 'PAID'])
+
+
+@benchmark('cluster')
+def bench_cluster(rows: int, workdir: Path):
+    """Exposure and risk stages in customer shards on 1, 2 and 4 local cluster workers"""
+    customers = max(1, rows // 50)
+    inputs = workdir / 'cluster'
+    inputs.mkdir(exist_ok=True)
+    write_synthetic_inputs(inputs, rows, customers)
+    overrides = {
+        'CUSTOMER_LIST_FILE': inputs / 'customer_id_list.csv',
+        'ERP_CUSTOMER_FILE': inputs / 'ERP_customer_master.json',
+        'CREDIT_BUREAU_FILE': inputs / 'credit_bureau_api_response.json',
+        'JSON_EXTRACT_FILE': inputs / 'ERP_AR_extract.json',
+        'CSV_RECORDS_FILE': inputs / 'open_AR_records_sample.csv',
+        'CSV_RECORDS_INDEX_FILE': inputs / 'open_AR_records_sample.csv.idx',
+        'PAYMENT_HISTORY_FILE': inputs / 'payment_history.csv',
+        'PAYMENT_HISTORY_INDEX_FILE': inputs / 'payment_history.csv.idx',
+        'QUARANTINE_DIR': inputs / 'quarantine',
+    }
+    saved = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        load_index(settings.CSV_RECORDS_FILE, 'CUSTOMER_ID', settings.CSV_RECORDS_INDEX_FILE)
+        load_index(settings.PAYMENT_HISTORY_FILE, 'CUSTOMER_ID', settings.PAYMENT_HISTORY_INDEX_FILE)
+        ordered = [f"CUST{i:06d}" for i in range(customers)]
+        # The same shards for every worker count, so only the number of workers changes
+        count = min(customers, 4 * settings.CLUSTER_SHARDS_PER_WORKER)
+        shards = [ordered[i * customers // count:(i + 1) * customers // count] for i in range(count)]
+        main_py = str(Path(__file__).resolve().parent.parent / 'main.py')
+        results = []
+        baseline = None
+        for workers in (1, 2, 4):
+            coordinator = ShardCoordinator([{'customers': shard, 'stages': ['exposure', 'risk']} for shard in shards],
+                                           [len(shard) for shard in shards], local_workers=workers,
+                                           worker_command=[sys.executable, main_py])
+            _, seconds = timed(coordinator.run)
+            throughput = customers / seconds
+            baseline = baseline or throughput
+            results.append(result_row(f"cluster: exposure + risk, {workers} worker(s)", rows, seconds,
+                                      customers_per_second=round(throughput, 1),
+                                      speedup=round(throughput / baseline, 2),
+                                      efficiency_pct=round(throughput / baseline / workers * 100, 1),
+                                      retries=coordinator.retries))
+        return results
+    finally:
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+
+def print_table(results):
+    columns = ['benchmark', 'rows', 'seconds', 'rows_per_second']
+    extra = sorted({key for row in results for key in row} - set(columns))
+    columns += extra
+    widths = [max(len(c), *(len(str(row.get(c, ''))) for row in results)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in results:
+        print("  ".join(str(row.get(c, '')).ljust(w) for c, w in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the workflow benchmarks")
+    parser.add_argument('names', nargs='*', metavar='NAME',
+                        help=f"Benchmarks to run (default: all of {', '.join(sorted(BENCHMARKS))})")
+    parser.add_argument('--rows', type=int, default=500_000, help="Synthetic rows per benchmark")
+    parser.add_argument('--output', help="Also save the results as JSON")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.names or sorted(BENCHMARKS):
+            print(f"Running {name} ({args.rows:,} rows)...", flush=True)
+            results.extend(BENCHMARKS[name](args.rows, Path(workdir)))
+    print()
+    print_table(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'cpu_count': os.cpu_count(),
+                       'csv_parse_workers': settings.CSV_PARSE_WORKERS, 'results': results}, f, indent=4)
+    return True
+
+
+if __name__ == '__main__':
+    exit(0 if main() else 1)
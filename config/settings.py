@@ -20,15 +20,44 @@ AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
 
+# ==================== LLM GATEWAY ====================
+
+# OpenAI-compatible chat-completions endpoint; when set it is used instead of Azure
+# (e.g. http://127.0.0.1:8089/v1 for benchmarks/mock_llm_server.py)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_API_KEY = os.getenv("LLM_API_KEY", "local-key")
+LLM_MODEL = os.getenv("LLM_MODEL") or AZURE_OPENAI_DEPLOYMENT_NAME
+
+# Per-attempt timeout and overall deadline (across retries) for one call, in seconds
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_CALL_DEADLINE_SECONDS = float(os.getenv("LLM_CALL_DEADLINE_SECONDS", "45"))
+
+# Retries for timeouts, connection errors, 429 and 5xx responses
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+
+# Circuit breaker: open when the error rate over the last WINDOW attempts reaches
+# ERROR_RATE (after MIN_CALLS attempts); retry the endpoint after COOLDOWN seconds
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
 # ==================== INPUT DATA PATHS ====================
 
 # Agent 1 (Exposure Aggregator) - Input Files
 CUSTOMER_LIST_FILE = BASE_DIR / 'data' / 'input' / 'customer_id_list.csv'
 JSON_EXTRACT_FILE = BASE_DIR / 'data' / 'input' / 'ERP_AR_extract.json'
 CSV_RECORDS_FILE = BASE_DIR / 'data' / 'input' / 'open_AR_records_sample.csv'
+# Sidecar CUSTOMER_ID -> byte-range index of the AR records, used by cluster shards
+CSV_RECORDS_INDEX_FILE = BASE_DIR / 'data' / 'input' / 'open_AR_records_sample.csv.idx'
+FX_RATES_FILE = BASE_DIR / 'data' / 'input' / 'fx_rates.csv'
 
 # Agent 2 (Risk Scoring) - Input Files
 PAYMENT_HISTORY_FILE = BASE_DIR / 'data' / 'input' / 'payment_history.csv'
+# Sidecar CUSTOMER_ID -> byte-range index, rebuilt automatically when the history changes
+PAYMENT_HISTORY_INDEX_FILE = BASE_DIR / 'data' / 'input' / 'payment_history.csv.idx'
 CREDIT_BUREAU_FILE = BASE_DIR / 'data' / 'input' / 'credit_bureau_api_response.json'
 
 # Agent 3 (Limit Setter) - Input Files
@@ -56,6 +85,151 @@ UNIFIED_LOG_FILE = BASE_DIR / 'data' / 'output' / 'all_agents_logs.json'
 # Final audit trail (created by Audit Logger Agent)
 AUDIT_TRAIL_FILE = BASE_DIR / 'data' / 'output' / 'audit_trail.json'
 
+# ==================== AUDIT STORE ====================
+
+# SQLite history of every run's audit trail, kept across runs (`python audit_query.py`)
+AUDIT_STORE_ENABLED = os.getenv("AUDIT_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+AUDIT_DB_FILE = BASE_DIR / 'data' / 'audit' / 'audit_store.db'
+
+# Also store every unified log record (the agents' full outputs per customer)
+AUDIT_STORE_UNIFIED_LOG = os.getenv("AUDIT_STORE_UNIFIED_LOG", "true").lower() in ("1", "true", "yes")
+
+# Rows per executemany batch
+AUDIT_STORE_BATCH_SIZE = int(os.getenv("AUDIT_STORE_BATCH_SIZE", "500"))
+
+# ==================== WHAT-IF SIMULATION ====================
+
+# Grid of risk weights, category thresholds and policy percentages (`python main.py --what-if`)
+WHAT_IF_SCENARIOS_FILE = BASE_DIR / 'config' / 'what_if_scenarios.json'
+WHAT_IF_REPORT_FILE = BASE_DIR / 'data' / 'output' / 'what_if_report.json'
+
+# ==================== PREVIEW ====================
+
+# Share of customers (per country) and of AR file blocks read by `python main.py --preview`
+PREVIEW_SAMPLE_FRACTION = float(os.getenv("PREVIEW_SAMPLE_FRACTION", "0.02"))
+
+# Size of the AR file blocks sampled as units, and the most file-position strata they are grouped in
+PREVIEW_BLOCK_BYTES = int(os.getenv("PREVIEW_BLOCK_BYTES", str(64 * 1024)))
+PREVIEW_MAX_STRATA = int(os.getenv("PREVIEW_MAX_STRATA", "20"))
+
+# Confidence level of the reported intervals
+PREVIEW_CONFIDENCE = float(os.getenv("PREVIEW_CONFIDENCE", "0.95"))
+
+# Seed of the sample draw (the same inputs and seed give the same preview)
+PREVIEW_SEED = int(os.getenv("PREVIEW_SEED", "1"))
+
+PREVIEW_REPORT_FILE = BASE_DIR / 'data' / 'output' / 'preview_report.json'
+
+# ==================== OUTPUT SERIALIZATION ====================
+
+# Format of the JSON outputs: json (pretty, default) | compact | ndjson
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "json")
+
+# Compression of the JSON outputs: none | gzip | zstd (zstd needs `zstandard`)
+OUTPUT_COMPRESSION = os.getenv("OUTPUT_COMPRESSION", "none")
+
 # ==================== LOGS ====================
 
 LOG_FILE = BASE_DIR / 'logs' / 'agent.log'
+
+# Log file layout: json (one structured record per line) | text
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+# Log every customer in the agents' hot loops (otherwise counts and rates only)
+LOG_CUSTOMER_DETAIL = os.getenv("LOG_CUSTOMER_DETAIL", "false").lower() in ("1", "true", "yes")
+
+# Also keep the detail of every Nth customer (0 disables sampling)
+LOG_CUSTOMER_SAMPLE_EVERY = int(os.getenv("LOG_CUSTOMER_SAMPLE_EVERY", "0"))
+
+# Minimum seconds between progress lines of a per-customer loop
+LOG_PROGRESS_INTERVAL_SECONDS = float(os.getenv("LOG_PROGRESS_INTERVAL_SECONDS", "5"))
+
+# ==================== ORCHESTRATION ====================
+
+# Worker threads used to run independent workflow tasks concurrently
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+
+# Per-run timing report with the critical path
+RUN_REPORT_FILE = BASE_DIR / 'data' / 'output' / 'run_report.json'
+
+# ==================== CHECKPOINTS ====================
+
+# Stage markers and partial results for `python main.py --resume`
+CHECKPOINT_DIR = BASE_DIR / 'data' / 'output' / 'checkpoints'
+
+# Number of Limit Setter decisions buffered before a checkpoint chunk is written
+CHECKPOINT_CHUNK_SIZE = int(os.getenv("CHECKPOINT_CHUNK_SIZE", "25"))
+
+# ==================== CURRENCY ====================
+
+# Currency the exposure report (and everything downstream) is expressed in
+REPORTING_CURRENCY = os.getenv("REPORTING_CURRENCY", "USD").upper()
+
+# Currency the RATE column of FX_RATES_FILE is quoted in
+FX_RATE_BASE_CURRENCY = os.getenv("FX_RATE_BASE_CURRENCY", "USD").upper()
+
+# Convert every invoice at this date's rates (YYYY-MM-DD); empty = each invoice's DUE_DATE
+FX_VALUATION_DATE = os.getenv("FX_VALUATION_DATE", "")
+
+# ==================== INPUT PARSING ====================
+
+# Worker processes for parsing large CSV inputs (0 = one per CPU)
+CSV_PARSE_WORKERS = int(os.getenv("CSV_PARSE_WORKERS", "0"))
+
+# Size of the byte ranges a large CSV file is split into
+CSV_CHUNK_BYTES = int(os.getenv("CSV_CHUNK_BYTES", str(16 * 1024 * 1024)))
+
+# Files smaller than this are parsed in-process as a single range
+CSV_PARALLEL_MIN_BYTES = int(os.getenv("CSV_PARALLEL_MIN_BYTES", str(32 * 1024 * 1024)))
+
+# ==================== MEMORY BUDGET ====================
+
+# Process memory (RSS) limit for aggregation in MB; above it, partial per-customer
+# aggregates are spilled to sorted run files and merged at the end (0 = no limit)
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "0"))
+
+# Directory for spill run files (removed after each merge)
+SPILL_DIR = BASE_DIR / 'data' / 'output' / 'spill'
+
+# Additions between two memory measurements
+SPILL_CHECK_EVERY = int(os.getenv("SPILL_CHECK_EVERY", "10000"))
+
+# ==================== CLUSTER ====================
+
+# Address the coordinator of `python main.py --cluster N` listens on (port 0 = any free port);
+# workers on other nodes join with `python main.py --worker HOST:PORT`
+CLUSTER_HOST = os.getenv("CLUSTER_HOST", "127.0.0.1")
+CLUSTER_PORT = int(os.getenv("CLUSTER_PORT", "0"))
+
+# Shared secret workers present when they connect; required unless CLUSTER_HOST is a
+# loopback address, where a random one is generated for the local workers
+CLUSTER_TOKEN = os.getenv("CLUSTER_TOKEN", "")
+
+# Customer shards per worker; smaller shards balance load and make retries cheaper
+CLUSTER_SHARDS_PER_WORKER = int(os.getenv("CLUSTER_SHARDS_PER_WORKER", "4"))
+
+# Attempts per shard before the run fails
+CLUSTER_MAX_ATTEMPTS = int(os.getenv("CLUSTER_MAX_ATTEMPTS", "3"))
+
+# Workers send a heartbeat this often while working on a shard; a worker silent for
+# CLUSTER_WORKER_TIMEOUT_SECONDS is treated as failed and its shard is retried elsewhere
+CLUSTER_HEARTBEAT_SECONDS = float(os.getenv("CLUSTER_HEARTBEAT_SECONDS", "2"))
+CLUSTER_WORKER_TIMEOUT_SECONDS = float(os.getenv("CLUSTER_WORKER_TIMEOUT_SECONDS", "30"))
+
+# A shard without a result after this long is retried elsewhere even if its worker
+# still sends heartbeats (a local worker is killed and restarted)
+CLUSTER_SHARD_TIMEOUT_SECONDS = float(os.getenv("CLUSTER_SHARD_TIMEOUT_SECONDS", "600"))
+
+# Local worker processes restarted after they exit unexpectedly (in total, per run)
+CLUSTER_WORKER_RESTARTS = int(os.getenv("CLUSTER_WORKER_RESTARTS", "3"))
+
+# ==================== INPUT VALIDATION ====================
+
+# Validate input files against their declared schemas during ingest
+INPUT_VALIDATION_ENABLED = os.getenv("INPUT_VALIDATION_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Declared schemas of the files under data/input
+INPUT_SCHEMAS_FILE = BASE_DIR / 'config' / 'input_schemas.json'
+
+# Rejected input rows with their reasons (<input file>.rejected.csv)
+QUARANTINE_DIR = BASE_DIR / 'data' / 'output' / 'quarantine'
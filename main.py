@@ -2,47 +2,321 @@
 Main Orchestrator for Complete Customer Credit Assessment Process
 ==================================================================
 
-This orchestrator runs all 4 agents in sequence:
+This orchestrator runs all 4 agents as a dependency graph:
 1. Exposure Aggregator Agent - Aggregates customer AR exposure data
 2. Risk Scoring Agent - Calculates customer risk scores
 3. Limit Setter Agent - Determines credit limits based on risk
 4. Audit Logger Agent - Creates final audit trail
 
+Independent work (policy data loading, the CSV copy of the exposure report,
+AI insights) overlaps with the main chain, and each run writes a timing report
+naming the critical path. Each completed stage leaves a checkpoint marker, so
+an interrupted run can be continued with `python main.py --resume`.
+
+`python main.py --customers CUST1001,CUST1004` re-scores only the listed
+customers against the existing exposure report: their payment history is read
+through the sidecar offset index, and only their records are replaced in the
+risk score and credit limit outputs before the unified log and audit trail are
+rebuilt.
+
+`python main.py --what-if` evaluates the scenario grid in
+config/what_if_scenarios.json against the current outputs instead of running
+the workflow (see agents/what_if_simulator_agent.py).
+
+`python main.py --preview` estimates the portfolio exposure, risk-category mix
+and total limit uplift of a full run from stratified samples of customers and
+invoices, with confidence intervals (see agents/preview_agent.py).
+
+`python main.py --cluster 4` splits the customers into shards and runs the
+exposure, risk and limit stages of each shard on 4 local worker processes
+over sockets; workers on other nodes can join with
+`python main.py --worker HOST:PORT` (see utils/cluster.py). Failed shards are
+retried on other workers, and the run report shows the throughput per worker.
+
 Author: System Orchestrator
 Date: January 11, 2026
 """
 
+import argparse
 import logging
 import os
+import socket
+import sys
 from pathlib import Path
-from agents.exposure_aggregator_agent import ExposureAggregatorAgent
-from agents.risk_scoring_agent import RiskScoringAgent
+from agents.exposure_aggregator_agent import AR_COLUMNS, ExposureAggregatorAgent
+from agents.risk_scoring_agent import PAYMENT_COLUMNS, RiskScoringAgent
 from agents.limit_setter_agent import LimitSetterAgent
 from agents.merger_agent import MergerAgent
 from agents.audit_logger_agent import AuditLoggerAgent
+from agents.preview_agent import PreviewEstimatorAgent
+from agents.what_if_simulator_agent import WhatIfSimulatorAgent
 from config import settings
+from utils.audit_store import new_run_id
+from utils.checkpoint import CheckpointManager
+from utils.cluster import ShardCoordinator, serve_worker
+from utils.csv_index import load_index, read_keys
+from utils.llm_gateway import get_gateway
+from utils.log_setup import setup_logging, stop_logging
+from utils.scheduler import DAGScheduler, Task
+from utils.schema import Quarantine, known_customers, read_json_records, take_partial_rejections, validation_report
+from utils.serialization import OutputWriter
+from utils.spill import memory_report
+
+
+def build_workflow(scheduler, checkpoint, writer, run_id):
+    """
+    Declares the workflow as tasks with explicit inputs and outputs.
+    The scheduler derives the dependency graph from these artifacts, so
+    loading policy data, the CSV copy of the exposure report and AI insights
+    overlap with the main chain of agents.
+    """
+    exposure_agent = ExposureAggregatorAgent()
+    limit_agent = LimitSetterAgent(checkpoint=checkpoint)
+
+    scheduler.add(Task(
+        "EXPOSURE AGGREGATOR AGENT",
+        lambda r: exposure_agent.run(write_csv_copy=False, generate_insights=False),
+        outputs=["exposure_report"],
+        files=[writer.output_path(settings.EXPOSURE_REPORT_OUTPUT_FILE)]))
+    scheduler.add(Task(
+        "EXPOSURE CSV REPORT", lambda r: exposure_agent.write_csv_report(),
+        inputs=["exposure_report"], outputs=["exposure_report_csv"],
+        files=[Path(settings.EXPOSURE_REPORT_OUTPUT_FILE).parent / "exposure_report.csv"],
+        required=False))
+    scheduler.add(Task(
+        "AI INSIGHTS", lambda r: exposure_agent.generate_ai_insights(),
+        inputs=["exposure_report"], outputs=["ai_insights"],
+        required=False, checkpointed=False))
+    scheduler.add(Task(
+        "RISK SCORING AGENT", lambda r: RiskScoringAgent().run(),
+        inputs=["exposure_report"], outputs=["risk_scores"],
+        files=[writer.output_path(settings.RISK_SCORE_OUTPUT_FILE)]))
+    scheduler.add(Task(
+        "PAYMENT HISTORY INDEX", lambda r: refresh_payment_index(),
+        outputs=["payment_index"], required=False, checkpointed=False))
+    add_decision_tasks(scheduler, limit_agent, writer, run_id, upstream=["exposure_report"])
+
+
+def add_decision_tasks(scheduler, limit_agent, writer, run_id, upstream):
+    """Limit policy data, Limit Setter, Merger and Audit Logger tasks shared by full and targeted runs"""
+
+    def run_limit_setter(resume):
+        limit_agent.resume = resume
+        return limit_agent.run()
+
+    scheduler.add(Task(
+        "LIMIT POLICY DATA", lambda r: limit_agent.load_policy_data(),
+        outputs=["policy_data"], required=False, checkpointed=False))
+    scheduler.add(Task(
+        "LIMIT SETTER AGENT", run_limit_setter,
+        inputs=["risk_scores", "policy_data"], outputs=["credit_limits"],
+        files=[writer.output_path(settings.OUTPUT_FILE)], required=False))
+    add_log_tasks(scheduler, writer, run_id, upstream)
+
+
+def add_log_tasks(scheduler, writer, run_id, upstream):
+    """Merger and Audit Logger tasks, run once the exposure, risk and limit outputs exist"""
+    scheduler.add(Task(
+        "MERGER AGENT", lambda r: MergerAgent().run(),
+        inputs=upstream + ["risk_scores", "credit_limits"], outputs=["unified_log"],
+        files=[writer.output_path(settings.UNIFIED_LOG_FILE)], required=False))
+    scheduler.add(Task(
+        "AUDIT LOGGER AGENT", lambda r: AuditLoggerAgent(run_id=run_id).run(),
+        inputs=["unified_log"], outputs=["audit_trail"],
+        files=[writer.output_path(settings.AUDIT_TRAIL_FILE)], required=False))
+
+
+def build_targeted_workflow(scheduler, writer, run_id, customers):
+    """
+    Re-scores `customers` only. The exposure report of the last full run is
+    reused; risk scores and credit limits are updated for these customers
+    and the unified log and audit trail are rebuilt from the updated outputs.
+    """
+    limit_agent = LimitSetterAgent(customers=customers)
+    scheduler.add(Task(
+        "RISK SCORING AGENT", lambda r: RiskScoringAgent(customers=customers).run(),
+        outputs=["risk_scores"], checkpointed=False))
+    add_decision_tasks(scheduler, limit_agent, writer, run_id, upstream=[])
+
+
+def build_cluster_workflow(scheduler, writer, run_id, workers, cluster_report):
+    """
+    Runs exposure aggregation, risk scoring and limit decisions per customer
+    shard on cluster workers (see run_sharded_stages), then the Merger and
+    Audit Logger on the gathered outputs.
+    """
+    scheduler.add(Task(
+        "SHARDED STAGES", lambda r: run_sharded_stages(workers, cluster_report),
+        outputs=["exposure_report", "risk_scores", "credit_limits"],
+        files=[writer.output_path(settings.EXPOSURE_REPORT_OUTPUT_FILE),
+               writer.output_path(settings.RISK_SCORE_OUTPUT_FILE), writer.output_path(settings.OUTPUT_FILE)],
+        checkpointed=False))
+    add_log_tasks(scheduler, writer, run_id, upstream=["exposure_report"])
+
+
+def run_shard(payload):
+    """
+    Exposure, risk scores and limit decisions of the payload's customers, run
+    by a cluster worker. The AR records and payment history are read through
+    their offset indexes, so a shard parses only its customers' rows.
+    payload['stages'] can stop after 'exposure' or 'risk' (e.g. benchmarks).
+    """
+    customers = payload['customers']
+    stages = payload.get('stages', ['exposure', 'risk', 'limits'])
+    exposure_agent = ExposureAggregatorAgent(customers=customers)
+    if not exposure_agent._perceive():
+        raise RuntimeError("Exposure aggregation failed to load its inputs")
+    exposure = list(exposure_agent._reason())
+    result = {'exposure': exposure, 'invoices': exposure_agent.invoice_count,
+              'overdue': exposure_agent.overdue_count, 'risk': [], 'limits': []}
+    if 'risk' in stages:
+        risk_agent = RiskScoringAgent(customers=customers)
+        risk_agent.exposure_data = {row['customer_id']: row for row in exposure}
+        risk_agent.load_scoring_inputs()
+        result['risk'] = risk_agent._reason()
+    if 'limits' in stages:
+        limit_agent = LimitSetterAgent(customers=customers)
+        limit_agent.risk_scores = result['risk']
+        limit_agent.load_policy_data()
+        result['limits'] = limit_agent._reason_and_decide()
+    # Rows rejected by the partial reads; the coordinator writes the quarantine files
+    result['validation'] = take_partial_rejections()
+    return result
+
+
+def write_sharded_quarantines(customers, shard_validation):
+    """
+    Quarantine files of the AR records and payment history, which shards read
+    only in part: the shards' rejected rows plus the rows of customers that
+    are not on the customer list (which no shard reads).
+    """
+    references = {'customers': customers}
+    for path, index_path, columns in (
+            (settings.CSV_RECORDS_FILE, settings.CSV_RECORDS_INDEX_FILE, AR_COLUMNS),
+            (settings.PAYMENT_HISTORY_FILE, settings.PAYMENT_HISTORY_INDEX_FILE, PAYMENT_COLUMNS)):
+        index = load_index(path, 'CUSTOMER_ID', index_path)
+        unknown = [key for key in index['ranges'] if key not in customers]
+        read_keys(path, 'CUSTOMER_ID', unknown, columns, lambda columns: None, index_path=index_path,
+                  quarantine=Quarantine(path, persist=False), references=references)
+    partials = shard_validation + [take_partial_rejections()]
+    for path in (settings.CSV_RECORDS_FILE, settings.PAYMENT_HISTORY_FILE):
+        quarantine = Quarantine(path)
+        for partial in partials:
+            entry = partial.get(Path(path).name)
+            if entry:
+                quarantine.add(entry['rows'], entry['rejected'])
+        quarantine.close()
+
+
+def run_sharded_stages(workers, cluster_report):
+    """
+    Coordinator side of a cluster run: splits the customer list into
+    contiguous shards, gathers each shard's exposure rows, risk scores and
+    limit decisions from the workers and writes the three outputs as a
+    single-node run would.
+    """
+    logger = logging.getLogger("WorkflowOrchestrator")
+    customers = known_customers(persist=True)
+    # Whole-file inputs every shard reads, validated once more here for the run report
+    read_json_records(settings.ERP_CUSTOMER_FILE, {'customers': customers})
+    read_json_records(settings.JSON_EXTRACT_FILE, {'customers': customers})
+    if Path(settings.CREDIT_BUREAU_FILE).exists():
+        read_json_records(settings.CREDIT_BUREAU_FILE, {'customers': customers})
+    # Built once here rather than by every worker at once
+    load_index(settings.CSV_RECORDS_FILE, 'CUSTOMER_ID', settings.CSV_RECORDS_INDEX_FILE)
+    refresh_payment_index()
+
+    ordered = sorted(customers)
+    count = max(1, min(len(ordered), max(workers, 1) * settings.CLUSTER_SHARDS_PER_WORKER))
+    shards = [ordered[i * len(ordered) // count:(i + 1) * len(ordered) // count] for i in range(count)]
+    coordinator = ShardCoordinator([{'customers': shard} for shard in shards], [len(shard) for shard in shards],
+                                   local_workers=workers,
+                                   worker_command=[sys.executable, str(Path(__file__).resolve())])
+    try:
+        results = coordinator.run()
+    except (OSError, RuntimeError) as e:
+        logger.error(f"Cluster run failed: {e}")
+        return False
+    finally:
+        cluster_report.update(coordinator.report())
+
+    write_sharded_quarantines(customers, [result['validation'] for result in results])
+    # Shards are contiguous ranges of the sorted customers, so the outputs stay in customer order
+    exposure_agent = ExposureAggregatorAgent()
+    exposure = exposure_agent.adopt_report([row for result in results for row in result['exposure']],
+                                           sum(result['invoices'] for result in results),
+                                           sum(result['overdue'] for result in results))
+    risk = [row for result in results for row in result['risk']]
+    limits = [row for result in results for row in result['limits']]
+    if not exposure_agent._act(exposure) or not risk or not RiskScoringAgent()._act(risk):
+        return False
+    return not limits or LimitSetterAgent()._act(limits)
 
 
-def setup_logging():
-    """Configure logging to output to both console and a file"""
-    os.makedirs(os.path.dirname(settings.LOG_FILE), exist_ok=True)
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - [%(levelname)s] - %(message)s',
-        handlers=[
-            logging.FileHandler(settings.LOG_FILE, mode='w'),  # Overwrite log file on each run
-            logging.StreamHandler()
-        ]
-    )
+def refresh_payment_index():
+    """Builds the payment history offset index, or keeps it if it is up to date"""
+    load_index(settings.PAYMENT_HISTORY_FILE, 'CUSTOMER_ID', settings.PAYMENT_HISTORY_INDEX_FILE)
+    return True
+
 
+def log_run_report(logger, scheduler, writer, cluster=None):
+    """Logs the critical path of the run and saves the full timing report"""
+    report = scheduler.report()
+    logger.info(f"Run completed in {report['total_seconds']:.2f}s; critical path "
+                f"({report['critical_path_seconds']:.2f}s):")
+    for step in report['critical_path']:
+        logger.info(f"  -> {step['task']}: {step['duration_seconds']:.2f}s")
+    logger.info(f"Total latency was bounded by: {report['bounded_by']}")
+    report['llm'] = get_gateway().metrics_snapshot()
+    if report['llm']['calls']:
+        llm = report['llm']
+        logger.info(f"LLM gateway: {llm['calls']} calls, {llm['successes']} succeeded, "
+                    f"{llm['fallbacks']} fell back, {llm['retries']} retries, p95 latency {llm['latency_p95']}s, "
+                    f"{llm['prompt_tokens'] + llm['completion_tokens']} tokens")
+    report['memory'] = memory_report()
+    memory = report['memory']
+    if memory['budget_mb']:
+        spills = sum(entry['spills'] for entry in memory['spilling'].values())
+        logger.info(f"Memory: peak RSS {memory['peak_rss_mb']} MB with a budget of {memory['budget_mb']} MB "
+                    f"({spills} spills to {settings.SPILL_DIR})")
+    else:
+        logger.info(f"Memory: peak RSS {memory['peak_rss_mb']} MB (no budget)")
+    if cluster:
+        report['cluster'] = cluster
+        logger.info(f"Cluster: {cluster['customers']} customers in {cluster['shards']} shards on "
+                    f"{len(cluster['workers'])} workers, {cluster['customers_per_second']} customers/s "
+                    f"({cluster['retries']} retries, {cluster['worker_restarts']} worker restarts)")
+        for name, worker in cluster['workers'].items():
+            logger.info(f"  -> {name}: {worker['shards']} shards, {worker['customers']} customers, "
+                        f"{worker['customers_per_second']} customers/s")
+    report['validation'] = validation_report()
+    rejected = {name: entry['rejected'] for name, entry in report['validation'].items() if entry['rejected']}
+    if rejected:
+        logger.warning(f"Input validation quarantined {sum(rejected.values())} rows "
+                       f"({', '.join(f'{name}: {count}' for name, count in rejected.items())}) "
+                       f"to {settings.QUARANTINE_DIR}")
+    try:
+        writer.write(settings.RUN_REPORT_FILE, report)
+    except OSError as e:
+        logger.warning(f"Could not save run report: {e}")
 
-def main():
+
+def main(resume=False, customers=None, cluster_workers=None):
     """
     Main function to orchestrate the complete credit assessment workflow.
-    It runs all agents in a logical sequence to produce the final audit trail.
+    It runs all agents as a dependency graph to produce the final audit trail.
+    With `customers`, only those customers are re-scored (see build_targeted_workflow);
+    with `cluster_workers`, the per-customer stages run on cluster workers
+    (see build_cluster_workflow).
     """
     setup_logging()
     logger = logging.getLogger("WorkflowOrchestrator")
+    # Targeted and cluster runs neither use nor disturb the checkpoints of an interrupted full run
+    checkpoint = CheckpointManager() if not customers and cluster_workers is None else None
+    if checkpoint and not resume:
+        checkpoint.clear()
+    # A resumed run keeps the ID of the run it continues
+    run_id = checkpoint.run_id() if checkpoint else new_run_id()
     
     logger.info("="*80)
     logger.info("=== STARTING COMPLETE CUSTOMER CREDIT ASSESSMENT PROCESS ===")
@@ -55,41 +329,37 @@ def main():
     logger.info("  4. Merger Agent")
     logger.info("  5. Audit Logger Agent")
     logger.info("")
+    logger.info(f"Run ID: {run_id}")
+    logger.info("")
+    if resume:
+        logger.info("Resume requested: completed stages will be skipped.")
+        logger.info("")
+    if customers:
+        logger.info(f"Targeted re-scoring of {len(customers)} customers: {', '.join(customers)}")
+        logger.info("")
+    if cluster_workers is not None:
+        logger.info(f"Cluster run with {cluster_workers} local workers")
+        logger.info("")
     logger.info("="*80)
     
-    # --- STAGE 1: Run the Exposure Aggregator Agent ---
-    logger.info("\n>>> STAGE 1: EXECUTING EXPOSURE AGGREGATOR AGENT...")
-    exposure_agent = ExposureAggregatorAgent()
-    if not exposure_agent.run():
-        logger.error(">>> STAGE 1 FAILED. Workflow terminated.")
-        return False
-    logger.info(">>> STAGE 1: EXPOSURE AGGREGATOR AGENT FINISHED.\n")
-    
-    # --- STAGE 2: Run the Risk Scoring Agent ---
-    logger.info(">>> STAGE 2: EXECUTING RISK SCORING AGENT...")
-    risk_agent = RiskScoringAgent()
-    if not risk_agent.run():
-        logger.error(">>> STAGE 2 FAILED. Workflow terminated.")
+    writer = OutputWriter()
+    scheduler = DAGScheduler(max_workers=settings.PIPELINE_MAX_WORKERS, checkpoint=checkpoint,
+                             resume=resume, logger=logger)
+    cluster_report = {}
+    if customers:
+        build_targeted_workflow(scheduler, writer, run_id, customers)
+    elif cluster_workers is not None:
+        build_cluster_workflow(scheduler, writer, run_id, cluster_workers, cluster_report)
+    else:
+        build_workflow(scheduler, checkpoint, writer, run_id)
+    success = scheduler.run()
+    log_run_report(logger, scheduler, writer, cluster_report)
+    if not success:
         return False
-    logger.info(">>> STAGE 2: RISK SCORING AGENT FINISHED.\n")
-    
-    # --- STAGE 3: Run the Limit Setter Agent ---
-    logger.info(">>> STAGE 3: EXECUTING LIMIT SETTER AGENT...")
-    limit_agent = LimitSetterAgent()
-    limit_agent.run()
-    logger.info(">>> STAGE 3: LIMIT SETTER AGENT FINISHED.\n")
     
-    # --- STAGE 4: Run the Merger Agent ---
-    logger.info(">>> STAGE 4: EXECUTING MERGER AGENT to create unified log...")
-    merger = MergerAgent()
-    merger.run()
-    logger.info(">>> STAGE 4: MERGER AGENT FINISHED.\n")
-    
-    # --- STAGE 5: Run the Audit Logger Agent ---
-    logger.info(">>> STAGE 5: EXECUTING AUDIT LOGGER AGENT...")
-    audit_agent = AuditLoggerAgent()
-    audit_agent.run()
-    logger.info(">>> STAGE 5: AUDIT LOGGER AGENT FINISHED.\n")
+    # A finished workflow leaves nothing to resume
+    if checkpoint:
+        checkpoint.clear()
     
     logger.info("="*80)
     logger.info("=== WORKFLOW FINISHED. ALL STAGES EXECUTED SUCCESSFULLY ===")
@@ -102,12 +372,88 @@ def main():
     logger.info(f"  - Unified Log: {settings.UNIFIED_LOG_FILE}")
     logger.info(f"  - Audit Trail: {settings.AUDIT_TRAIL_FILE}")
     logger.info(f"  - System Log: {settings.LOG_FILE}")
+    logger.info(f"  - Run Report: {settings.RUN_REPORT_FILE}")
     logger.info("")
     logger.info("="*80)
     
     return True
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Customer credit assessment workflow")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip stages completed by an interrupted run and reuse checkpointed decisions")
+    parser.add_argument('--log-customer-detail', action='store_true',
+                        help="Log every customer in the agents' loops instead of counts and rates")
+    parser.add_argument('--customers', type=lambda value: [c.strip() for c in value.split(',') if c.strip()],
+                        help="Comma-separated customer IDs to re-score against the existing exposure report")
+    parser.add_argument('--memory-budget-mb', type=float, metavar='MB',
+                        help="Spill per-customer aggregates to disk above this process memory (RSS) "
+                             "instead of holding them all in memory (default: MEMORY_BUDGET_MB)")
+    parser.add_argument('--what-if', nargs='?', const=str(settings.WHAT_IF_SCENARIOS_FILE), metavar='SCENARIOS',
+                        help="Evaluate a grid of risk weights, thresholds and policy percentages against the "
+                             "current outputs instead of running the workflow")
+    parser.add_argument('--preview', nargs='?', type=float, const=settings.PREVIEW_SAMPLE_FRACTION,
+                        metavar='FRACTION',
+                        help="Estimate exposure, risk mix and limit uplift with confidence intervals from a "
+                             "stratified sample of customers and invoices (default fraction: "
+                             "PREVIEW_SAMPLE_FRACTION) instead of running the workflow")
+    parser.add_argument('--cluster', type=int, metavar='WORKERS',
+                        help="Run the exposure, risk and limit stages in customer shards on this many local "
+                             "worker processes (0: only workers started elsewhere with --worker)")
+    parser.add_argument('--worker', metavar='HOST:PORT',
+                        help="Join the coordinator of a --cluster run at HOST:PORT and process its shards")
+    parser.add_argument('--worker-name', default=f"{socket.gethostname()}-{os.getpid()}",
+                        help="Name of this worker in the coordinator's report (default: host-pid)")
+    args = parser.parse_args()
+    if args.resume and args.customers:
+        parser.error("--resume and --customers cannot be combined")
+    if args.what_if and (args.resume or args.customers):
+        parser.error("--what-if cannot be combined with --resume or --customers")
+    if args.preview is not None:
+        if args.resume or args.customers or args.what_if:
+            parser.error("--preview cannot be combined with --resume, --customers or --what-if")
+        if not 0 < args.preview <= 1:
+            parser.error("--preview FRACTION must be in (0, 1]")
+    if args.cluster is not None:
+        if args.resume or args.customers or args.what_if or args.preview is not None:
+            parser.error("--cluster cannot be combined with --resume, --customers, --what-if or --preview")
+        if args.cluster < 0:
+            parser.error("--cluster WORKERS must be 0 or more")
+    return args
+
+
+def run_what_if(scenarios_file):
+    """Runs the What-If Simulator on its own, reusing the last run's exposure report"""
+    setup_logging()
+    return WhatIfSimulatorAgent(scenarios_file=scenarios_file).run()
+
+
+def run_preview(sample_fraction):
+    """Runs the Preview Estimator on its own; no workflow output is written"""
+    setup_logging()
+    return PreviewEstimatorAgent(sample_fraction=sample_fraction).run()
+
+
+def run_worker(address, name):
+    """Serves shards of a --cluster run until the coordinator has none left"""
+    setup_logging(log_file=Path(settings.LOG_FILE).parent / f"worker_{name}.log")
+    return serve_worker(address, run_shard, name)
+
+
 if __name__ == '__main__':
-    success = main()
+    args = parse_args()
+    if args.log_customer_detail:
+        settings.LOG_CUSTOMER_DETAIL = True
+    if args.memory_budget_mb is not None:
+        settings.MEMORY_BUDGET_MB = args.memory_budget_mb
+    if args.worker:
+        success = run_worker(args.worker, args.worker_name)
+    elif args.what_if:
+        success = run_what_if(args.what_if)
+    elif args.preview is not None:
+        success = run_preview(args.preview)
+    else:
+        success = main(resume=args.resume, customers=args.customers, cluster_workers=args.cluster)
+    stop_logging()
     exit(0 if success else 1)
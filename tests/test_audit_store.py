@@ -0,0 +1,95 @@
+"""
+Tests for utils.audit_store and audit_query.py: runs recorded under their
+run_id, queried back, and kept when an existing database is opened again.
+"""
+
+import json
+import sqlite3
+import sys
+
+import pytest
+
+import audit_query
+from utils.audit_store import AuditStore, new_run_id
+
+
+def _trail(customer_id, final_status, day):
+    steps = ("Exposure Aggregation", "Risk Scoring", "Limit Setting")
+    return {
+        'workflow_id': f"WF_{customer_id}",
+        'customer_id': customer_id,
+        'events': [{'step': step, 'status': 'Completed', 'timestamp': f"2026-01-{day:02d}T10:00:0{n}"}
+                   for n, step in enumerate(steps)],
+        'final_status': final_status,
+    }
+
+
+def _unified_log(trails):
+    return {'workflows': [{'workflow_id': t['workflow_id'], 'customer_id': t['customer_id'],
+                           'logs': [{'agent_id': 'LimitSetter01', 'customer_id': t['customer_id'],
+                                     'validation_status': t['final_status'],
+                                     'timestamp': t['events'][-1]['timestamp']}]} for t in trails]}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / 'audit' / 'audit_store.db'
+
+
+def test_recorded_run_is_queried_back(db_path):
+    trails = [_trail('CUST1000', 'PASS', 10), _trail('CUST1001', 'FAIL', 11)]
+    run_id = new_run_id()
+    counts = AuditStore(db_path, batch_size=1).record_run(run_id, trails, _unified_log(trails))
+    assert counts == {'workflows': 2, 'events': 6, 'log_records': 2}
+
+    store = AuditStore(db_path, read_only=True)
+    rows = store.workflows(run_id=run_id)
+    assert [(r['run_id'], r['customer_id'], r['final_status']) for r in rows] == [
+        (run_id, 'CUST1000', 'PASS'), (run_id, 'CUST1001', 'FAIL')]
+    assert rows[1]['events'] == trails[1]['events']
+    assert rows[1]['last_event_at'] == '2026-01-11T10:00:02'
+    assert [r['customer_id'] for r in store.workflows(status='FAIL')] == ['CUST1001']
+    assert [r['customer_id'] for r in store.workflows(step='Risk Scoring', until='2026-01-10')] == ['CUST1000']
+    assert store.workflows(step='Compliance Check') == []
+    logs = store.log_records(customer_id='CUST1001')
+    assert logs == [{'run_id': run_id, **_unified_log(trails)['workflows'][1]['logs'][0]}]
+
+
+def test_existing_database_keeps_earlier_runs(db_path):
+    first, second = new_run_id(), new_run_id()
+    AuditStore(db_path).record_run(first, [_trail('CUST1000', 'PASS', 10)])
+    # A later process opens the same file
+    store = AuditStore(db_path)
+    store.record_run(second, [_trail('CUST1000', 'FAIL', 12), _trail('CUST1002', 'PASS', 12)])
+    assert [run['run_id'] for run in store.runs()] == [first, second]
+    assert store.latest_run_id() == second
+    assert len(store.workflows(customer_id='CUST1000')) == 2
+
+    # A resumed run records under its original run_id and replaces that run's rows
+    store.record_run(first, [_trail('CUST1001', 'PASS', 13)])
+    assert [r['customer_id'] for r in store.workflows(run_id=first)] == ['CUST1001']
+    assert [r['customer_id'] for r in store.workflows(run_id=second)] == ['CUST1000', 'CUST1002']
+
+    with sqlite3.connect(db_path) as conn:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_events_workflow' in indexes and 'idx_events_run' not in indexes
+
+
+def test_read_only_store_needs_an_existing_database(db_path):
+    with pytest.raises(FileNotFoundError):
+        AuditStore(db_path, read_only=True).runs()
+    assert not db_path.exists()
+
+
+def test_query_tool_prints_matching_workflows_as_json(db_path, monkeypatch, capsys):
+    run_id = new_run_id()
+    AuditStore(db_path).record_run(run_id, [_trail('CUST1000', 'PASS', 10), _trail('CUST1001', 'FAIL', 11)])
+    monkeypatch.setattr(sys, 'argv', ['audit_query.py', '--db', str(db_path), '--status', 'fail',
+                                      '--run', 'latest', '--format', 'json'])
+    assert audit_query.main()
+    rows = json.loads(capsys.readouterr().out)
+    assert [(r['run_id'], r['customer_id']) for r in rows] == [(run_id, 'CUST1001')]
+
+    monkeypatch.setattr(sys, 'argv', ['audit_query.py', '--db', str(db_path), '--until', '2026-13-01'])
+    assert not audit_query.main()
+    assert "Invalid query" in capsys.readouterr().err
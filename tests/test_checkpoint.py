@@ -0,0 +1,163 @@
+"""
+Tests for utils.checkpoint: stage markers, chunked agent state, and a Limit
+Setter run that is interrupted and resumed.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agents import limit_setter_agent
+from agents.limit_setter_agent import LimitSetterAgent
+from config import settings
+from utils.checkpoint import CheckpointManager
+from utils.scheduler import DAGScheduler, Task
+
+CATEGORIES = ['Low', 'Medium', 'High']
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return CheckpointManager(tmp_path / 'checkpoints')
+
+
+@pytest.fixture
+def limit_inputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'QUARANTINE_DIR', tmp_path / 'quarantine')
+    monkeypatch.setattr(settings, 'RISK_SCORE_FILE', tmp_path / 'risk_score_output.json')
+    monkeypatch.setattr(settings, 'OUTPUT_FILE', tmp_path / 'credit_limit_update.json')
+    monkeypatch.setattr(settings, 'CHECKPOINT_CHUNK_SIZE', 2)
+    # Demo mode pauses a second per customer
+    monkeypatch.setattr(limit_setter_agent, 'time', SimpleNamespace(sleep=lambda seconds: None))
+    scores = [{'customer_id': f"CUST{1000 + n}", 'risk_category': CATEGORIES[n % 3]} for n in range(7)]
+    settings.RISK_SCORE_FILE.write_text(json.dumps(scores))
+    return monkeypatch
+
+
+def _count_summaries(monkeypatch, fail_on=None):
+    """Count the decisions the agent works out; raise Interrupted on call number `fail_on`"""
+    calls = []
+    summarise = LimitSetterAgent._generate_decision_summary_local
+
+    def counted(agent, *args):
+        calls.append(args[0])
+        if len(calls) == fail_on:
+            raise Interrupted(args[0])
+        return summarise(agent, *args)
+
+    monkeypatch.setattr(LimitSetterAgent, '_generate_decision_summary_local', counted)
+    return calls
+
+
+def _decisions():
+    with open(settings.OUTPUT_FILE) as f:
+        return json.load(f)
+
+
+def _without_timestamps(decisions):
+    return [{key: value for key, value in d.items() if key != 'timestamp'} for d in decisions]
+
+
+# ---------- Stage markers ----------
+
+def test_stage_is_complete_while_its_outputs_exist(checkpoint, tmp_path):
+    output = tmp_path / 'risk_score_output.json'
+    output.write_text('[]')
+    assert not checkpoint.is_stage_complete('RISK SCORING AGENT')
+    checkpoint.mark_stage_complete('RISK SCORING AGENT', [output])
+    assert checkpoint.is_stage_complete('RISK SCORING AGENT')
+    output.unlink()
+    assert not checkpoint.is_stage_complete('RISK SCORING AGENT')
+
+
+def test_unreadable_stage_marker_is_not_complete(checkpoint):
+    checkpoint.mark_stage_complete('MERGER AGENT')
+    assert checkpoint.is_stage_complete('MERGER AGENT')
+    checkpoint._stage_marker('MERGER AGENT').write_text('{"stage": ')
+    assert not checkpoint.is_stage_complete('MERGER AGENT')
+
+
+def test_resume_reruns_a_stage_with_a_missing_output_and_everything_after_it(checkpoint, tmp_path):
+    report = tmp_path / 'exposure_report.json'
+    scores = tmp_path / 'risk_score_output.json'
+    runs = []
+
+    def stage(name, path):
+        def run(resume):
+            runs.append((name, resume))
+            path.write_text('[]')
+            return True
+        return run
+
+    def schedule(resume):
+        scheduler = DAGScheduler(max_workers=2, checkpoint=checkpoint, resume=resume)
+        scheduler.add(Task("EXPOSURE", stage("EXPOSURE", report), outputs=["exposure_report"], files=[report]))
+        scheduler.add(Task("RISK", stage("RISK", scores), inputs=["exposure_report"], outputs=["risk_scores"],
+                           files=[scores]))
+        assert scheduler.run()
+        return scheduler.status
+
+    schedule(resume=False)
+    assert schedule(resume=True) == {'EXPOSURE': 'skipped', 'RISK': 'skipped'}
+    scores.unlink()
+    assert schedule(resume=True) == {'EXPOSURE': 'skipped', 'RISK': 'completed'}
+    report.unlink()
+    assert schedule(resume=True) == {'EXPOSURE': 'completed', 'RISK': 'completed'}
+    # RISK may only reuse its own checkpoints while its input was not rebuilt
+    assert runs[-3:] == [('RISK', True), ('EXPOSURE', True), ('RISK', False)]
+
+
+# ---------- Agent chunks ----------
+
+def test_chunks_are_numbered_in_order_and_read_back_in_order(checkpoint):
+    checkpoint.append_chunk('LimitSetter01', [])
+    assert not (checkpoint.checkpoint_dir / 'LimitSetter01').exists()
+    for n in range(1, 12):
+        checkpoint.append_chunk('LimitSetter01', [{'n': n}])
+    names = sorted(path.name for path in (checkpoint.checkpoint_dir / 'LimitSetter01').iterdir())
+    assert names[0] == 'chunk_00001.json' and names[-1] == 'chunk_00011.json'
+    assert [record['n'] for record in checkpoint.load_chunks('LimitSetter01')] == list(range(1, 12))
+    checkpoint.clear_agent('LimitSetter01')
+    assert checkpoint.load_chunks('LimitSetter01') == []
+
+
+def test_interrupted_limit_setter_resumes_to_the_uninterrupted_output(checkpoint, limit_inputs):
+    calls = _count_summaries(limit_inputs)
+    assert LimitSetterAgent(checkpoint=checkpoint).run()
+    expected = _decisions()
+    assert len(calls) == 7
+    settings.OUTPUT_FILE.unlink()
+
+    calls = _count_summaries(limit_inputs, fail_on=6)
+    interrupted = LimitSetterAgent(checkpoint=checkpoint)
+    with pytest.raises(Interrupted):
+        interrupted.run()
+    # Two chunks of two decisions were saved; the fifth was still pending
+    assert len(checkpoint.load_chunks(interrupted.agent_id)) == 4
+    assert not settings.OUTPUT_FILE.exists()
+
+    calls = _count_summaries(limit_inputs)
+    assert LimitSetterAgent(checkpoint=checkpoint, resume=True).run()
+    assert calls == ['CUST1004', 'CUST1005', 'CUST1006']
+    resumed = _decisions()
+    assert _without_timestamps(resumed) == _without_timestamps(expected)
+    assert {d['timestamp'] for d in resumed} == {interrupted.timestamp}
+    chunk_dir = checkpoint.checkpoint_dir / interrupted.agent_id
+    assert sorted(path.name for path in chunk_dir.glob('chunk_*.json'))[-1] == 'chunk_00004.json'
+
+
+def test_run_without_resume_discards_earlier_chunks(checkpoint, limit_inputs):
+    _count_summaries(limit_inputs, fail_on=4)
+    with pytest.raises(Interrupted):
+        LimitSetterAgent(checkpoint=checkpoint).run()
+    assert len(checkpoint.load_chunks('LimitSetter01')) == 2
+
+    calls = _count_summaries(limit_inputs)
+    assert LimitSetterAgent(checkpoint=checkpoint).run()
+    assert len(calls) == 7
+    assert len(checkpoint.load_chunks('LimitSetter01')) == 7
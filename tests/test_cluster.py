@@ -0,0 +1,175 @@
+"""
+Tests for utils.cluster: the token handshake, shards that a worker drops,
+stalls or fails (requeued for the next free worker) and the restart of a
+local worker process that exits.
+"""
+
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from config import settings
+from utils.cluster import ShardCoordinator, recv_message, send_message, serve_worker
+
+TOKEN = 'test-token'
+PAYLOADS = [{'n': n} for n in range(4)]
+EXPECTED = [{'double': 2 * n} for n in range(4)]
+
+# Local worker for the restart test: the first start exits at once, the restarted one serves shards
+WORKER_SCRIPT = """
+import sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+marker = Path(sys.argv[2])
+if not marker.exists():
+    marker.write_text('exited')
+    sys.exit(3)
+from utils.cluster import serve_worker
+serve_worker(sys.argv[4], lambda payload: {'double': 2 * payload['n']}, sys.argv[6])
+"""
+
+
+@pytest.fixture(autouse=True)
+def cluster_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'CLUSTER_TOKEN', TOKEN)
+    monkeypatch.setattr(settings, 'CLUSTER_HEARTBEAT_SECONDS', 0.05)
+    monkeypatch.setattr(settings, 'CLUSTER_WORKER_TIMEOUT_SECONDS', 2)
+    monkeypatch.setattr(settings, 'CLUSTER_SHARD_TIMEOUT_SECONDS', 30)
+    monkeypatch.setattr(settings, 'CLUSTER_MAX_ATTEMPTS', 3)
+
+
+class Run:
+    """A coordinator running in a background thread"""
+
+    def __init__(self, coordinator: ShardCoordinator):
+        self.coordinator = coordinator
+        self.results = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + 5
+        while not coordinator.port:
+            assert time.monotonic() < deadline, "coordinator did not start"
+            time.sleep(0.01)
+        self.address = f"{coordinator.host}:{coordinator.port}"
+
+    def _run(self):
+        try:
+            self.results = self.coordinator.run()
+        except Exception as e:
+            self.error = e
+
+    def join(self):
+        self.thread.join(timeout=20)
+        assert not self.thread.is_alive(), "coordinator did not finish"
+        return self.results
+
+
+def _double(payload):
+    return {'double': 2 * payload['n']}
+
+
+def _worker(address, handler=_double, name='worker'):
+    thread = threading.Thread(target=serve_worker, args=(address, handler, name), daemon=True)
+    thread.start()
+    return thread
+
+
+def _join(run, **handshake):
+    """A raw connection that has completed the handshake (or been refused)"""
+    host, _, port = run.address.rpartition(':')
+    sock = socket.create_connection((host, int(port)), timeout=5)
+    send_message(sock, {'type': 'hello', 'worker': 'raw', 'token': TOKEN, **handshake})
+    return sock
+
+
+def test_bad_token_is_rejected(monkeypatch):
+    run = Run(ShardCoordinator(PAYLOADS))
+    with _join(run, token='wrong') as sock:
+        with pytest.raises(ConnectionError):
+            recv_message(sock)
+    monkeypatch.setattr(settings, 'CLUSTER_TOKEN', 'wrong')
+    assert serve_worker(run.address, _double, 'intruder') is False
+    monkeypatch.setattr(settings, 'CLUSTER_TOKEN', TOKEN)
+    _worker(run.address)
+    assert run.join() == EXPECTED
+    assert list(run.coordinator.report()['workers']) == ['worker']
+
+
+def test_dropped_shard_goes_to_the_next_worker():
+    run = Run(ShardCoordinator(PAYLOADS))
+    with _join(run) as sock:
+        assert recv_message(sock)['type'] == 'welcome'
+        assert recv_message(sock) == {'type': 'shard', 'shard': 0, 'payload': {'n': 0}}
+    # Disconnected while holding shard 0
+    _worker(run.address)
+    assert run.join() == EXPECTED
+    assert run.coordinator.retries == 1
+    assert run.coordinator.attempts[0] == 2
+
+
+def test_stalled_shard_is_given_up_at_the_shard_deadline(monkeypatch):
+    monkeypatch.setattr(settings, 'CLUSTER_SHARD_TIMEOUT_SECONDS', 0.5)
+    release = threading.Event()
+
+    def stall(payload):
+        # Heartbeats keep coming while the shard hangs
+        release.wait(10)
+        return _double(payload)
+
+    run = Run(ShardCoordinator(PAYLOADS))
+    stalled = _worker(run.address, stall, 'stalled')
+    deadline = time.monotonic() + 5
+    while not run.coordinator.attempts[0]:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    _worker(run.address, name='healthy')
+    try:
+        assert run.join() == EXPECTED
+    finally:
+        release.set()
+    stalled.join(timeout=5)
+    report = run.coordinator.report()
+    assert run.coordinator.retries == 1
+    assert report['workers']['healthy']['shards'] == 4
+    assert report['workers']['stalled']['shards'] == 0
+
+
+def test_shard_error_is_retried_until_attempts_run_out(monkeypatch):
+    failures = []
+
+    def fail_first(payload):
+        if payload['n'] == 1 and not failures:
+            failures.append(payload['n'])
+            raise ValueError("transient")
+        return _double(payload)
+
+    run = Run(ShardCoordinator(PAYLOADS))
+    _worker(run.address, fail_first)
+    assert run.join() == EXPECTED
+    assert run.coordinator.retries == 1
+
+    monkeypatch.setattr(settings, 'CLUSTER_MAX_ATTEMPTS', 2)
+
+    def always_fail(payload):
+        raise ValueError("broken input")
+
+    run = Run(ShardCoordinator(PAYLOADS))
+    _worker(run.address, always_fail)
+    assert run.join() is None
+    assert isinstance(run.error, RuntimeError)
+    assert "Shard 0 failed 2 times" in str(run.error) and "broken input" in str(run.error)
+
+
+def test_exited_local_worker_is_restarted(tmp_path):
+    root = Path(__file__).resolve().parent.parent
+    command = [sys.executable, '-c', WORKER_SCRIPT, str(root), str(tmp_path / 'started')]
+    coordinator = ShardCoordinator(PAYLOADS, local_workers=1, worker_command=command)
+    run = Run(coordinator)
+    assert run.join() == EXPECTED
+    assert coordinator.restarts == 1
+    assert list(coordinator.report()['workers']) == ['local-1']
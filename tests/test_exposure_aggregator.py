@@ -0,0 +1,53 @@
+"""
+Tests for agents.exposure_aggregator_agent: billing currencies from the ERP
+customer master and customers whose currency has no FX rates.
+"""
+
+import json
+import logging
+
+import pytest
+
+from agents.exposure_aggregator_agent import ExposureAggregatorAgent
+from config import settings
+
+
+@pytest.fixture
+def exposure_report(tmp_path, monkeypatch):
+    def run(currencies):
+        customers = []
+        for customer_id, currency in currencies.items():
+            customer = {'customer_id': customer_id, 'current_limit': 100000}
+            if currency != 'absent':
+                customer['currency'] = currency
+            customers.append(customer)
+        path = tmp_path / 'ERP_customer_master.json'
+        path.write_text(json.dumps(customers))
+        monkeypatch.setattr(settings, 'ERP_CUSTOMER_FILE', path)
+        monkeypatch.setattr(settings, 'QUARANTINE_DIR', tmp_path / 'quarantine')
+        monkeypatch.setattr(settings, 'CSV_PARSE_WORKERS', 1)
+        agent = ExposureAggregatorAgent()
+        assert agent._perceive()
+        return agent, {row['customer_id']: row for row in agent._reason()}
+    return run
+
+
+def test_null_empty_and_missing_currencies_are_the_reporting_currency(exposure_report):
+    agent, rows = exposure_report({'CUST1000': None, 'CUST1001': '', 'CUST1002': 'absent', 'CUST1003': 'usd'})
+    reporting = settings.REPORTING_CURRENCY
+    for customer_id in ('CUST1000', 'CUST1001', 'CUST1002', 'CUST1003'):
+        assert agent.customer_currency[customer_id] == reporting
+        row = rows[customer_id]
+        assert row['original_currency'] == reporting
+        assert row['total_open_AR'] == row['total_open_AR_original'] > 0
+        assert row['validation_status'] == 'PASS'
+
+
+def test_customer_without_fx_rates_fails_validation(exposure_report, caplog):
+    with caplog.at_level(logging.ERROR):
+        agent, rows = exposure_report({'CUST1000': 'XYZ', 'CUST1001': 'EUR'})
+    assert rows['CUST1000']['original_currency'] == 'XYZ'
+    assert rows['CUST1000']['total_open_AR'] == 0.0 and rows['CUST1000']['total_open_AR_original'] > 0
+    assert rows['CUST1000']['validation_status'] == 'FAIL'
+    assert rows['CUST1001']['total_open_AR'] > 0 and rows['CUST1001']['validation_status'] == 'PASS'
+    assert f"No FX rates for XYZ in {settings.FX_RATES_FILE}" in caplog.text
@@ -0,0 +1,219 @@
+"""
+Tests for utils.llm_gateway: the circuit breaker on a fake clock, and the
+gateway's retries, deadline and fallbacks against the local mock
+chat-completions server (benchmarks/mock_llm_server.py).
+"""
+
+import time
+
+import pytest
+
+from benchmarks.mock_llm_server import MockLLMServer
+from config import settings
+from utils.llm_gateway import CircuitBreaker, LLMGateway
+
+openai = pytest.importorskip('openai')
+
+MESSAGES = [{'role': 'user', 'content': 'Summarise the exposure of CUST1000'}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _breaker(clock, cooldown=30.0):
+    return CircuitBreaker(error_rate=0.5, window=4, min_calls=4, cooldown_seconds=cooldown, clock=clock)
+
+
+def _fallback():
+    return "local summary"
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(settings, 'LLM_BACKOFF_BASE_SECONDS', 0.001)
+    monkeypatch.setattr(settings, 'LLM_BACKOFF_MAX_SECONDS', 0.01)
+
+
+@pytest.fixture
+def mock_server():
+    servers = []
+
+    def start(**options):
+        server = MockLLMServer(latency=options.pop('latency', 'fixed:0'), seed=1, **options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def _gateway(server, breaker=None, **options):
+    client = openai.OpenAI(base_url=server.base_url, api_key='test', max_retries=0)
+    options = {'timeout': 5, 'deadline': 10, 'max_retries': 2, **options}
+    return LLMGateway(client=client, model='mock',
+                      breaker=breaker or CircuitBreaker(error_rate=0.5, window=20, min_calls=5,
+                                                        cooldown_seconds=30), **options)
+
+
+# ---------- Circuit breaker ----------
+
+def test_breaker_opens_at_the_error_rate_after_min_calls():
+    breaker = _breaker(FakeClock())
+    for success in (True, False, False):
+        breaker.record(success)
+        assert breaker.state == 'closed'
+    breaker.record(True)  # 2 of 4 failed
+    assert breaker.state == 'open' and breaker.times_opened == 1
+    assert not breaker.allow()
+
+
+def test_breaker_goes_half_open_after_the_cooldown_and_closes_on_success():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record(False)
+    clock.advance(29.9)
+    assert not breaker.allow() and breaker.state == 'open'
+    clock.advance(0.1)
+    assert breaker.allow() and breaker.state == 'half_open'
+    breaker.record(True)
+    assert breaker.state == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+
+def test_breaker_reopens_when_the_probe_fails():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record(False)
+    clock.advance(30)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == 'open' and breaker.times_opened == 2
+    clock.advance(10)
+    assert not breaker.allow()
+
+
+def test_breaker_admits_a_single_half_open_probe():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record(False)
+    clock.advance(30)
+    assert breaker.allow()
+    # Other callers are short-circuited while the probe is out
+    assert not breaker.allow()
+    clock.advance(29)
+    assert not breaker.allow()
+    # A probe that never reports is replaced after another cool-down
+    clock.advance(1)
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+# ---------- Gateway against the mock server ----------
+
+def test_successful_call_counts_latency_and_tokens(mock_server):
+    gateway = _gateway(mock_server())
+    text, used_fallback = gateway.complete(MESSAGES, _fallback, label='CUST1000')
+    assert not used_fallback and text.startswith("Mock summary: Summarise")
+    metrics = gateway.metrics_snapshot()
+    assert (metrics['calls'], metrics['successes'], metrics['attempts'], metrics['fallbacks']) == (1, 1, 1, 0)
+    assert metrics['prompt_tokens'] > 0 and metrics['completion_tokens'] > 0
+    assert metrics['latency_p50'] is not None and metrics['error_latency_p50'] is None
+
+
+def test_server_errors_are_retried_then_fall_back(mock_server, fast_backoff):
+    server = mock_server(error_rate=1.0)
+    gateway = _gateway(server)
+    assert gateway.complete(MESSAGES, _fallback) == ("local summary", True)
+    metrics = gateway.metrics_snapshot()
+    assert (metrics['attempts'], metrics['retries'], metrics['errors'], metrics['fallbacks']) == (3, 2, 3, 1)
+    assert metrics['error_latency_max'] is not None
+    assert server.stats() == {'500': 3}
+
+
+def test_retry_succeeds_after_a_transient_error(mock_server, fast_backoff):
+    server = mock_server()
+    gateway = _gateway(server, max_retries=5)
+    original = server._draw
+
+    def fail_once():
+        server._draw = original
+        return 0.0, 500
+
+    server._draw = fail_once
+    text, used_fallback = gateway.complete(MESSAGES, _fallback)
+    assert not used_fallback
+    assert server.stats() == {'200': 1, '500': 1}
+    assert gateway.metrics_snapshot()['retries'] == 1
+
+
+def test_retry_after_is_honored_up_to_the_backoff_cap(mock_server, monkeypatch):
+    monkeypatch.setattr(settings, 'LLM_BACKOFF_BASE_SECONDS', 0.001)
+    monkeypatch.setattr(settings, 'LLM_BACKOFF_MAX_SECONDS', 0.3)
+    server = mock_server(rate_limit_rate=1.0)  # 429 with Retry-After: 1
+    gateway = _gateway(server, max_retries=1)
+    started = time.monotonic()
+    assert gateway.complete(MESSAGES, _fallback) == ("local summary", True)
+    # The exponential backoff alone would wait about a millisecond
+    assert time.monotonic() - started >= 0.3
+    assert server.stats() == {'429': 2}
+
+
+def test_no_retry_is_started_past_the_deadline(mock_server, monkeypatch):
+    monkeypatch.setattr(settings, 'LLM_BACKOFF_MAX_SECONDS', 8)
+    server = mock_server(rate_limit_rate=1.0)  # Retry-After: 1, beyond the 0.5 s deadline
+    gateway = _gateway(server, deadline=0.5)
+    started = time.monotonic()
+    assert gateway.complete(MESSAGES, _fallback) == ("local summary", True)
+    assert time.monotonic() - started < 0.5
+    metrics = gateway.metrics_snapshot()
+    assert (metrics['attempts'], metrics['retries'], metrics['fallbacks']) == (1, 0, 1)
+
+
+def test_attempts_are_cut_to_the_remaining_deadline(mock_server, fast_backoff):
+    server = mock_server(latency='fixed:2')
+    gateway = _gateway(server, timeout=5, deadline=0.4)
+    started = time.monotonic()
+    assert gateway.complete(MESSAGES, _fallback) == ("local summary", True)
+    assert time.monotonic() - started < 1.5
+    metrics = gateway.metrics_snapshot()
+    assert metrics['errors'] >= 1 and metrics['fallbacks'] == 1
+
+
+def test_breaker_opens_against_an_outage_and_closes_after_recovery(mock_server):
+    server = mock_server(error_rate=1.0)
+    breaker = CircuitBreaker(error_rate=0.5, window=4, min_calls=2, cooldown_seconds=0.2)
+    gateway = _gateway(server, breaker=breaker, max_retries=0)
+    for _ in range(2):
+        assert gateway.complete(MESSAGES, _fallback) == ("local summary", True)
+    assert breaker.state == 'open'
+    # Short-circuited: the server is not called
+    assert gateway.complete(MESSAGES, _fallback) == ("local summary", True)
+    assert server.stats() == {'500': 2}
+    metrics = gateway.metrics_snapshot()
+    assert (metrics['calls'], metrics['short_circuited'], metrics['fallbacks']) == (3, 1, 3)
+    assert metrics['breaker_opened'] == 1 and metrics['fallback_rate'] == 1.0
+
+    server.error_rate = 0.0
+    time.sleep(0.25)
+    text, used_fallback = gateway.complete(MESSAGES, _fallback)
+    assert not used_fallback and breaker.state == 'closed'
+    assert gateway.metrics_snapshot()['breaker_state'] == 'closed'
+
+
+def test_unconfigured_gateway_uses_the_fallback():
+    gateway = LLMGateway(client=None)
+    assert gateway.complete(MESSAGES, _fallback) == ("local summary", True)
+    metrics = gateway.metrics_snapshot()
+    assert (metrics['calls'], metrics['fallbacks'], metrics['attempts']) == (1, 1, 0)
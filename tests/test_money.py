@@ -0,0 +1,102 @@
+"""
+Tests for utils.money: amount parsing into integer cents and back.
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from utils.money import from_cents, to_cents
+
+
+@pytest.mark.parametrize('value, cents', [
+    ('1234.56', 123456),
+    ('1234.5', 123450),
+    ('1234', 123400),
+    ('0.01', 1),
+    ('-12.34', -1234),
+    ('+12.34', 1234),
+    ('-.5', -50),
+    ('.5', 50),
+    ('5.', 500),
+])
+def test_plain_decimal_strings(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize('value, cents', [
+    ('1.5 ', 150),
+    ('12.3\r', 1230),
+    ('3430.9 ', 343090),
+    (' 3430.90', 343090),
+    ('\t12.34\n', 1234),
+    (' 7 ', 700),
+    ('1e3 ', 100000),
+])
+def test_surrounding_whitespace_is_ignored(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize('value, cents', [
+    ('1e3', 100000),
+    ('1.5e2', 15000),
+    ('1.5E-1', 15),
+    ('-2e-2', -2),
+])
+def test_exponents(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize('value, cents', [
+    ('1.005', 100),
+    ('1.015', 102),
+    ('1.2345', 123),
+    ('1.235', 124),
+    ('-0.125', -12),
+])
+def test_more_than_two_decimals_round_half_even(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize('value, cents', [
+    (0.1, 10),
+    (1234.56, 123456),
+    (-0.5, -50),
+    (3, 300),
+    (Decimal('19.99'), 1999),
+])
+def test_numbers(value, cents):
+    assert to_cents(value) == cents
+
+
+def test_float_sum_does_not_drift():
+    assert sum(to_cents(0.1) for _ in range(10)) == to_cents('1.00')
+
+
+def test_underscore_does_not_shift_the_decimal_point():
+    assert to_cents('1._5') == 150
+    assert to_cents('1_000.5') == 100050
+
+
+@pytest.mark.parametrize('value', [
+    'nan', 'NaN', 'sNaN', 'inf', '-Infinity', float('nan'), float('inf'),
+    '', ' ', '.', '-', 'abc', '12.3.4', '1.-5', '12,34', None, [],
+])
+def test_invalid_amounts_raise_value_error(value):
+    with pytest.raises(ValueError):
+        to_cents(value)
+
+
+@pytest.mark.parametrize('cents, amount', [
+    (123456, 1234.56),
+    (-50, -0.5),
+    (0, 0.0),
+    (1, 0.01),
+])
+def test_from_cents(cents, amount):
+    assert from_cents(cents) == amount
+
+
+@pytest.mark.parametrize('value', ['0.07', '1234.56', '-99.99', '1e3', '0.1 '])
+def test_round_trip(value):
+    assert from_cents(to_cents(value)) == float(value)
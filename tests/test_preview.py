@@ -0,0 +1,26 @@
+"""
+Tests for agents.preview_agent: the risk and limit estimate when sampled
+customers have no defined exposure ratio.
+"""
+
+import json
+
+from agents.preview_agent import PreviewEstimatorAgent
+from config import settings
+
+
+def test_credit_score_without_multiplier_is_estimated(tmp_path, monkeypatch):
+    customers = [f"CUST{1000 + n}" for n in range(10)]
+    bureau = tmp_path / 'credit_bureau_api_response.json'
+    bureau.write_text(json.dumps([{'customer_id': c, 'credit_score': 550 if n % 2 else 720}
+                                  for n, c in enumerate(customers)]))
+    monkeypatch.setattr(settings, 'CREDIT_BUREAU_FILE', bureau)
+    monkeypatch.setattr(settings, 'PAYMENT_HISTORY_INDEX_FILE', tmp_path / 'payment_history.csv.idx')
+    monkeypatch.setattr(settings, 'QUARANTINE_DIR', tmp_path / 'quarantine')
+    monkeypatch.setattr(settings, 'CSV_PARSE_WORKERS', 1)
+    agent = PreviewEstimatorAgent(sample_fraction=1.0)
+    assert agent._perceive()
+    estimate = agent.estimate_risk_and_limits()
+    counts = [category['customers']['estimate'] for category in estimate['risk_categories'].values()]
+    assert estimate['sample']['customers'] == len(customers)
+    assert round(sum(counts)) == len(customers)
@@ -0,0 +1,29 @@
+"""
+Tests for agents.risk_scoring_agent: the validation status of scored records.
+"""
+
+from agents.risk_scoring_agent import RiskScoringAgent
+
+
+def _score(exposures, credit_scores=None):
+    agent = RiskScoringAgent()
+    agent.exposure_data = {e['customer_id']: dict(e, timestamp='2026-01-01T00:00:00') for e in exposures}
+    agent.payment_data = {e['customer_id']: [5, 10, 15] for e in exposures}
+    agent.credit_data = {c: {'customer_id': c, 'credit_score': s} for c, s in (credit_scores or {}).items()}
+    return {r['customer_id']: r['validation_status'] for r in agent._reason()}
+
+
+def test_scored_records_pass():
+    assert _score([{'customer_id': 'CUST1', 'total_open_AR': 1000.0, 'validation_status': 'PASS'}],
+                  {'CUST1': 720}) == {'CUST1': 'PASS'}
+
+
+def test_failed_exposure_fails_the_score():
+    assert _score([{'customer_id': 'CUST1', 'total_open_AR': 0.0, 'validation_status': 'FAIL'}]) == {'CUST1': 'FAIL'}
+
+
+def test_credit_score_without_multiplier_fails_the_score():
+    statuses = _score([{'customer_id': 'CUST1', 'total_open_AR': 1000.0, 'validation_status': 'PASS'},
+                       {'customer_id': 'CUST2', 'total_open_AR': 1000.0, 'validation_status': 'PASS'}],
+                      {'CUST1': 550, 'CUST2': 400})
+    assert statuses == {'CUST1': 'FAIL', 'CUST2': 'FAIL'}
@@ -0,0 +1,114 @@
+"""
+Tests for utils.schema: CSV rows checked while they are read, and JSON
+records that come back with their declared column types.
+"""
+
+import json
+
+import pytest
+
+from config import settings
+from utils.dates import to_day
+from utils.fast_csv import parse_csv
+from utils.schema import Quarantine, load_schemas, read_json_records
+
+
+@pytest.fixture
+def inputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'QUARANTINE_DIR', tmp_path / 'quarantine')
+    return tmp_path
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data))
+    return path
+
+
+def _columns(columns):
+    return columns
+
+
+def _concat(first, second):
+    return {name: first[name] + second[name] for name in first}
+
+
+def test_csv_rows_failing_any_declared_column_are_quarantined(inputs):
+    path = inputs / 'open_AR_records_sample.csv'
+    path.write_text(
+        "CUSTOMER_ID,INVOICE_NO,AMOUNT,DUE_DATE,STATUS,AGING_BUCKET,RISK_WEIGHT\n"
+        "CUST1,INV1,10.00,2025-01-01,OPEN,,0.1\n"
+        "CUST9,INV2,10.00,2025-01-01,OPEN,,0.1\n"
+        "CUST1,,10.00,2025-01-01,OPEN,,0.1\n"
+        "CUST1,INV4,10.00,2025-01-01,PAID,,\n"
+        "CUST1,INV5,10.00,2025-01-01,OPEN,,1.5\n"
+        "CUST2,INV6,n/a,2025-02-30,OVERDUE,,0.2\n"
+        "CUST2,INV7,5.5,2025-01-02,OVERDUE,,\n")
+    quarantine = Quarantine(path, persist=False)
+    # RISK_WEIGHT and INVOICE_NO are checked though the reader does not keep them
+    columns = parse_csv(path, {'CUSTOMER_ID': 'str', 'AMOUNT': 'cents', 'STATUS': 'str'}, _columns, _concat,
+                        workers=1, quarantine=quarantine, references={'customers': {'CUST1', 'CUST2'}})
+    assert columns == {'CUSTOMER_ID': ['CUST1', 'CUST2'], 'AMOUNT': [1000, 550], 'STATUS': ['OPEN', 'OVERDUE']}
+    reasons = {row[0]: row[1] for row in quarantine.rejected}
+    assert reasons == {
+        3: "CUSTOMER_ID: 'CUST9' is unknown (customers)",
+        4: "INVOICE_NO: missing",
+        5: "STATUS: 'PAID' is not one of OPEN, OVERDUE",
+        6: "RISK_WEIGHT: '1.5' is above 1",
+        7: "AMOUNT: invalid cents 'n/a'; DUE_DATE: invalid day '2025-02-30'",
+    }
+    assert quarantine.rejected[0][2:4] == ['CUST9', 'INV2']
+
+
+def test_json_values_are_converted_to_declared_types(inputs):
+    path = _write(inputs / 'credit_bureau_api_response.json', [
+        {'customer_id': 'CUST1', 'credit_score': '754', 'bureau': 'Experian'},
+        {'customer_id': 'CUST2', 'credit_score': 610},
+    ])
+    records = read_json_records(path, {'customers': {'CUST1', 'CUST2'}})
+    assert records == [
+        {'customer_id': 'CUST1', 'credit_score': 754, 'bureau': 'Experian'},
+        {'customer_id': 'CUST2', 'credit_score': 610},
+    ]
+    assert all(isinstance(record['credit_score'], int) for record in records)
+
+
+def test_unconvertible_json_values_are_quarantined(inputs):
+    path = _write(inputs / 'credit_bureau_api_response.json', [
+        {'customer_id': 'CUST1', 'credit_score': 'seven hundred'},
+        {'customer_id': 'CUST2', 'credit_score': 700},
+    ])
+    records = read_json_records(path, {'customers': {'CUST1', 'CUST2'}})
+    assert [record['customer_id'] for record in records] == ['CUST2']
+    quarantined = (settings.QUARANTINE_DIR / 'credit_bureau_api_response.json.rejected.csv').read_text()
+    assert "invalid int 'seven hundred'" in quarantined
+
+
+def test_json_ar_extract_holds_cents_and_day_numbers(inputs):
+    path = _write(inputs / 'ERP_AR_extract.json', {'records': [
+        {'CUSTOMER_ID': 'CUST1', 'INVOICE_NO': 'INV1', 'AMOUNT': '1234.56', 'DUE_DATE': '2024-03-01',
+         'STATUS': 'OPEN'},
+        {'CUSTOMER_ID': 'CUST1', 'INVOICE_NO': 'INV2', 'AMOUNT': 10.1, 'DUE_DATE': '2024-03-02',
+         'STATUS': 'OVERDUE', 'RISK_WEIGHT': '0.5'},
+    ]})
+    records = read_json_records(path, {'customers': {'CUST1'}})
+    assert [(r['AMOUNT'], r['DUE_DATE']) for r in records] == [(123456, to_day('2024-03-01')),
+                                                              (1010, to_day('2024-03-02'))]
+    assert records[1]['RISK_WEIGHT'] == 0.5
+
+
+def test_records_are_typed_with_validation_off(inputs, monkeypatch):
+    monkeypatch.setattr(settings, 'INPUT_VALIDATION_ENABLED', False)
+    path = _write(inputs / 'credit_bureau_api_response.json', [{'customer_id': 'CUST9', 'credit_score': '701'}])
+    assert read_json_records(path) == [{'customer_id': 'CUST9', 'credit_score': 701}]
+    _write(path, [{'customer_id': 'CUST9', 'credit_score': 'n/a'}])
+    with pytest.raises(ValueError, match="record 1: invalid int 'n/a'"):
+        read_json_records(path)
+
+
+def test_validate_records_leaves_the_input_records_unchanged():
+    schema = load_schemas()['credit_bureau_api_response.json']
+    records = [{'customer_id': 'CUST1', 'credit_score': '700'}]
+    accepted, rejected = schema.validate_records(records, {'customers': {'CUST1'}})
+    assert accepted == [{'customer_id': 'CUST1', 'credit_score': 700}]
+    assert records == [{'customer_id': 'CUST1', 'credit_score': '700'}]
+    assert rejected == []
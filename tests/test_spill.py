@@ -0,0 +1,96 @@
+"""
+Tests for utils.spill: aggregates spilled to disk under a memory budget and
+merged back in passes give the same result as the in-memory aggregation.
+"""
+
+import operator
+
+import pytest
+
+from agents.exposure_aggregator_agent import ExposureAggregatorAgent
+from agents.risk_scoring_agent import RiskScoringAgent
+from config import settings
+from utils import spill
+from utils.spill import MAX_MERGE_FAN_IN, MemoryBudget, SpillingAggregator
+
+
+@pytest.fixture
+def spill_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'QUARANTINE_DIR', tmp_path / 'quarantine')
+    monkeypatch.setattr(settings, 'SPILL_DIR', tmp_path / 'spill')
+    monkeypatch.setattr(settings, 'CSV_PARSE_WORKERS', 1)
+    # Small chunks, so the CSV files arrive as many partial aggregates
+    monkeypatch.setattr(settings, 'CSV_CHUNK_BYTES', 128)
+    monkeypatch.setattr(settings, 'MEMORY_BUDGET_MB', 0)
+    return monkeypatch
+
+
+def _with_budget(monkeypatch):
+    """Any RSS is over a 1 KB budget, checked after every addition: every new key spills"""
+    monkeypatch.setattr(settings, 'MEMORY_BUDGET_MB', 1 / 1024)
+    monkeypatch.setattr(settings, 'SPILL_CHECK_EVERY', 1)
+
+
+def _spill_stats(name):
+    return dict(spill.memory_report()['spilling'].get(name, {'spills': 0, 'merge_passes': 0}))
+
+
+def _exposure_report():
+    agent = ExposureAggregatorAgent()
+    assert agent._perceive()
+    return [{key: value for key, value in row.items() if key != 'timestamp'} for row in agent._reason()]
+
+
+def _payment_factors(customers):
+    agent = RiskScoringAgent()
+    agent.exposure_data = {customer_id: {} for customer_id in customers}
+    agent.load_scoring_inputs()
+    return agent.payment_factors()
+
+
+def test_spilled_exposure_report_matches_the_in_memory_report(spill_settings):
+    expected = _exposure_report()
+    assert expected
+
+    _with_budget(spill_settings)
+    before = _spill_stats('exposure')
+    assert _exposure_report() == expected
+    after = _spill_stats('exposure')
+    assert after['spills'] - before['spills'] > MAX_MERGE_FAN_IN
+    assert after['merge_passes'] > before['merge_passes']
+    assert not any(settings.SPILL_DIR.iterdir())
+
+
+def test_spilled_payment_delays_match_the_in_memory_factors(spill_settings):
+    customers = [row['customer_id'] for row in _exposure_report()]
+    expected = _payment_factors(customers)
+    assert set(expected) == set(customers)
+
+    _with_budget(spill_settings)
+    before = _spill_stats('payment_delays')
+    assert _payment_factors(customers) == expected
+    after = _spill_stats('payment_delays')
+    assert after['spills'] - before['spills'] > MAX_MERGE_FAN_IN
+    assert after['merge_passes'] > before['merge_passes']
+
+
+def test_items_can_be_read_again_after_merge_passes(tmp_path, monkeypatch):
+    monkeypatch.setattr(spill, 'MAX_MERGE_FAN_IN', 3)
+    aggregator = SpillingAggregator('test', operator.add, MemoryBudget(limit_mb=0), spill_dir=tmp_path)
+    expected = {}
+    for n in range(40):
+        key = f"K{n % 7}"
+        aggregator.add(key, n)
+        expected[key] = expected.get(key, 0) + n
+        if n % 2:
+            aggregator.spill()
+    aggregator.add('K0', 100)
+    expected['K0'] += 100
+    assert len(aggregator.runs) == 20
+
+    assert list(aggregator.items()) == sorted(expected.items())
+    # 20 runs -> 7 -> 3: two passes, and only the last pass's files are left
+    assert len(aggregator.runs) == 3 and all(run.exists() for run in aggregator.runs)
+    assert list(aggregator.items()) == sorted(expected.items())
+    aggregator.close()
+    assert not any(tmp_path.iterdir())
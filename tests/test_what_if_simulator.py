@@ -0,0 +1,59 @@
+"""
+Tests for agents.what_if_simulator_agent: risk factors of customers without a
+defined exposure ratio and a malformed credit policy.
+"""
+
+import json
+
+import pytest
+
+from agents.what_if_simulator_agent import WhatIfSimulatorAgent
+from config import settings
+
+POLICY = {'Low': "Increase limit by 30%", 'Medium': "Increase limit by 20%", 'High': "No increase"}
+
+
+@pytest.fixture
+def what_if_inputs(tmp_path, monkeypatch):
+    def setup(exposures, credit_scores=None, policy=None):
+        files = {
+            'EXPOSURE_REPORT_OUTPUT_FILE': [dict(e, timestamp='2026-01-01T00:00:00', agent_id='ExposureAggregator01')
+                                            for e in exposures],
+            'CREDIT_BUREAU_FILE': [{'customer_id': c, 'credit_score': s} for c, s in (credit_scores or {}).items()],
+            'CREDIT_POLICY_FILE': {'rules': [{'condition': c, 'action': a}
+                                             for c, a in dict(POLICY, **(policy or {})).items()]},
+            'WHAT_IF_SCENARIOS_FILE': {'thresholds': {'Low': [75, 80]}, 'policy': {'Low': [20, 30]}},
+        }
+        for name, data in files.items():
+            path = tmp_path / f"{name.lower()}.json"
+            path.write_text(json.dumps(data))
+            monkeypatch.setattr(settings, name, path)
+        monkeypatch.setattr(settings, 'QUARANTINE_DIR', tmp_path / 'quarantine')
+        monkeypatch.setattr(settings, 'CSV_PARSE_WORKERS', 1)
+        agent = WhatIfSimulatorAgent()
+        assert agent._perceive()
+        return agent
+    return setup
+
+
+def test_customers_without_an_exposure_ratio_get_zero(what_if_inputs):
+    agent = what_if_inputs([
+        {'customer_id': 'CUST1000', 'total_open_AR': 0.0, 'validation_status': 'FAIL'},  # e.g. no FX rate
+        {'customer_id': 'CUST1001', 'total_open_AR': 5000.0, 'validation_status': 'PASS'},
+        {'customer_id': 'CUST1002', 'total_open_AR': 7000.0, 'validation_status': 'PASS'},
+    ], {'CUST1001': 550, 'CUST1002': 720})
+    assert agent.customer_ids == ['CUST1000', 'CUST1001', 'CUST1002']
+    assert agent.exposure_ratios[:2] == [0.0, 0.0]
+    assert agent.exposure_ratios[2] > 0
+    report = agent._reason()
+    assert report['customers'] == 3
+    assert report['scenario_count'] == 4
+
+
+def test_malformed_policy_action_counts_as_no_increase(what_if_inputs):
+    agent = what_if_inputs([{'customer_id': 'CUST1000', 'total_open_AR': 5000.0, 'validation_status': 'PASS'}],
+                           policy={'Medium': "Increase limit by twenty percent"})
+    assert agent.baseline()['policy'] == {'Low': 30.0, 'Medium': 0.0, 'High': 0.0}
+    report = agent._reason()
+    assert report['baseline']['policy']['Medium'] == 0.0
+    assert {s['policy']['Low'] for s in report['scenarios']} == {20, 30}
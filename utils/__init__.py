@@ -0,0 +1 @@
+# Shared pipeline utilities used by the agents and the orchestrator
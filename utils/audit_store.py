@@ -0,0 +1,232 @@
+"""
+Audit Store
+===========
+Embedded SQLite store for the audit trail (and optionally the unified log),
+kept alongside audit_trail.json.
+
+Every Audit Logger run is recorded under its own run_id and retained, so the
+store holds the history of all runs. Rows are written with executemany in
+batches of settings.AUDIT_STORE_BATCH_SIZE inside a single transaction per
+run, so a run is stored completely or not at all. Run IDs come from
+new_run_id() and are kept in the checkpoint state, so a resumed run records
+under its original run_id and replaces that run's rows.
+
+Indexed columns: customer_id, final_status, step, the event / log
+timestamps and each workflow's events (run_id, workflow_id). `python audit_query.py` is the command-line front end.
+"""
+
+import json
+import sqlite3
+import uuid
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from config import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id       TEXT PRIMARY KEY,
+    recorded_at  TEXT NOT NULL,
+    workflows    INTEGER NOT NULL,
+    log_records  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS audit_workflows (
+    id             INTEGER PRIMARY KEY,
+    run_id         TEXT NOT NULL REFERENCES runs(run_id),
+    workflow_id    TEXT,
+    customer_id    TEXT,
+    final_status   TEXT,
+    last_event_at  TEXT
+);
+CREATE TABLE IF NOT EXISTS audit_events (
+    id           INTEGER PRIMARY KEY,
+    run_id       TEXT NOT NULL REFERENCES runs(run_id),
+    workflow_id  TEXT,
+    customer_id  TEXT,
+    step         TEXT,
+    status       TEXT,
+    timestamp    TEXT
+);
+CREATE TABLE IF NOT EXISTS unified_log (
+    id                 INTEGER PRIMARY KEY,
+    run_id             TEXT NOT NULL REFERENCES runs(run_id),
+    workflow_id        TEXT,
+    customer_id        TEXT,
+    agent_id           TEXT,
+    validation_status  TEXT,
+    timestamp          TEXT,
+    record             TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_workflows_customer ON audit_workflows(customer_id);
+CREATE INDEX IF NOT EXISTS idx_workflows_status ON audit_workflows(final_status, last_event_at);
+CREATE INDEX IF NOT EXISTS idx_workflows_time ON audit_workflows(last_event_at);
+CREATE INDEX IF NOT EXISTS idx_workflows_run ON audit_workflows(run_id);
+CREATE INDEX IF NOT EXISTS idx_events_customer ON audit_events(customer_id);
+CREATE INDEX IF NOT EXISTS idx_events_step ON audit_events(step, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_time ON audit_events(timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_workflow ON audit_events(run_id, workflow_id);
+CREATE INDEX IF NOT EXISTS idx_log_customer ON unified_log(customer_id);
+CREATE INDEX IF NOT EXISTS idx_log_time ON unified_log(timestamp);
+CREATE INDEX IF NOT EXISTS idx_log_run ON unified_log(run_id);
+"""
+
+
+def new_run_id() -> str:
+    """Unique run ID that still sorts by start time, e.g. 2026-01-11T09:30:00.123456-1f2e3d4c"""
+    return f"{datetime.now():%Y-%m-%dT%H:%M:%S.%f}-{uuid.uuid4().hex[:8]}"
+
+
+def _until(column: str, until: str):
+    """Clause and parameter for an exclusive timestamp or an inclusive ISO date, both index-friendly"""
+    if len(until) > 10:
+        return f"{column} < ?", until
+    return f"{column} < ?", (date.fromisoformat(until) + timedelta(days=1)).isoformat()
+
+
+def _batches(rows: List[tuple], size: int) -> Iterable[List[tuple]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class AuditStore:
+    """SQLite-backed, append-only history of audit trails"""
+
+    def __init__(self, db_path=None, batch_size: Optional[int] = None, read_only: bool = False):
+        self.db_path = Path(db_path or settings.AUDIT_DB_FILE)
+        self.batch_size = batch_size or settings.AUDIT_STORE_BATCH_SIZE
+        # Read-only stores never create the database, so a wrong path fails instead of matching nothing
+        self.read_only = read_only
+
+    def connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            if not self.db_path.is_file():
+                raise FileNotFoundError(f"No audit store at '{self.db_path}'")
+            conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True)
+            conn.row_factory = sqlite3.Row
+            return conn
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    # ---------- Writing ----------
+
+    def record_run(self, run_id: str, audit_trails: List[Dict],
+                   unified_log: Optional[Dict] = None) -> Dict[str, int]:
+        """Store one run's audit trails (and unified log records) in a single transaction"""
+        workflow_rows, event_rows, log_rows = [], [], []
+        for trail in audit_trails:
+            events = trail.get("events", [])
+            timestamps = [e.get("timestamp") for e in events if e.get("timestamp")]
+            workflow_rows.append((run_id, trail.get("workflow_id"), trail.get("customer_id"),
+                                  trail.get("final_status"), max(timestamps) if timestamps else None))
+            for event in events:
+                event_rows.append((run_id, trail.get("workflow_id"), trail.get("customer_id"),
+                                   event.get("step"), event.get("status"), event.get("timestamp")))
+        for workflow in (unified_log or {}).get("workflows", []):
+            for record in workflow.get("logs", []):
+                log_rows.append((run_id, workflow.get("workflow_id"), workflow.get("customer_id"),
+                                 record.get("agent_id"), record.get("validation_status"), record.get("timestamp"),
+                                 json.dumps(record, separators=(',', ':'))))
+
+        with closing(self.connect()) as conn, conn:
+            for table in ("unified_log", "audit_events", "audit_workflows", "runs"):
+                conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+            conn.execute("INSERT INTO runs (run_id, recorded_at, workflows, log_records) VALUES (?, ?, ?, ?)",
+                         (run_id, datetime.now().strftime("%Y-%m-%dT%H:%M:%S"), len(workflow_rows), len(log_rows)))
+            for batch in _batches(workflow_rows, self.batch_size):
+                conn.executemany("INSERT INTO audit_workflows (run_id, workflow_id, customer_id, final_status, "
+                                 "last_event_at) VALUES (?, ?, ?, ?, ?)", batch)
+            for batch in _batches(event_rows, self.batch_size):
+                conn.executemany("INSERT INTO audit_events (run_id, workflow_id, customer_id, step, status, "
+                                 "timestamp) VALUES (?, ?, ?, ?, ?, ?)", batch)
+            for batch in _batches(log_rows, self.batch_size):
+                conn.executemany("INSERT INTO unified_log (run_id, workflow_id, customer_id, agent_id, "
+                                 "validation_status, timestamp, record) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        return {'workflows': len(workflow_rows), 'events': len(event_rows), 'log_records': len(log_rows)}
+
+    # ---------- Queries ----------
+
+    def latest_run_id(self) -> Optional[str]:
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT run_id FROM runs ORDER BY recorded_at DESC, run_id DESC LIMIT 1").fetchone()
+        return row["run_id"] if row else None
+
+    def runs(self) -> List[Dict]:
+        with closing(self.connect()) as conn:
+            return [dict(row) for row in conn.execute("SELECT * FROM runs ORDER BY recorded_at, run_id")]
+
+    def workflows(self, customer_id: Optional[str] = None, status: Optional[str] = None,
+                  step: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                  run_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Audit trail entries matching all given filters, with their events.
+        `since` / `until` are ISO dates or timestamps compared with the
+        workflow's latest event; `step` keeps workflows that executed that step.
+        """
+        clauses, params = [], []
+        for column, value in (("w.customer_id", customer_id), ("w.final_status", status), ("w.run_id", run_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since:
+            clauses.append("w.last_event_at >= ?")
+            params.append(since)
+        if until:
+            # A bare date includes the whole day
+            clause, value = _until("w.last_event_at", until)
+            clauses.append(clause)
+            params.append(value)
+        if step:
+            clauses.append("EXISTS (SELECT 1 FROM audit_events e WHERE e.run_id = w.run_id "
+                           "AND e.workflow_id = w.workflow_id AND e.step = ?)")
+            params.append(step)
+        sql = "SELECT w.* FROM audit_workflows w"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY w.last_event_at, w.customer_id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        with closing(self.connect()) as conn:
+            rows = [dict(row) for row in conn.execute(sql, params)]
+            # The events of all matched workflows in one query, through idx_events_workflow
+            events: Dict[tuple, List[Dict]] = {}
+            for event in conn.execute(
+                    f"SELECT e.run_id, e.workflow_id, e.step, e.status, e.timestamp FROM audit_events e "
+                    f"JOIN (SELECT DISTINCT run_id, workflow_id FROM ({sql})) w "
+                    f"ON e.run_id = w.run_id AND e.workflow_id = w.workflow_id ORDER BY e.id", params):
+                events.setdefault((event["run_id"], event["workflow_id"]), []).append(
+                    {"step": event["step"], "status": event["status"], "timestamp": event["timestamp"]})
+        for row in rows:
+            row["events"] = events.get((row["run_id"], row["workflow_id"]), [])
+            del row["id"]
+        return rows
+
+    def log_records(self, customer_id: Optional[str] = None, agent_id: Optional[str] = None,
+                    since: Optional[str] = None, until: Optional[str] = None,
+                    run_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Unified log records matching all given filters"""
+        clauses, params = [], []
+        for column, value in (("customer_id", customer_id), ("agent_id", agent_id), ("run_id", run_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clause, value = _until("timestamp", until)
+            clauses.append(clause)
+            params.append(value)
+        sql = "SELECT run_id, record FROM unified_log"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp, id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with closing(self.connect()) as conn:
+            return [{"run_id": row["run_id"], **json.loads(row["record"])} for row in conn.execute(sql, params)]
@@ -0,0 +1,118 @@
+"""
+Checkpoint Manager
+==================
+Persists stage-completion markers for the orchestrator and chunked partial
+results for long-running agents, so an interrupted workflow can be resumed
+with `python main.py --resume` instead of restarting from stage 1.
+
+Layout under settings.CHECKPOINT_DIR:
+    stages/<stage>.json          - completion marker with the stage's outputs
+    workflow/state.json          - the run ID, kept by resumed runs
+    <name>/state.json            - small agent state (e.g. the run timestamp)
+    <name>/chunk_00001.json ...  - completed records, written in chunks
+"""
+
+import json
+import logging
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import settings
+from utils.audit_store import new_run_id
+from utils.serialization import OutputWriter
+
+# Checkpoints are internal, so they are always compact and uncompressed
+_checkpoint_writer = OutputWriter(fmt='compact', compression='none')
+
+
+def _write_json_atomic(path: Path, data) -> None:
+    _checkpoint_writer.write(path, data)
+
+
+class CheckpointManager:
+    """Stores stage markers and chunked agent state for resumable runs"""
+
+    def __init__(self, checkpoint_dir=None):
+        self.checkpoint_dir = Path(checkpoint_dir or settings.CHECKPOINT_DIR)
+        self.logger = logging.getLogger("CheckpointManager")
+
+    # ---------- Stage markers ----------
+
+    def _stage_marker(self, stage: str) -> Path:
+        slug = stage.lower().replace(' ', '_')
+        return self.checkpoint_dir / 'stages' / f"{slug}.json"
+
+    def is_stage_complete(self, stage: str) -> bool:
+        """True if the stage finished earlier and all of its outputs still exist"""
+        marker = self._stage_marker(stage)
+        if not marker.exists():
+            return False
+        try:
+            with open(marker, 'r') as f:
+                outputs = json.load(f).get('outputs', [])
+        except (OSError, json.JSONDecodeError):
+            return False
+        return all(Path(output).exists() for output in outputs)
+
+    def mark_stage_complete(self, stage: str, outputs: Optional[List] = None) -> None:
+        """Record that a stage finished, along with the files it produced"""
+        _write_json_atomic(self._stage_marker(stage), {
+            'stage': stage,
+            'outputs': [str(output) for output in (outputs or [])],
+            'completed_at': datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        })
+
+    # ---------- Run ID ----------
+
+    def run_id(self) -> str:
+        """ID of the run these checkpoints belong to; created on first use, reused by --resume"""
+        state = self.load_state('workflow')
+        if state and state.get('run_id'):
+            return state['run_id']
+        run_id = new_run_id()
+        try:
+            self.save_state('workflow', {'run_id': run_id})
+        except OSError as e:
+            # The run goes ahead; only a later --resume would record under a new ID
+            self.logger.warning(f"Could not save the run ID: {e}")
+        return run_id
+
+    # ---------- Agent state and chunks ----------
+
+    def save_state(self, name: str, state: Dict) -> None:
+        _write_json_atomic(self.checkpoint_dir / name / 'state.json', state)
+
+    def load_state(self, name: str) -> Optional[Dict]:
+        path = self.checkpoint_dir / name / 'state.json'
+        if not path.exists():
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def append_chunk(self, name: str, records: List[Dict]) -> None:
+        """Persist the next chunk of completed records for an agent"""
+        if not records:
+            return
+        chunk_dir = self.checkpoint_dir / name
+        chunk_number = len(list(chunk_dir.glob('chunk_*.json'))) + 1 if chunk_dir.exists() else 1
+        _write_json_atomic(chunk_dir / f"chunk_{chunk_number:05d}.json", records)
+        self.logger.info(f"Checkpointed {len(records)} records for {name} (chunk {chunk_number})")
+
+    def load_chunks(self, name: str) -> List[Dict]:
+        """Return all checkpointed records for an agent in the order they were written"""
+        chunk_dir = self.checkpoint_dir / name
+        if not chunk_dir.exists():
+            return []
+        records = []
+        for chunk_path in sorted(chunk_dir.glob('chunk_*.json')):
+            with open(chunk_path, 'r') as f:
+                records.extend(json.load(f))
+        return records
+
+    def clear_agent(self, name: str) -> None:
+        shutil.rmtree(self.checkpoint_dir / name, ignore_errors=True)
+
+    def clear(self) -> None:
+        """Remove all markers and partial results"""
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
@@ -0,0 +1,432 @@
+"""
+Cluster Coordinator and Workers
+===============================
+Runs the per-customer stages of the workflow (exposure, risk scores, limit
+decisions) on several worker processes, on this node or on others, over TCP.
+
+The coordinator (ShardCoordinator) holds a list of shard payloads and hands
+them out one at a time to whichever worker is free, so faster workers take
+more shards. Messages are length-prefixed JSON:
+
+    worker -> coordinator   {"type": "hello", "worker": name, "token": CLUSTER_TOKEN}
+    coordinator -> worker   {"type": "welcome", "settings": {...}}
+    coordinator -> worker   {"type": "shard", "shard": i, "payload": {...}} | {"type": "stop"}
+    worker -> coordinator   {"type": "heartbeat"}, then
+                            {"type": "result", "shard": i, "result": {...}} | {"type": "error", ...}
+
+A shard whose worker disconnects, stays silent for CLUSTER_WORKER_TIMEOUT_SECONDS,
+has not returned a result within CLUSTER_SHARD_TIMEOUT_SECONDS or reports an
+error goes back to the queue and is retried on the next free worker
+(CLUSTER_MAX_ATTEMPTS dispatches per shard). Local worker processes
+that exit are restarted (CLUSTER_WORKER_RESTARTS per run). Workers read the
+input files themselves, at the paths sent in the welcome message, so other
+nodes need them at the same paths (e.g. a shared mount).
+
+Without a CLUSTER_TOKEN the coordinator only listens on a loopback address,
+with a random token it hands to the local workers it starts.
+"""
+
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import secrets
+import socket
+import struct
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+from config import settings
+
+logger = logging.getLogger("ClusterCoordinator")
+
+_HEADER = struct.Struct('!I')
+
+# Upper bound of one message, so a corrupt length prefix fails fast
+MAX_MESSAGE_BYTES = 1 << 30
+
+# Settings a worker takes over from the coordinator, so all shards see the same inputs
+SHARED_SETTINGS = (
+    'CUSTOMER_LIST_FILE', 'JSON_EXTRACT_FILE', 'CSV_RECORDS_FILE', 'CSV_RECORDS_INDEX_FILE', 'FX_RATES_FILE',
+    'PAYMENT_HISTORY_FILE', 'PAYMENT_HISTORY_INDEX_FILE', 'CREDIT_BUREAU_FILE', 'ERP_CUSTOMER_FILE',
+    'CREDIT_POLICY_FILE', 'REPORTING_CURRENCY', 'FX_RATE_BASE_CURRENCY', 'FX_VALUATION_DATE',
+    'INPUT_VALIDATION_ENABLED', 'INPUT_SCHEMAS_FILE', 'QUARANTINE_DIR', 'MEMORY_BUDGET_MB',
+)
+
+
+def send_message(sock: socket.socket, message: Dict) -> None:
+    data = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Dict:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise ConnectionError(f"message of {size} bytes exceeds {MAX_MESSAGE_BYTES}")
+    message = json.loads(_recv_exact(sock, size))
+    if not isinstance(message, dict):
+        raise ValueError(f"expected a JSON object, got {type(message).__name__}")
+    return message
+
+
+def is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def shared_settings() -> Dict:
+    return {name: str(value) if isinstance(value, Path) else value
+            for name, value in ((name, getattr(settings, name)) for name in SHARED_SETTINGS)}
+
+
+def apply_settings(values: Dict) -> None:
+    for name, value in values.items():
+        if name in SHARED_SETTINGS:
+            setattr(settings, name, Path(value) if isinstance(getattr(settings, name), Path) else value)
+
+
+class _WorkerStats:
+    def __init__(self):
+        self.shards = 0
+        self.customers = 0
+        self.busy_seconds = 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            'shards': self.shards,
+            'customers': self.customers,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'customers_per_second': round(self.customers / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+        }
+
+
+class ShardCoordinator:
+    """
+    Hands shard payloads to connected workers and collects their results.
+    `units` counts the customers of each shard (for throughput figures);
+    `local_workers` worker processes are started with `worker_command`
+    followed by --worker HOST:PORT --worker-name NAME.
+    """
+
+    def __init__(self, payloads: Sequence[Dict], units: Optional[Sequence[int]] = None, local_workers: int = 0,
+                 worker_command: Optional[List[str]] = None, host: Optional[str] = None, port: Optional[int] = None):
+        self.payloads = list(payloads)
+        self.units = list(units) if units is not None else [1] * len(self.payloads)
+        self.local_workers = local_workers
+        self.worker_command = worker_command
+        self.host = host or settings.CLUSTER_HOST
+        self.port = settings.CLUSTER_PORT if port is None else port
+        self.max_attempts = settings.CLUSTER_MAX_ATTEMPTS
+        self.token = settings.CLUSTER_TOKEN
+        self.queue = deque(range(len(self.payloads)))
+        self.results: List[Optional[Dict]] = [None] * len(self.payloads)
+        self.attempts = [0] * len(self.payloads)
+        self.completed = 0
+        self.failure: Optional[str] = None
+        self.condition = threading.Condition()
+        self.stats: Dict[str, _WorkerStats] = {}
+        self.connections = set()
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.retries = 0
+        self.restarts = 0
+        self.listener = None
+        self.wall_seconds = 0.0
+
+    # ---------- Run ----------
+
+    def run(self) -> List[Dict]:
+        """Results of all shards in shard order; raises RuntimeError when a shard runs out of attempts"""
+        if not self.token:
+            if not is_loopback(self.host):
+                raise RuntimeError(f"CLUSTER_TOKEN must be set to listen on {self.host}")
+            # Only the local workers started below can join
+            self.token = secrets.token_urlsafe(32)
+        self.listener = socket.create_server((self.host, self.port))
+        self.host, self.port = self.listener.getsockname()[:2]
+        logger.info(f"Coordinator listening on {self.host}:{self.port}: {len(self.payloads)} shards, "
+                    f"{sum(self.units)} customers")
+        started = time.perf_counter()
+        threading.Thread(target=self._accept, name="cluster-accept", daemon=True).start()
+        try:
+            for index in range(self.local_workers):
+                self._spawn(f"local-{index + 1}")
+            while True:
+                with self.condition:
+                    if self._finished():
+                        break
+                    self.condition.wait(timeout=1.0)
+                self._check_processes()
+        finally:
+            self.wall_seconds = time.perf_counter() - started
+            self._shutdown()
+        if self.failure:
+            raise RuntimeError(self.failure)
+        logger.info(f"All {len(self.payloads)} shards completed in {self.wall_seconds:.2f}s "
+                    f"({self.retries} retries, {self.restarts} worker restarts)")
+        return self.results
+
+    def _finished(self) -> bool:
+        return self.failure is not None or self.completed == len(self.payloads)
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, peer = self.listener.accept()
+            except OSError:
+                return  # listener closed
+            threading.Thread(target=self._serve, args=(conn, f"{peer[0]}:{peer[1]}"), daemon=True).start()
+
+    def _serve(self, conn: socket.socket, name: str) -> None:
+        """Handshake, then one shard at a time until the queue is done"""
+        shard = None
+        joined = False
+        with self.condition:
+            self.connections.add(conn)
+        try:
+            # A heartbeat or result must arrive within the timeout, or the worker is considered lost
+            conn.settimeout(settings.CLUSTER_WORKER_TIMEOUT_SECONDS)
+            hello = recv_message(conn)
+            if hello.get('type') != 'hello' or not hmac.compare_digest(
+                    str(hello.get('token', '')).encode(), self.token.encode()):
+                logger.warning(f"Rejected connection from {name}: bad handshake")
+                return
+            name = str(hello.get('worker') or name)
+            send_message(conn, {'type': 'welcome', 'settings': shared_settings()})
+            with self.condition:
+                stats = self.stats.setdefault(name, _WorkerStats())
+            joined = True
+            logger.info(f"Worker {name} joined")
+            while True:
+                shard = self._next_shard()
+                if shard is None:
+                    send_message(conn, {'type': 'stop'})
+                    return
+                send_message(conn, {'type': 'shard', 'shard': shard, 'payload': self.payloads[shard]})
+                started = time.perf_counter()
+                message = self._await_result(conn, name, started + settings.CLUSTER_SHARD_TIMEOUT_SECONDS)
+                if (message.get('type') == 'result' and message.get('shard') == shard
+                        and isinstance(message.get('result'), dict)):
+                    self._complete(shard, message['result'], stats, time.perf_counter() - started)
+                else:
+                    # The worker is still usable; the shard goes to the next free worker
+                    self._requeue(shard, name, message.get('error', f"unexpected message {message.get('type')}"))
+                shard = None
+        except Exception as e:
+            if shard is not None:
+                self._requeue(shard, name, f"{type(e).__name__}: {e}")
+            elif joined:
+                logger.warning(f"Worker {name} disconnected: {e}")
+            else:
+                logger.warning(f"Rejected connection from {name}: {type(e).__name__}: {e}")
+        finally:
+            conn.close()
+            with self.condition:
+                self.connections.discard(conn)
+                self.condition.notify_all()
+
+    def _await_result(self, conn: socket.socket, name: str, deadline: float) -> Dict:
+        """
+        The worker's next message other than a heartbeat. Heartbeats come from
+        their own thread, so a worker whose shard hangs keeps sending them; past
+        the shard deadline the shard is given up (and a local worker killed).
+        """
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                process = self.processes.get(name)
+                if process is not None:
+                    process.kill()
+                raise TimeoutError(f"no result within {settings.CLUSTER_SHARD_TIMEOUT_SECONDS:g}s")
+            conn.settimeout(min(settings.CLUSTER_WORKER_TIMEOUT_SECONDS, remaining))
+            try:
+                message = recv_message(conn)
+            except socket.timeout:
+                if time.perf_counter() < deadline:
+                    raise
+                continue
+            if message.get('type') != 'heartbeat':
+                return message
+
+    def _next_shard(self) -> Optional[int]:
+        """Blocks until a shard is queued (None once all are done or the run failed)"""
+        with self.condition:
+            while not self.queue and not self._finished():
+                self.condition.wait()
+            if self._finished():
+                return None
+            shard = self.queue.popleft()
+            self.attempts[shard] += 1
+            return shard
+
+    def _complete(self, shard: int, result: Dict, stats: _WorkerStats, seconds: float) -> None:
+        with self.condition:
+            if self.results[shard] is None:
+                self.results[shard] = result
+                self.completed += 1
+            stats.shards += 1
+            stats.customers += self.units[shard]
+            stats.busy_seconds += seconds
+            self.condition.notify_all()
+
+    def _requeue(self, shard: int, worker: str, error: str) -> None:
+        with self.condition:
+            if self.attempts[shard] >= self.max_attempts:
+                self.failure = f"Shard {shard} failed {self.attempts[shard]} times; last error on {worker}: {error}"
+                logger.error(self.failure)
+            else:
+                self.retries += 1
+                self.queue.appendleft(shard)
+                logger.warning(f"Shard {shard} failed on worker {worker} ({error}); retrying "
+                               f"(attempt {self.attempts[shard] + 1}/{self.max_attempts})")
+            self.condition.notify_all()
+
+    # ---------- Local workers ----------
+
+    def _spawn(self, name: str) -> None:
+        host = '127.0.0.1' if self.host in ('0.0.0.0', '') else self.host
+        command = list(self.worker_command) + ['--worker', f"{host}:{self.port}", '--worker-name', name]
+        # Workers log to their own files; the token is passed on even if it was set in code
+        self.processes[name] = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                                env=dict(os.environ, CLUSTER_TOKEN=self.token))
+
+    def _check_processes(self) -> None:
+        """Restarts local workers that exited before the run finished"""
+        for name, process in list(self.processes.items()):
+            code = process.poll()
+            if code is None:
+                continue
+            del self.processes[name]
+            with self.condition:
+                if self._finished():
+                    return
+            if self.restarts < settings.CLUSTER_WORKER_RESTARTS:
+                self.restarts += 1
+                logger.warning(f"Worker {name} exited with code {code}; restarting "
+                               f"({self.restarts}/{settings.CLUSTER_WORKER_RESTARTS})")
+                self._spawn(name)
+            else:
+                logger.error(f"Worker {name} exited with code {code}; no restarts left")
+        with self.condition:
+            if self.local_workers and not self.processes and not self.connections and not self._finished():
+                self.failure = "All local workers exited and no other worker is connected"
+                logger.error(self.failure)
+
+    def _shutdown(self) -> None:
+        self.listener.close()
+        with self.condition:
+            if self.failure:
+                # Unblock workers still busy with shards of a failed run
+                for conn in list(self.connections):
+                    conn.close()
+            self.condition.notify_all()
+        for name, process in self.processes.items():
+            try:
+                process.wait(timeout=settings.CLUSTER_WORKER_TIMEOUT_SECONDS)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"Worker {name} did not stop; killing it")
+                process.kill()
+                process.wait()
+
+    # ---------- Report ----------
+
+    def report(self) -> Dict:
+        """Per-worker shard counts and throughput, retries and overall throughput"""
+        customers = sum(self.units)
+        return {
+            'address': f"{self.host}:{self.port}",
+            'shards': len(self.payloads),
+            'customers': customers,
+            'local_workers': self.local_workers,
+            'workers': {name: stats.as_dict() for name, stats in sorted(self.stats.items())},
+            'retries': self.retries,
+            'worker_restarts': self.restarts,
+            'wall_seconds': round(self.wall_seconds, 3),
+            'customers_per_second': round(customers / self.wall_seconds, 1) if self.wall_seconds else 0.0,
+        }
+
+
+def _connect(host: str, port: int) -> socket.socket:
+    """Connects to the coordinator, retrying while it starts up"""
+    deadline = time.monotonic() + settings.CLUSTER_WORKER_TIMEOUT_SECONDS
+    while True:
+        try:
+            sock = socket.create_connection((host, port), timeout=settings.CLUSTER_WORKER_TIMEOUT_SECONDS)
+            sock.settimeout(None)
+            return sock
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+def _heartbeat(sock: socket.socket, lock: threading.Lock, done: threading.Event) -> None:
+    while not done.wait(settings.CLUSTER_HEARTBEAT_SECONDS):
+        try:
+            with lock:
+                send_message(sock, {'type': 'heartbeat'})
+        except OSError:
+            return
+
+
+def serve_worker(address: str, handler: Callable[[Dict], Dict], name: str) -> bool:
+    """
+    Worker loop: joins the coordinator at HOST:PORT and runs `handler` on each
+    shard payload until told to stop. Returns False if the coordinator went away.
+    """
+    worker_logger = logging.getLogger(f"ClusterWorker-{name}")
+    host, _, port = address.rpartition(':')
+    try:
+        sock = _connect(host or '127.0.0.1', int(port))
+    except (OSError, ValueError) as e:
+        worker_logger.error(f"Cannot reach coordinator at {address}: {e}")
+        return False
+    lock = threading.Lock()
+    with sock:
+        try:
+            send_message(sock, {'type': 'hello', 'worker': name, 'token': settings.CLUSTER_TOKEN})
+            welcome = recv_message(sock)
+            apply_settings(welcome.get('settings', {}))
+            worker_logger.info(f"Joined coordinator at {address}")
+            while True:
+                message = recv_message(sock)
+                if message.get('type') == 'stop':
+                    worker_logger.info("Coordinator has no more shards; stopping")
+                    return True
+                shard = message['shard']
+                done = threading.Event()
+                beat = threading.Thread(target=_heartbeat, args=(sock, lock, done), daemon=True)
+                beat.start()
+                started = time.perf_counter()
+                try:
+                    reply = {'type': 'result', 'shard': shard, 'result': handler(message['payload'])}
+                    worker_logger.info(f"Shard {shard} done in {time.perf_counter() - started:.2f}s")
+                except Exception as e:
+                    worker_logger.exception(f"Shard {shard} failed")
+                    reply = {'type': 'error', 'shard': shard, 'error': f"{type(e).__name__}: {e}"}
+                finally:
+                    done.set()
+                    beat.join()
+                with lock:
+                    send_message(sock, reply)
+        except (OSError, ValueError) as e:
+            worker_logger.error(f"Lost the coordinator at {address}: {e}")
+            return False
@@ -0,0 +1,132 @@
+"""
+CSV Offset Index
+================
+Sidecar index giving random access to the rows of one key (e.g. a
+CUSTOMER_ID) in a large CSV file without scanning it.
+
+build_index() scans the file once and records, per key, the byte ranges of
+its rows; consecutive rows of the same key are coalesced into one range, so
+a file grouped by customer needs a single range per customer. The index is
+saved next to the data file together with the file's size and modification
+time, and load_index() rebuilds it whenever the data file has changed (a
+loaded index is kept in memory, so repeated lookups in one process, e.g. the
+shards of a cluster worker, parse it once). read_keys() then parses only the
+ranges of the requested keys.
+"""
+
+import csv
+import json
+import logging
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+from utils.fast_csv import parse_ranges, read_header
+from utils.serialization import atomic_write
+
+INDEX_VERSION = 1
+
+logger = logging.getLogger("CsvIndex")
+
+# Indexes loaded by this process, by index path; reused while their data file is unchanged
+_loaded: Dict[Path, Dict] = {}
+
+
+def default_index_path(csv_path) -> Path:
+    return Path(f"{csv_path}.idx")
+
+
+def _source_stamp(csv_path) -> Dict:
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def build_index(csv_path, key_column: str, index_path=None) -> Dict:
+    """Scan `csv_path` and write the per-key byte-range index; returns the index"""
+    started = time.perf_counter()
+    index_path = Path(index_path or default_index_path(csv_path))
+    header, data_start = read_header(csv_path)
+    if header and key_column not in header:
+        raise KeyError(f"{csv_path} has no column '{key_column}'")
+    key_position = header.index(key_column) if header else 0
+
+    ranges: Dict[str, List[List[int]]] = {}
+    rows = 0
+    with open(csv_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = data_start
+                previous_key, previous_range = None, None
+                while start < size:
+                    newline = mm.find(b'\n', start)
+                    end = size if newline == -1 else newline + 1
+                    line = mm[start:end]
+                    if line.strip():
+                        if b'"' in line:
+                            fields = next(csv.reader([line.decode('utf-8')]))
+                        else:
+                            fields = line.decode('utf-8').rstrip('\r\n').split(',')
+                        key = fields[key_position]
+                        if key == previous_key and previous_range[1] == start:
+                            previous_range[1] = end
+                        else:
+                            previous_range = [start, end]
+                            ranges.setdefault(key, []).append(previous_range)
+                            previous_key = key
+                        rows += 1
+                    start = end
+
+    index = {
+        'version': INDEX_VERSION,
+        'source': Path(csv_path).name,
+        'key_column': key_column,
+        'rows': rows,
+        **_source_stamp(csv_path),
+        'ranges': ranges,
+    }
+    with atomic_write(index_path) as f:
+        json.dump(index, f, separators=(',', ':'))
+    logger.info(f"Indexed {rows} rows of {Path(csv_path).name} by {key_column} "
+                f"({len(ranges)} keys) in {time.perf_counter() - started:.2f}s -> {index_path}")
+    return index
+
+
+def load_index(csv_path, key_column: str, index_path=None) -> Dict:
+    """Load the sidecar index, rebuilding it if it is missing or stale"""
+    index_path = Path(index_path or default_index_path(csv_path))
+    stamp = _source_stamp(csv_path)
+
+    def current(index: Dict) -> bool:
+        return (index.get('version') == INDEX_VERSION and index.get('key_column') == key_column
+                and index.get('size') == stamp['size'] and index.get('mtime_ns') == stamp['mtime_ns'])
+
+    index = _loaded.get(index_path)
+    if index is not None and current(index):
+        return index
+    try:
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        if not current(index):
+            logger.info(f"Index {index_path} is out of date. Rebuilding.")
+            index = build_index(csv_path, key_column, index_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        logger.info(f"No usable index at {index_path}. Building it.")
+        index = build_index(csv_path, key_column, index_path)
+    _loaded[index_path] = index
+    return index
+
+
+def read_keys(csv_path, key_column: str, keys: Iterable[str], converters: Dict[str, str],
+              reducer: Callable, index_path=None, quarantine=None, references: Optional[Dict] = None):
+    """Parse only the rows of `keys` (in file order) and reduce them to one aggregate"""
+    index = load_index(csv_path, key_column, index_path)
+    ranges = []
+    # Adjacent ranges (e.g. neighbouring keys of a file sorted by key) are parsed as one
+    for start, end in sorted(tuple(r) for key in set(keys) for r in index['ranges'].get(key, [])):
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return parse_ranges(csv_path, ranges, converters, reducer, quarantine, references)
@@ -0,0 +1,56 @@
+"""
+Dates
+=====
+Shared date handling for the input feeds. Dates are converted once at ingest
+from 'YYYY-MM-DD' strings to integer day numbers (proleptic Gregorian
+ordinals, as date.toordinal()), and the agents compare, subtract and look up
+rates on those integers.
+
+The feeds repeat a small set of distinct dates, so conversions go through a
+memo table: a dict whose misses parse the fixed format once, and whose hits
+are a plain dict lookup. to_day is that dict's __getitem__, so converting a
+column with map(to_day, values) never leaves C for a known date.
+"""
+
+from datetime import date
+
+# Distinct dates memoised before the tables are cleared (a guard against unbounded inputs)
+MEMO_LIMIT = 100_000
+
+
+class _DayTable(dict):
+    """'YYYY-MM-DD' -> day number, parsing each distinct string once"""
+
+    def __missing__(self, value) -> int:
+        if (not isinstance(value, str) or len(value) != 10 or value[4] != '-' or value[7] != '-'
+                or not (value[:4] + value[5:7] + value[8:]).isdigit()):
+            raise ValueError(f"invalid date (expected YYYY-MM-DD): {value!r}")
+        try:
+            day = date(int(value[:4]), int(value[5:7]), int(value[8:])).toordinal()
+        except ValueError as e:
+            raise ValueError(f"invalid date {value!r}: {e}") from None
+        if len(self) >= MEMO_LIMIT:
+            self.clear()
+        self[value] = day
+        return day
+
+
+class _DateTable(dict):
+    """Day number -> 'YYYY-MM-DD', formatting each distinct day once"""
+
+    def __missing__(self, day: int) -> str:
+        value = date.fromordinal(day).isoformat()
+        if len(self) >= MEMO_LIMIT:
+            self.clear()
+        self[day] = value
+        return value
+
+
+_days = _DayTable()
+_dates = _DateTable()
+
+# 'YYYY-MM-DD' -> day number; raises ValueError for anything else
+to_day = _days.__getitem__
+
+# Day number -> 'YYYY-MM-DD'
+from_day = _dates.__getitem__
@@ -0,0 +1,374 @@
+"""
+Parallel CSV Reader
+===================
+Parses large CSV inputs in parallel without building a dict per row.
+
+The file is memory-mapped and its data section split into newline-aligned
+byte ranges. Each range is parsed (in a process pool for large files) into
+typed columns - amounts as integer cents, dates as day numbers (utils/dates.py) - and reduced
+to a partial aggregate by a caller-supplied function. Partials are merged back in
+file order, so results do not depend on the number of workers.
+
+Reducer and merge functions must be module-level functions so they can be
+sent to worker processes. The pool starts its workers with forkserver (spawn
+where that is unavailable), never fork: it is created from scheduler threads
+while the logging listener and other stages run, and a forked child could
+inherit a lock held by one of them. Quoted fields containing newlines are not
+supported (none of the input feeds use them).
+
+With a `quarantine` (utils/schema.py), every range is also validated column
+by column against the file's declared schema; only accepted rows reach the
+reducer, and rejected rows are handed to the
+quarantine with their line numbers and reasons.
+"""
+
+import bisect
+import csv
+import io
+import mmap
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from config import settings
+from utils.dates import to_day
+from utils.money import to_cents
+
+
+CONVERTERS = {
+    'str': str,
+    'float': float,
+    'int': int,
+    'day': to_day,
+    'cents': to_cents,
+}
+
+_POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# Errors that send a row down the column-by-column path when validating
+_ROW_ERRORS = (ValueError, TypeError, OverflowError, AttributeError, IndexError)
+
+# Rejected rows of a validated range up to which they are deleted from the columns in place
+_DELETE_LIMIT = 64
+
+
+def _read_header(mm) -> Tuple[List[str], int]:
+    end = mm.find(b'\n')
+    if end == -1:
+        end = len(mm)
+    header_line = mm[:end].decode('utf-8-sig').rstrip('\r')
+    return next(csv.reader([header_line])), min(end + 1, len(mm))
+
+
+def read_header(path) -> Tuple[List[str], int]:
+    """Return the column names and the byte offset of the first data row"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [], 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _read_header(mm)
+
+
+def split_ranges(path, chunk_bytes: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Return the header and newline-aligned (start, end) byte ranges of the data rows"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [], []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header, data_start = _read_header(mm)
+            size = len(mm)
+            ranges = []
+            start = data_start
+            while start < size:
+                end = min(start + chunk_bytes, size)
+                if end < size:
+                    newline = mm.find(b'\n', end)
+                    end = size if newline == -1 else newline + 1
+                ranges.append((start, end))
+                start = end
+            return header, ranges
+
+
+def _parse_columns(path, mm, ranges: List[Tuple[int, int]], header: List[str], converters: Dict[str, str]) -> Dict:
+    """Parse the rows in `ranges` of an open mapping into typed columns"""
+    missing = [name for name in converters if name not in header]
+    if missing:
+        raise KeyError(f"{path} is missing required column(s): {', '.join(missing)}")
+    positions = [(name, header.index(name), CONVERTERS[kind]) for name, kind in converters.items()]
+    columns = {name: [] for name in converters}
+    appenders = [(columns[name].append, index, convert) for name, index, convert in positions]
+
+    for start, end in ranges:
+        text = mm[start:end].decode('utf-8')
+        for line_number, row in enumerate(csv.reader(io.StringIO(text, newline='')), start=1):
+            if not row:
+                continue
+            try:
+                for append, index, convert in appenders:
+                    append(convert(row[index]))
+            except (ValueError, IndexError) as e:
+                raise ValueError(f"{path}: bad row at byte range {start}-{end}, line {line_number}: {row} ({e})")
+    return columns
+
+
+def _segment(segments: List[Tuple[int, int, int, List[int]]], row: int) -> Tuple[int, int, int]:
+    """Range start and end of parsed row `row`, and its line within the range"""
+    for first, start, end, blanks in reversed(segments):
+        if row >= first:
+            return start, end, (row - first) + bisect.bisect_right(blanks, row)
+
+
+def _line_number(mm, segments: List[Tuple[int, int, int, List[int]]], row: int, newlines: Dict[int, int]) -> int:
+    """File line number of parsed row `row`, counting the lines before its byte range only when needed"""
+    start, _, line = _segment(segments, row)
+    if start not in newlines:
+        newlines[start] = mm[:start].count(b'\n')
+    return newlines[start] + 1 + line
+
+
+def _raw_rows(mm, segments: List[Tuple[int, int, int, List[int]]], positions: List[int]) -> Dict[int, List[str]]:
+    """Raw fields of the parsed rows at `positions`, re-read from their lines"""
+    rows = {}
+    lines: Dict[int, List[bytes]] = {}
+    for row in positions:
+        start, end, line = _segment(segments, row)
+        if start not in lines:
+            lines[start] = mm[start:end].split(b'\n')
+        text = lines[start][line].decode('utf-8').rstrip('\r')
+        rows[row] = next(csv.reader([text]), [])
+    return rows
+
+
+def _parse_validated(path, mm, ranges: List[Tuple[int, int]], header: List[str], converters: Dict[str, str],
+                     schema, references: Optional[Dict]) -> Tuple[Dict, int, List[List]]:
+    """
+    Parse the rows in `ranges` and validate them against `schema`. Each
+    value is checked while reading by its column's row check (see
+    schema.Column.row_check). Columns the caller wants with their declared
+    type are kept as the checks convert them, the others are read as
+    strings; checked columns the caller does not want are not kept.
+    Returns the typed `converters` columns of the accepted rows, the number
+    of rows read and quarantine rows ([line, reasons, *raw values]) for the
+    rejected ones.
+    """
+    names = schema.checked + [name for name in converters if name not in schema.checked]
+    missing = [name for name in names if name not in header]
+    if missing:
+        raise KeyError(f"{path} is missing required column(s): {', '.join(missing)}")
+    references = references or {}
+    inline = {name for name, kind in converters.items() if schema.types.get(name) == kind}
+    values = {name: [] for name in converters}
+    # Kept columns: (values, field index, conversion, declared column if inline). Columns not
+    # converted inline are read as strings (str() returns them as they are)
+    kept = [(values[name], header.index(name),
+             schema.by_name[name].row_check(references) if name in inline else str,
+             schema.by_name[name] if name in inline else None) for name in converters]
+    appenders = [(column_values.append, index, convert) for column_values, index, convert, _ in kept]
+    # Checks of the other checked columns (and of those kept as strings), whose values are dropped
+    checked = [(schema.by_name[name].row_check(references, keep=False), header.index(name), schema.by_name[name])
+               for name in schema.checked if name not in inline]
+    checks = [(check, index) for check, index, _ in checked]
+    # Kept strings without rules are left to validate(), which reports missing ones
+    presence = [name for name in inline if name in schema.checked and not schema.by_name[name].has_rules
+                and schema.types[name] == 'str']
+    last = kept[-1][0]
+    rejects: Dict[int, List[str]] = {}
+    failed: Dict[int, List[str]] = {}  # raw fields of the rows checked field by field
+
+    def reject(index: int, reason: str) -> None:
+        rejects.setdefault(index, []).append(reason)
+
+    segments = []  # (first row, range start, range end, rows preceded by a blank line)
+    for start, end in ranges:
+        blanks = []
+        segments.append((len(last), start, end, blanks))
+        text = mm[start:end].decode('utf-8')
+        for row in csv.reader(io.StringIO(text, newline='')):
+            if not row:
+                blanks.append(len(last))
+                continue
+            try:
+                # Checks first, so a failing row has appended nothing to `last`
+                for check, index in checks:
+                    check(row[index])
+                for append, index, convert in appenders:
+                    append(convert(row[index]))
+            except _ROW_ERRORS:
+                # Finish the row column by column, rejecting the values that fail
+                position = len(last)
+                failed[position] = row
+                if len(row) < len(header):
+                    reject(position, f"row has {len(row)} fields, expected {len(header)}")
+                for column_values, index, convert, column in kept:
+                    if len(column_values) == position:
+                        value = row[index] if index < len(row) else ''
+                        try:
+                            value = convert(value)
+                        except _ROW_ERRORS as error:
+                            reason = column.rejection(value, error)
+                            if reason:
+                                reject(position, reason)
+                            value = None
+                        column_values.append(value)
+                for check, index, column in checked:
+                    value = row[index] if index < len(row) else ''
+                    try:
+                        check(value)
+                    except _ROW_ERRORS as error:
+                        reason = column.rejection(value, error)
+                        if reason:
+                            reject(position, reason)
+
+    rows = len(last)
+    schema.validate(values, references, inline, rejects, presence)
+
+    columns = values
+    rejected = []
+    if len(rejects) <= _DELETE_LIMIT:
+        # A few rejected rows are cheaper to delete than to filter out of every column
+        for column in columns.values():
+            for index in sorted(rejects, reverse=True):
+                del column[index]
+    else:
+        keep = bytearray(b'\x01') * rows
+        for index in rejects:
+            keep[index] = 0
+        columns = {name: list(compress(column, keep)) for name, column in columns.items()}
+    if rejects:
+        positions = sorted(rejects)
+        raw = {index: failed[index] for index in positions if index in failed}
+        if len(raw) < len(positions):
+            raw.update(_raw_rows(mm, segments, [index for index in positions if index not in raw]))
+        indexes = [header.index(name) if name in header else len(header) for name in schema.names]
+        newlines = {}
+        rejected = [[_line_number(mm, segments, index, newlines), "; ".join(rejects[index])]
+                    + [raw[index][i] if i < len(raw[index]) else '' for i in indexes]
+                    for index in positions]
+    for name, kind in converters.items():
+        if name not in inline and kind != 'str':
+            columns[name] = list(map(CONVERTERS[kind], columns[name]))
+    return columns, rows, rejected
+
+
+def _parse_range(path, start: int, end: int, header: List[str], converters: Dict[str, str],
+                 reducer: Callable, schema=None, references: Optional[Dict] = None) -> Tuple[object, int, List[List]]:
+    """
+    Parse one byte range into typed columns (validated when a schema is given)
+    and reduce it to a partial aggregate. Returns the partial, the rows read
+    and the rejected rows.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if schema is None:
+            return reducer(_parse_columns(path, mm, [(start, end)], header, converters)), 0, []
+        columns, rows, rejected = _parse_validated(path, mm, [(start, end)], header, converters, schema, references)
+        return reducer(columns), rows, rejected
+
+
+def parse_ranges(path, ranges: List[Tuple[int, int]], converters: Dict[str, str], reducer: Callable,
+                 quarantine=None, references: Optional[Dict] = None):
+    """
+    Parse only the given byte ranges of `path` (e.g. from an offset index)
+    in-process and reduce them together to one aggregate.
+    """
+    path = str(path)
+    header, _ = read_header(path)
+    if not ranges:
+        return reducer({name: [] for name in converters})
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if quarantine is None or quarantine.schema is None:
+            return reducer(_parse_columns(path, mm, ranges, header, converters))
+        columns, rows, rejected = _parse_validated(path, mm, ranges, header, converters,
+                                                   quarantine.schema, references)
+    quarantine.add(rows, rejected)
+    quarantine.close()
+    return reducer(columns)
+
+
+def iter_range_partials(path, ranges: List[Tuple[int, int]], converters: Dict[str, str], reducer: Callable,
+                        quarantine=None, references: Optional[Dict] = None) -> Iterator:
+    """
+    Yield the partial aggregate of each of the given byte ranges (e.g. a
+    sample of split_ranges()) in-process, in the order given.
+    """
+    path = str(path)
+    header, _ = read_header(path)
+    schema = quarantine.schema if quarantine is not None else None
+    for start, end in ranges:
+        partial, rows, rejected = _parse_range(path, start, end, header, converters, reducer, schema, references)
+        if schema is not None:
+            quarantine.add(rows, rejected)
+        yield partial
+    if quarantine is not None:
+        quarantine.close()
+
+
+def _iter_range_results(path, converters: Dict[str, str], reducer: Callable, workers: int, chunk_bytes: int,
+                        schema, references: Optional[Dict]) -> Iterator[Tuple[object, int, List[List]]]:
+    header, ranges = split_ranges(path, chunk_bytes)
+    if workers == 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            yield _parse_range(path, start, end, header, converters, reducer, schema, references)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=_POOL_CONTEXT) as pool:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(pool.submit(_parse_range, path, start, end, header, converters, reducer,
+                                       schema, references))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_csv_partials(path, converters: Dict[str, str], reducer: Callable, workers: int = None,
+                      chunk_bytes: int = None, quarantine=None, references: Optional[Dict] = None) -> Iterator:
+    """
+    Yield the partial aggregate of each `chunk_bytes` range of `path` in
+    file order. At most two ranges per worker are in flight, so callers can
+    fold partials into a bounded (e.g. spilling) aggregate as they arrive.
+
+    quarantine: optional utils.schema.Quarantine; rows failing its schema
+                are left out of the partials and collected there
+    references: named sets of known keys for the schema's "references" rules
+    """
+    path = str(path)
+    workers = workers or settings.CSV_PARSE_WORKERS or os.cpu_count() or 1
+    schema = quarantine.schema if quarantine is not None else None
+    for partial, rows, rejected in _iter_range_results(path, converters, reducer, workers,
+                                                       chunk_bytes or settings.CSV_CHUNK_BYTES,
+                                                       schema, references):
+        if schema is not None:
+            quarantine.add(rows, rejected)
+        yield partial
+    if quarantine is not None:
+        quarantine.close()
+
+
+def parse_csv(path, converters: Dict[str, str], reducer: Callable, merge: Callable,
+              workers: int = None, chunk_bytes: int = None, quarantine=None, references: Optional[Dict] = None):
+    """
+    Parse `path` into typed columns and aggregate them.
+
+    converters: column name -> 'str' | 'float' | 'int' | 'day' | 'cents'
+    reducer:    columns dict -> partial aggregate (called once per byte range)
+    merge:      (partial, partial) -> partial, applied in file order
+    quarantine, references: schema validation, see iter_csv_partials
+
+    Files smaller than settings.CSV_PARALLEL_MIN_BYTES are parsed as a
+    single range in-process; larger ones are split into chunks of
+    `chunk_bytes` and parsed by `workers` processes.
+    """
+    path = str(path)
+    if os.path.getsize(path) < settings.CSV_PARALLEL_MIN_BYTES:
+        chunk_bytes = max(os.path.getsize(path), 1)
+
+    result = None
+    for index, partial in enumerate(iter_csv_partials(path, converters, reducer, workers, chunk_bytes,
+                                                      quarantine, references)):
+        result = partial if index == 0 else merge(result, partial)
+    if result is None:
+        return reducer({name: [] for name in converters})
+    return result
@@ -0,0 +1,102 @@
+"""
+FX Conversion
+=============
+Converts amounts between currencies with a local rate table.
+
+The table (settings.FX_RATES_FILE) has one row per currency and date:
+
+    CURRENCY,DATE,RATE
+    EUR,2025-10-01,1.0712
+
+where RATE is the value of one unit of CURRENCY in settings.FX_RATE_BASE_CURRENCY.
+A lookup returns the most recent rate on or before the requested day number
+(utils/dates.py; days before a currency's first rate use that first rate and
+are counted as `extrapolated`). Lookups are cached per (currency, day), and
+convert_batch() resolves each distinct (currency, day) pair once per batch,
+so converting many amounts costs one multiplication each.
+"""
+
+import bisect
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import settings
+from utils.fast_csv import parse_csv
+from utils.schema import Quarantine
+
+logger = logging.getLogger("FxRates")
+
+
+def _reduce_rate_chunk(columns: Dict) -> Dict:
+    rates = {}
+    for currency, day, rate in zip(columns['CURRENCY'], columns['DATE'], columns['RATE']):
+        rates.setdefault(currency.upper(), []).append((day, rate))
+    return rates
+
+
+def _merge_rate_chunks(first: Dict, second: Dict) -> Dict:
+    for currency, points in second.items():
+        first.setdefault(currency, []).extend(points)
+    return first
+
+
+class FxRateTable:
+    """As-of rate lookups with a per-(currency, day) cache"""
+
+    def __init__(self, rates: Optional[Dict[str, List[Tuple[int, float]]]] = None,
+                 base_currency: Optional[str] = None):
+        self.base_currency = (base_currency or settings.FX_RATE_BASE_CURRENCY).upper()
+        self.days: Dict[str, List[int]] = {}
+        self.values: Dict[str, List[float]] = {}
+        for currency, points in (rates or {}).items():
+            points = sorted(points)
+            self.days[currency] = [day for day, _ in points]
+            self.values[currency] = [value for _, value in points]
+        self.cache: Dict[Tuple[str, int], float] = {}
+        self.lookups = 0
+        self.extrapolated = 0
+
+    @classmethod
+    def load(cls, path=None, base_currency: Optional[str] = None) -> "FxRateTable":
+        path = Path(path or settings.FX_RATES_FILE)
+        if not path.exists():
+            logger.warning(f"FX rate table {path} not found; only {settings.REPORTING_CURRENCY} amounts can be reported.")
+            return cls({}, base_currency)
+        rates = parse_csv(path, {'CURRENCY': 'str', 'DATE': 'day', 'RATE': 'float'},
+                          _reduce_rate_chunk, _merge_rate_chunks, quarantine=Quarantine(path))
+        return cls(rates, base_currency)
+
+    def currencies(self) -> List[str]:
+        return sorted(set(self.days) | {self.base_currency})
+
+    def _base_rate(self, currency: str, day: int) -> float:
+        if currency == self.base_currency:
+            return 1.0
+        if currency not in self.days:
+            raise KeyError(f"No FX rates for currency '{currency}'")
+        days = self.days[currency]
+        position = bisect.bisect_right(days, day) - 1
+        if position < 0:
+            self.extrapolated += 1
+            position = 0
+        return self.values[currency][position]
+
+    def rate(self, from_currency: str, to_currency: str, day: int) -> float:
+        """Units of `to_currency` per unit of `from_currency` as of day number `day`"""
+        if from_currency == to_currency:
+            return 1.0
+        key = (f"{from_currency}/{to_currency}", day)
+        cached = self.cache.get(key)
+        if cached is None:
+            self.lookups += 1
+            cached = self._base_rate(from_currency, day) / self._base_rate(to_currency, day)
+            self.cache[key] = cached
+        return cached
+
+    def convert_batch(self, currencies: Sequence[str], days: Sequence[int], amounts: Sequence[float],
+                      to_currency: str) -> List[float]:
+        """Convert amounts[i] from currencies[i] as of days[i]; each distinct pair is resolved once"""
+        rates = {}
+        for key in set(zip(currencies, days)):
+            rates[key] = self.rate(key[0], to_currency, key[1])
+        return [amount * rates[key] for key, amount in zip(zip(currencies, days), amounts)]
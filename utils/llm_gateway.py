@@ -0,0 +1,289 @@
+"""
+LLM Gateway
+===========
+Single entry point for every chat-completion call in the workflow
+(ExposureAggregatorAgent AI insights, LimitSetterAgent decision summaries).
+
+Each call gets:
+- a per-attempt timeout and an overall deadline across retries,
+- bounded retries with exponential backoff and jitter for transient errors
+  (timeouts, connection errors, 429 and 5xx responses; Retry-After is honored),
+- a circuit breaker shared by all callers: when the recent error rate spikes
+  the breaker opens and calls go straight to the caller's local fallback
+  until a cool-down has passed,
+- latency (of every attempt, and of failed attempts separately) and
+  token-usage metrics, available from metrics_snapshot().
+
+By default the gateway talks to Azure OpenAI. Setting LLM_BASE_URL points it
+at any OpenAI-compatible chat-completions server instead (e.g. a local mock).
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+from config import settings
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over a sliding window of recent attempts.
+    closed -> open when the error rate reaches `error_rate` (after `min_calls`),
+    open -> half_open after `cooldown_seconds`, half_open -> closed on the
+    next success or back to open on the next failure. In half_open a single
+    probe is let through; other callers are short-circuited until it reports
+    (or for another cool-down, should it never report). `clock` returns
+    the current time in seconds (time.monotonic by default).
+    """
+
+    def __init__(self, error_rate: float, window: int, min_calls: int, cooldown_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self.outcomes = deque(maxlen=window)
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.probe_started: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            now = self.clock()
+            if self.state == 'open' and now - self.opened_at >= self.cooldown_seconds:
+                self.state = 'half_open'
+                self.probe_started = None
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and (self.probe_started is None
+                                              or now - self.probe_started >= self.cooldown_seconds):
+                self.probe_started = now
+                return True
+            return False
+
+    def record(self, success: bool) -> None:
+        with self.lock:
+            self.outcomes.append(success)
+            self.probe_started = None
+            if self.state == 'half_open':
+                if success:
+                    self.state = 'closed'
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            failures = self.outcomes.count(False)
+            if (self.state == 'closed' and len(self.outcomes) >= self.min_calls
+                    and failures / len(self.outcomes) >= self.error_rate):
+                self._open()
+
+    def _open(self) -> None:
+        self.state = 'open'
+        self.opened_at = self.clock()
+        self.times_opened += 1
+
+
+class LLMGateway:
+    """Chat-completion client with deadlines, retries, a circuit breaker and metrics"""
+
+    def __init__(self, client=None, model: Optional[str] = None, timeout: Optional[float] = None,
+                 deadline: Optional[float] = None, max_retries: Optional[int] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.logger = logging.getLogger("LLMGateway")
+        self.client = client
+        self.model = model or settings.LLM_MODEL
+        self.timeout = timeout if timeout is not None else settings.LLM_TIMEOUT_SECONDS
+        self.deadline = deadline if deadline is not None else settings.LLM_CALL_DEADLINE_SECONDS
+        self.max_retries = max_retries if max_retries is not None else settings.LLM_MAX_RETRIES
+        self.breaker = breaker or CircuitBreaker(
+            error_rate=settings.LLM_BREAKER_ERROR_RATE,
+            window=settings.LLM_BREAKER_WINDOW,
+            min_calls=settings.LLM_BREAKER_MIN_CALLS,
+            cooldown_seconds=settings.LLM_BREAKER_COOLDOWN_SECONDS
+        )
+        self.lock = threading.Lock()
+        self.reset_metrics()
+
+    @classmethod
+    def from_settings(cls) -> "LLMGateway":
+        """Build a gateway for LLM_BASE_URL if set, otherwise for the Azure OpenAI settings"""
+        logger = logging.getLogger("LLMGateway")
+        client = None
+        if openai is None:
+            logger.warning("openai package not installed. AI features will use local fallbacks.")
+        else:
+            try:
+                if settings.LLM_BASE_URL:
+                    # Retries are handled here, so the SDK's own retries are disabled
+                    client = openai.OpenAI(base_url=settings.LLM_BASE_URL, api_key=settings.LLM_API_KEY,
+                                           max_retries=0)
+                elif settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT and settings.LLM_MODEL:
+                    client = openai.AzureOpenAI(
+                        api_key=settings.AZURE_OPENAI_API_KEY,
+                        api_version=settings.AZURE_OPENAI_API_VERSION,
+                        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+                        max_retries=0
+                    )
+                else:
+                    logger.warning("Azure OpenAI not configured. AI features will use local fallbacks.")
+            except Exception as e:
+                logger.warning(f"LLM client initialization failed: {e}")
+                client = None
+        return cls(client=client)
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    # ---------- Metrics ----------
+
+    def reset_metrics(self) -> None:
+        with self.lock:
+            self.metrics = {
+                'calls': 0, 'successes': 0, 'fallbacks': 0, 'attempts': 0, 'retries': 0,
+                'errors': 0, 'short_circuited': 0, 'prompt_tokens': 0, 'completion_tokens': 0
+            }
+            # Every attempt, failed ones (timeouts, errors) included, and the failed ones alone
+            self.latencies: List[float] = []
+            self.error_latencies: List[float] = []
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self.lock:
+            self.metrics[key] += amount
+
+    def metrics_snapshot(self) -> Dict:
+        """Counters plus latency percentiles (seconds) of all attempts and of failed attempts"""
+        with self.lock:
+            snapshot = dict(self.metrics)
+            series = {'latency': sorted(self.latencies), 'error_latency': sorted(self.error_latencies)}
+        snapshot['breaker_state'] = self.breaker.state
+        snapshot['breaker_opened'] = self.breaker.times_opened
+        snapshot['fallback_rate'] = round(snapshot['fallbacks'] / snapshot['calls'], 4) if snapshot['calls'] else 0.0
+        for name, latencies in series.items():
+            for label, q in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+                snapshot[f'{name}_{label}'] = round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 4) \
+                    if latencies else None
+            snapshot[f'{name}_max'] = round(latencies[-1], 4) if latencies else None
+        return snapshot
+
+    # ---------- Calls ----------
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if openai is None:
+            return False
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('retry-after'))
+            except (TypeError, ValueError):
+                retry_after = None
+        if retry_after is not None:
+            return min(retry_after, settings.LLM_BACKOFF_MAX_SECONDS)
+        delay = settings.LLM_BACKOFF_BASE_SECONDS * (2 ** attempt)
+        return min(settings.LLM_BACKOFF_MAX_SECONDS, delay) * random.uniform(0.5, 1.0)
+
+    def complete(self, messages: List[Dict], fallback: Callable[[], str], max_tokens: int = 100,
+                 temperature: float = 0.7, label: str = "") -> Tuple[str, bool]:
+        """
+        Run one chat completion. Returns (text, used_fallback); the fallback is
+        used when the client is unavailable, the breaker is open, the error is
+        not retryable, or retries/deadline are exhausted.
+        """
+        self._count('calls')
+        if not self.enabled:
+            self._count('fallbacks')
+            return fallback(), True
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            self._count('fallbacks')
+            return fallback(), True
+
+        call_deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = call_deadline - time.monotonic()
+            if remaining <= 0:
+                self.logger.warning(f"LLM call deadline exceeded{' for ' + label if label else ''}. Using fallback.")
+                break
+            self._count('attempts')
+            started = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=min(self.timeout, remaining)
+                )
+                text = response.choices[0].message.content.strip()
+            except Exception as e:
+                latency = time.perf_counter() - started
+                with self.lock:
+                    self.metrics['errors'] += 1
+                    self.latencies.append(latency)
+                    self.error_latencies.append(latency)
+                self.breaker.record(False)
+                if not self._is_retryable(e) or attempt >= self.max_retries:
+                    self.logger.warning(f"LLM call failed{' for ' + label if label else ''}: {e}. Using fallback.")
+                    break
+                delay = self._backoff(attempt, e)
+                if time.monotonic() + delay >= call_deadline:
+                    self.logger.warning(f"LLM call deadline exceeded{' for ' + label if label else ''}. Using fallback.")
+                    break
+                attempt += 1
+                self._count('retries')
+                time.sleep(delay)
+                if not self.breaker.allow():
+                    self._count('short_circuited')
+                    break
+                continue
+
+            latency = time.perf_counter() - started
+            self.breaker.record(True)
+            usage = getattr(response, 'usage', None)
+            with self.lock:
+                self.metrics['successes'] += 1
+                self.latencies.append(latency)
+                if usage is not None:
+                    self.metrics['prompt_tokens'] += getattr(usage, 'prompt_tokens', 0) or 0
+                    self.metrics['completion_tokens'] += getattr(usage, 'completion_tokens', 0) or 0
+            return text, False
+
+        self._count('fallbacks')
+        return fallback(), True
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """The process-wide gateway shared by all agents (created on first use)"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway.from_settings()
+        return _gateway
+
+
+def set_gateway(gateway: Optional[LLMGateway]) -> None:
+    """Replace the shared gateway, e.g. to point the agents at a mock server"""
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
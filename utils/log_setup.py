@@ -0,0 +1,173 @@
+"""
+Logging Setup
+=============
+Non-blocking logging for the whole workflow.
+
+Agents log through a QueueHandler, so a log call only enqueues the record;
+a background QueueListener does the file and console I/O. The log file holds
+one structured JSON record per line (settings.LOG_FORMAT = 'json'), the
+console keeps the familiar text layout.
+
+Per-customer messages in the hot loops go through CustomerProgress, which
+reports counts and rates instead of one line per customer. Full per-customer
+detail is opt-in (settings.LOG_CUSTOMER_DETAIL / `main.py --log-customer-detail`),
+and settings.LOG_CUSTOMER_SAMPLE_EVERY keeps every Nth customer's detail.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime
+from typing import Optional
+from config import settings
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - [%(levelname)s] - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single JSON object, including any `extra=` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3],
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the traceback apart from the message. The stock
+    prepare() folds it into `message` and drops exc_info; here it goes to
+    exc_text, which the text formatters append and JsonFormatter emits as
+    'exception'.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def setup_logging(log_file=None, level: int = logging.INFO) -> None:
+    """Route all logging through a queue to a file handler and a console handler"""
+    global _listener
+    stop_logging()
+
+    log_file = log_file or settings.LOG_FILE
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+
+    file_handler = logging.FileHandler(log_file, mode='w')  # Overwrite log file on each run
+    if settings.LOG_FORMAT == 'json':
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    # Replace anything installed earlier (e.g. an implicit basicConfig at import time)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class CustomerProgress:
+    """
+    Aggregates per-customer log messages for a loop over customers.
+    Emits a progress line with count and rate at most every
+    settings.LOG_PROGRESS_INTERVAL_SECONDS, sampled or full per-customer
+    detail as configured, and a summary line from finish().
+    """
+
+    MAX_WARNINGS = 10
+
+    def __init__(self, logger: logging.Logger, action: str, total: Optional[int] = None):
+        self.logger = logger
+        self.action = action
+        self.total = total
+        self.count = 0
+        self.warnings = 0
+        self.detail_enabled = settings.LOG_CUSTOMER_DETAIL
+        self.sample_every = settings.LOG_CUSTOMER_SAMPLE_EVERY
+        self.interval = settings.LOG_PROGRESS_INTERVAL_SECONDS
+        self.started = time.perf_counter()
+        self.last_report = self.started
+
+    def _rate(self, now: float) -> float:
+        elapsed = now - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def detail(self, customer_id: str, msg: str, *args) -> None:
+        """Per-customer message; formatted and emitted only when detail or sampling selects it"""
+        if self.detail_enabled or (self.sample_every and self.count % self.sample_every == 0):
+            self.logger.info(msg, *args, extra={'customer_id': customer_id})
+
+    def warning(self, customer_id: str, msg: str, *args) -> None:
+        """Per-customer warning; the first MAX_WARNINGS are logged, the rest only counted"""
+        self.warnings += 1
+        if self.detail_enabled or self.warnings <= self.MAX_WARNINGS:
+            self.logger.warning(msg, *args, extra={'customer_id': customer_id})
+        elif self.warnings == self.MAX_WARNINGS + 1:
+            self.logger.warning(f"{self.action}: further per-customer warnings suppressed; see summary.")
+
+    def advance(self) -> None:
+        self.count += 1
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            of_total = f"/{self.total}" if self.total is not None else ""
+            self.logger.info(f"{self.action}: {self.count}{of_total} customers ({self._rate(now):,.1f}/s)",
+                             extra={'progress_count': self.count, 'progress_rate': round(self._rate(now), 2)})
+
+    def finish(self) -> None:
+        now = time.perf_counter()
+        elapsed = now - self.started
+        self.logger.info(f"{self.action}: completed {self.count} customers in {elapsed:.2f}s "
+                         f"({self._rate(now):,.1f}/s), {self.warnings} warnings",
+                         extra={'progress_count': self.count, 'progress_rate': round(self._rate(now), 2),
+                                'elapsed_seconds': round(elapsed, 3), 'warning_count': self.warnings})
@@ -0,0 +1,53 @@
+"""
+Money Amounts
+=============
+Exact amount handling for exposure totals. Amounts are parsed straight
+into integer minor units (cents) and summed as integers, so totals do not
+drift however many invoices are added; floats are produced only when a
+total is written out.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+# Cents per unit of the last written decimal, by number of decimals
+_SCALE = (100, 10, 1)
+
+
+def to_cents(value) -> int:
+    """
+    Amount (str, float, int or Decimal) -> integer cents, without a float
+    round trip. Amounts with more than two decimals are rounded half-even;
+    surrounding whitespace is ignored.
+    """
+    if isinstance(value, str):
+        # int() ignores surrounding whitespace too, which would shift the
+        # decimal position the fast paths below read from the string length
+        value = value.strip()
+    if isinstance(value, str) and value[-3:-2] == '.' and '_' not in value:
+        # The common "1234.56" form
+        try:
+            return int(value.replace('.', '', 1))
+        except ValueError:
+            pass
+    if isinstance(value, float):
+        value = repr(value)
+    if isinstance(value, str):
+        point = value.find('.')
+        decimals = len(value) - point - 1 if point != -1 else 0
+        if decimals <= 2 and '_' not in value:
+            try:
+                return int(value.replace('.', '', 1)) * _SCALE[decimals]
+            except ValueError:
+                pass
+    try:
+        cents = Decimal(value).scaleb(2).to_integral_value(ROUND_HALF_EVEN)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"invalid amount: {value!r}") from None
+    if not cents.is_finite():
+        raise ValueError(f"invalid amount: {value!r}")
+    return int(cents)
+
+
+def from_cents(cents: int) -> float:
+    """Integer cents -> amount as written to the outputs"""
+    return cents / 100
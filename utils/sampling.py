@@ -0,0 +1,83 @@
+"""
+Sampling Estimators
+===================
+Stratified sampling for the preview mode (agents/preview_agent.py).
+
+Units (customers, or newline-aligned byte blocks of a CSV file) are grouped
+into strata and a simple random sample is drawn from each stratum. A total is
+estimated as the sum over strata of stratum size x sample mean; its standard
+error includes the finite population correction, so a stratum that is read
+completely (a census) adds no uncertainty. Counts per category are totals of
+0/1 indicators. interval() turns an estimate and its standard error into a
+normal-approximation confidence interval.
+"""
+
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, Hashable, List, Sequence, Tuple
+from utils.fast_csv import split_ranges
+
+# Units drawn per stratum at least, so its variance can be estimated
+MIN_PER_STRATUM = 2
+
+
+def allocation(size: int, fraction: float) -> int:
+    """Sample size for a stratum of `size` units (proportional, at least MIN_PER_STRATUM)"""
+    return min(size, max(MIN_PER_STRATUM, math.ceil(size * fraction)))
+
+
+def sample_strata(strata: Dict[Hashable, Sequence], fraction: float, rng: random.Random) -> Dict[Hashable, List]:
+    """Simple random sample of each stratum, in the stratum's order"""
+    sample = {}
+    for key, units in strata.items():
+        chosen = set(rng.sample(range(len(units)), allocation(len(units), fraction)))
+        sample[key] = [unit for position, unit in enumerate(units) if position in chosen]
+    return sample
+
+
+def block_strata(path, block_bytes: int, fraction: float, max_strata: int) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    Split the data rows of a CSV file into byte blocks of about `block_bytes`
+    and group consecutive blocks into strata by file position. The number of
+    strata is capped so each one still gets MIN_PER_STRATUM blocks at the
+    sampling `fraction`.
+    """
+    _, blocks = split_ranges(path, block_bytes)
+    count = max(1, min(max_strata, math.ceil(len(blocks) * fraction) // MIN_PER_STRATUM))
+    strata = {}
+    for position, block in enumerate(blocks):
+        strata.setdefault(position * count // len(blocks), []).append(block)
+    return strata
+
+
+def stratified_total(strata: Sequence[Tuple[int, Sequence[float]]]) -> Tuple[float, float]:
+    """
+    (estimate, standard error) of a population total from (stratum size,
+    values of the sampled units) pairs.
+    """
+    estimate = 0.0
+    variance = 0.0
+    for size, values in strata:
+        n = len(values)
+        if not n:
+            continue
+        mean = sum(values) / n
+        estimate += size * mean
+        if 1 < n < size:
+            sample_variance = sum((value - mean) ** 2 for value in values) / (n - 1)
+            variance += size * size * (1 - n / size) * sample_variance / n
+    return estimate, math.sqrt(variance)
+
+
+def interval(estimate: float, standard_error: float, confidence: float, digits: int = 2,
+             minimum: float = None) -> Dict[str, float]:
+    """Normal-approximation confidence interval (its low end clipped at `minimum`, e.g. 0 for counts)"""
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    low = estimate - z * standard_error
+    return {
+        'estimate': round(estimate, digits),
+        'standard_error': round(standard_error, digits),
+        'low': round(low if minimum is None else max(minimum, low), digits),
+        'high': round(estimate + z * standard_error, digits),
+    }
@@ -0,0 +1,211 @@
+"""
+DAG Scheduler
+=============
+Runs workflow tasks as a dependency graph on a thread pool.
+
+Each task declares the artifacts it consumes (inputs) and produces (outputs);
+a task becomes ready once every producer of its inputs has finished, so
+independent work (e.g. loading policy rules while exposure is aggregated)
+overlaps. After the run, critical_path() reports the chain of tasks that
+bounded the total latency.
+
+Threads (not processes) are used because sub-tasks of one agent share its
+in-memory state and most stage time is file I/O, LLM calls or throttling;
+CPU-heavy parsing manages its own process pool.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class Task:
+    """
+    A unit of work in the DAG. `func(resume)` returns True on success;
+    `resume` is True only if resuming is allowed for this task (a resumed
+    run where none of its dependencies had to be re-executed).
+    """
+
+    def __init__(self, name: str, func: Callable[[bool], bool], inputs: Iterable[str] = (),
+                 outputs: Iterable[str] = (), files: Iterable = (), required: bool = True,
+                 checkpointed: bool = True):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.files = list(files)
+        self.required = required
+        self.checkpointed = checkpointed
+
+
+class DAGScheduler:
+    """Executes Tasks in dependency order with bounded parallelism"""
+
+    def __init__(self, max_workers: int = 4, checkpoint=None, resume: bool = False,
+                 logger: Optional[logging.Logger] = None):
+        self.max_workers = max_workers
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.logger = logger or logging.getLogger("DAGScheduler")
+        self.tasks: Dict[str, Task] = {}
+        self.status: Dict[str, str] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.started = None
+        self.finished = None
+
+    def add(self, task: Task) -> Task:
+        if task.name in self.tasks:
+            raise ValueError(f"Duplicate task name '{task.name}'")
+        self.tasks[task.name] = task
+        return task
+
+    def dependencies(self, name: str) -> List[str]:
+        """Names of the tasks producing the inputs of `name`"""
+        producers = {}
+        for task in self.tasks.values():
+            for artifact in task.outputs:
+                producers[artifact] = task.name
+        deps = []
+        for artifact in self.tasks[name].inputs:
+            if artifact not in producers:
+                raise ValueError(f"Task '{name}' needs '{artifact}', which no task produces")
+            if producers[artifact] not in deps:
+                deps.append(producers[artifact])
+        return deps
+
+    def _check_acyclic(self, deps: Dict[str, List[str]]) -> None:
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle detected at task '{name}'")
+            visiting.add(name)
+            for dep in deps[name]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in deps:
+            visit(name)
+
+    def _execute(self, task: Task, resume: bool) -> bool:
+        start = time.perf_counter()
+        try:
+            ok = bool(task.func(resume))
+        except Exception as e:
+            self.logger.error(f"Task '{task.name}' raised an exception: {e}")
+            ok = False
+        self.timings[task.name] = {'start': start - self.started, 'end': time.perf_counter() - self.started}
+        return ok
+
+    def run(self) -> bool:
+        """Run all tasks; returns False if a required task failed"""
+        deps = {name: self.dependencies(name) for name in self.tasks}
+        self._check_acyclic(deps)
+        self.started = time.perf_counter()
+        pending = dict(deps)
+        running = {}
+        aborted = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                if not aborted:
+                    for name in [n for n, d in pending.items() if all(dep in self.status for dep in d)]:
+                        del pending[name]
+                        task = self.tasks[name]
+                        # Non-checkpointed tasks (in-memory loaders, optional extras) always
+                        # re-run and do not invalidate downstream checkpoints
+                        upstream_skipped = all(self.status[dep] == 'skipped' or not self.tasks[dep].checkpointed
+                                               for dep in deps[name])
+                        can_resume = self.resume and upstream_skipped
+                        if (can_resume and task.checkpointed and self.checkpoint
+                                and self.checkpoint.is_stage_complete(name)):
+                            self.status[name] = 'skipped'
+                            self.timings[name] = {'start': 0.0, 'end': 0.0}
+                            self.logger.info(f">>> {name}: already completed in a previous run. Skipping.")
+                            continue
+                        self.logger.info(f">>> {name}: STARTED")
+                        running[pool.submit(self._execute, task, can_resume)] = name
+                    if not running:
+                        # Everything left is waiting on a task that was just skipped
+                        continue
+                elif not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    task = self.tasks[name]
+                    elapsed = self.timings[name]['end'] - self.timings[name]['start']
+                    if future.result():
+                        self.status[name] = 'completed'
+                        if self.checkpoint and task.checkpointed:
+                            self.checkpoint.mark_stage_complete(name, task.files)
+                        self.logger.info(f">>> {name}: FINISHED in {elapsed:.2f}s")
+                    elif task.required:
+                        self.status[name] = 'failed'
+                        self.logger.error(f">>> {name}: FAILED. Workflow terminated.")
+                        aborted = True
+                    else:
+                        self.status[name] = 'failed'
+                        self.logger.warning(f">>> {name}: did not complete successfully. Continuing.")
+
+        self.finished = time.perf_counter()
+        return not aborted
+
+    def critical_path(self) -> List[str]:
+        """
+        The chain of dependent tasks with the largest summed duration,
+        i.e. the sequence that bounded the total wall-clock time.
+        """
+        deps = {name: self.dependencies(name) for name in self.tasks}
+        duration = {name: t['end'] - t['start'] for name, t in self.timings.items()}
+        longest, previous = {}, {}
+
+        def visit(name):
+            if name in longest:
+                return longest[name]
+            best, best_dep = 0.0, None
+            for dep in deps[name]:
+                if dep in duration and visit(dep) > best:
+                    best, best_dep = visit(dep), dep
+            longest[name] = best + duration.get(name, 0.0)
+            previous[name] = best_dep
+            return longest[name]
+
+        timed = [name for name in self.tasks if name in duration]
+        if not timed:
+            return []
+        end = max(timed, key=visit)
+        path = []
+        while end is not None:
+            path.append(end)
+            end = previous[end]
+        return list(reversed(path))
+
+    def report(self) -> Dict:
+        """Per-run timing report including the critical path"""
+        path = self.critical_path()
+        tasks = []
+        for name in self.tasks:
+            timing = self.timings.get(name, {'start': 0.0, 'end': 0.0})
+            tasks.append({
+                'task': name,
+                'status': self.status.get(name, 'not_run'),
+                'depends_on': self.dependencies(name),
+                'start_seconds': round(timing['start'], 3),
+                'end_seconds': round(timing['end'], 3),
+                'duration_seconds': round(timing['end'] - timing['start'], 3)
+            })
+        durations = {t['task']: t['duration_seconds'] for t in tasks}
+        return {
+            'total_seconds': round((self.finished or time.perf_counter()) - (self.started or 0.0), 3),
+            'max_workers': self.max_workers,
+            'critical_path': [{'task': name, 'duration_seconds': durations[name]} for name in path],
+            'critical_path_seconds': round(sum(durations[name] for name in path), 3),
+            'bounded_by': max(path, key=lambda name: durations[name]) if path else None,
+            'tasks': tasks
+        }
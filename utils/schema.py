@@ -0,0 +1,470 @@
+"""
+Input Schemas
+=============
+Declared schemas for the files under data/input (settings.INPUT_SCHEMAS_FILE),
+compiled once into batched column validators.
+
+Each column declares a type - 'str' | 'int' | 'float' | 'cents' | 'day', as
+in fast_csv - and optional rules: "required" (default true), "pattern",
+"values", "min", "exclusive_min", "max" and "references" (the name of a set
+of known keys passed in at validation time, e.g. "customers").
+
+CSV rows are checked while they are read. As in utils.dates, a column with
+rules converts and checks each distinct value once through a memo table, so
+repeated values (customer IDs, statuses, weights) are a plain dict lookup
+that also tells a rejected value from an accepted one. Columns the reader
+does not need are checked without being kept. A row is only looked at field
+by field when one of its values fails.
+
+JSON records are validated on whole columns: each rule is checked against
+the column's distinct values (types, patterns, allowed values, references)
+or their min/max (bounds), and rows are only visited again when a rule
+actually fails.
+
+Rejected rows are collected by a Quarantine and written with their reasons to
+settings.QUARANTINE_DIR/<input file>.rejected.csv.
+"""
+
+import csv
+import json
+import logging
+import math
+import operator
+import re
+import threading
+from itertools import compress, count
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config import settings
+from utils.dates import from_day
+from utils.fast_csv import CONVERTERS, parse_csv
+from utils.money import from_cents
+from utils.serialization import atomic_write
+
+logger = logging.getLogger("InputValidation")
+
+_schemas: Optional[Dict[str, "Schema"]] = None
+_schemas_lock = threading.Lock()
+_stats: Dict[str, Dict] = {}
+# Rows read and rejected by partial reads (persist=False), per input file, until taken
+_partial: Dict[str, Dict] = {}
+_stats_lock = threading.Lock()
+
+_CONVERSION_ERRORS = (ValueError, TypeError, OverflowError, AttributeError)
+
+# Distinct values memoised per column before a check table is cleared
+MEMO_LIMIT = 100_000
+
+# Presence check of a required string the reader does not keep: raises
+# IndexError for an empty string without leaving C
+_PRESENT = operator.itemgetter(0)
+
+# How values of each type are shown in rejection reasons
+_SHOW = {
+    'cents': lambda cents: repr(from_cents(cents)),
+    'day': lambda day: repr(from_day(day)),
+}
+
+
+def _is_missing(value) -> bool:
+    return value is None or value == ''
+
+
+def _contains(values: set, value) -> bool:
+    try:
+        return value in values
+    except TypeError:  # unhashable JSON value
+        return False
+
+
+class Rejected(ValueError):
+    """A value fails its column's rules; the message is the rejection reason"""
+
+
+class _CheckedValues(dict):
+    """
+    Raw CSV value -> typed value of one column, converting and checking each
+    distinct value once. Values that fail raise Rejected and are not memoised.
+    """
+
+    def __init__(self, column: "Column", known: Optional[Iterable]):
+        super().__init__()
+        self.column = column
+        self.known = known
+        self._reset()
+
+    def _reset(self) -> None:
+        self.clear()
+        if not self.column.required:
+            self[''] = None
+        column, known = self.column, self.known
+        if (column.type == 'str' and known is not None and not column.value_checks
+                and len(known) < MEMO_LIMIT):
+            # Strings only checked against the known keys: accept those in one C-level update
+            self.update(zip(known, known))
+
+    def __missing__(self, value):
+        column = self.column
+        if _is_missing(value):  # optional columns have '' memoised
+            raise Rejected(f"{column.name}: missing")
+        try:
+            typed = column.convert(value)
+        except _CONVERSION_ERRORS:
+            raise Rejected(f"{column.name}: invalid {column.type} {value!r}") from None
+        reasons = column.failed_rules(typed, self.known)
+        if reasons:
+            raise Rejected("; ".join(f"{column.name}: {value!r} {reason}" for reason in reasons))
+        if len(self) >= MEMO_LIMIT:
+            self._reset()
+        self[value] = typed
+        return typed
+
+
+class Column:
+    """One declared column, compiled into a converter and a list of batch checks"""
+
+    def __init__(self, name: str, spec: Dict):
+        self.name = name
+        self.type = spec.get('type', 'str')
+        if self.type not in CONVERTERS:
+            raise ValueError(f"Column {name}: unknown type '{self.type}'")
+        self.convert = CONVERTERS[self.type]
+        self.show = _SHOW.get(self.type, repr)
+        self.required = spec.get('required', True)
+        self.references = spec.get('references')
+        # (reason, predicate on distinct values) and (reason, bound test on the column)
+        self.value_checks: List[Tuple[str, Callable]] = []
+        self.bound_checks: List[Tuple[str, Callable, Callable]] = []
+        if 'pattern' in spec:
+            match = re.compile(spec['pattern']).fullmatch
+            self.value_checks.append((f"does not match {spec['pattern']}", lambda v: match(v) is not None))
+        if 'values' in spec:
+            allowed = frozenset(spec['values'])
+            self.value_checks.append((f"is not one of {', '.join(sorted(allowed))}", allowed.__contains__))
+        if 'min' in spec:
+            low = self.convert(spec['min'])
+            self.bound_checks.append((f"is below {spec['min']}", min, lambda v: v < low))
+        if 'exclusive_min' in spec:
+            low = self.convert(spec['exclusive_min'])
+            self.bound_checks.append((f"is not above {spec['exclusive_min']}", min, lambda v: v <= low))
+        if 'max' in spec:
+            high = self.convert(spec['max'])
+            self.bound_checks.append((f"is above {spec['max']}", max, lambda v: v > high))
+        # Columns whose values are checked beyond their type and presence (floats must be finite)
+        self.has_rules = bool(self.references or self.value_checks or self.bound_checks or self.type == 'float')
+        # Optional strings without rules accept anything, so they need not be read at all
+        self.checks_nothing = self.type == 'str' and not self.required and not self.has_rules
+        # Check table of the last row_check(), reused by later ranges with the same known keys
+        self._checked: Optional[_CheckedValues] = None
+
+    def failed_rules(self, value, known: Optional[Iterable] = None) -> List[str]:
+        """Reasons one typed value fails the column's rules (checked against `known` keys if given)"""
+        reasons = [reason for reason, accepts in self.value_checks if not accepts(value)]
+        if known is not None and value not in known:
+            reasons.append(f"is unknown ({self.references})")
+        if self.type == 'float' and not math.isfinite(value):
+            reasons.append("is not a finite number")
+            return reasons
+        reasons.extend(reason for reason, _, fails in self.bound_checks if fails(value))
+        return reasons
+
+    def row_check(self, references: Dict, keep: bool = True) -> Callable:
+        """
+        Callable taking one raw CSV value to its typed value, raising for a
+        value its row must be rejected for (see rejection()). Columns with
+        rules check through a memo table. Without rules, a column is only
+        converted; a required string the reader does not `keep` is only
+        tested for presence (kept strings are checked by validate()).
+        """
+        if self.has_rules:
+            known = references.get(self.references) if self.references else None
+            table = self._checked
+            if table is None or table.known is not known:
+                table = self._checked = _CheckedValues(self, known)
+            return table.__getitem__
+        if self.type == 'str' and not keep:
+            return _PRESENT if self.required else str
+        return self.convert
+
+    def rejection(self, value, error: Exception) -> Optional[str]:
+        """Reason a row_check() of `value` raised `error`, or None for a missing optional value"""
+        if isinstance(error, Rejected):
+            return str(error)
+        if _is_missing(value):
+            return f"{self.name}: missing" if self.required else None
+        return f"{self.name}: invalid {self.type} {value!r}"
+
+    def validate(self, values: List, reject: Callable[[int, str], None], references: Dict,
+                 converted: bool = False) -> None:
+        """
+        Pass the failing rows of a column to `reject`. `values` are raw, or
+        already `converted` (None where conversion failed and was rejected).
+        Raw values are converted once per distinct value.
+        """
+        name = self.name
+        checks = list(self.value_checks)
+        known = references.get(self.references) if self.references else None
+        if known is not None:
+            checks.append((f"is unknown ({self.references})", known.__contains__))
+        if not checks and not self.bound_checks and self.type != 'float' and (converted or self.type == 'str'):
+            # Only presence to check; failed conversions were rejected while reading.
+            # Falsy values (such as '' or None) are rare, and all() finds none cheaply
+            if self.required and self.type == 'str' and not all(values):
+                for index in compress(count(), map(operator.not_, values)):
+                    if values[index] == '' or (not converted and values[index] is None):
+                        reject(index, f"{name}: missing")
+            return
+
+        try:
+            distinct = set(values)
+            hashable = True
+        except TypeError:
+            distinct, hashable = set(), False
+            for index, value in enumerate(values):
+                try:
+                    distinct.add(value)
+                except TypeError:
+                    reject(index, f"{name}: invalid {self.type} {value!r}")
+
+        def positions(found: set) -> Iterable[int]:
+            """Indexes of the rows whose value is in `found`"""
+            if hashable:
+                return compress(count(), map(found.__contains__, values))
+            return (index for index, value in enumerate(values) if _contains(found, value))
+
+        if converted:
+            distinct.discard(None)
+            missing = {''} & distinct if self.type == 'str' else set()
+        else:
+            missing = {value for value in (None, '') if value in distinct}
+        if missing:
+            distinct -= missing
+            if self.required:
+                for index in positions(missing):
+                    reject(index, f"{name}: missing")
+
+        if not converted and (self.type != 'str' or checks):
+            typed_of, invalid = {}, set()
+            for value in distinct:
+                try:
+                    typed_of[value] = self.convert(value)
+                except _CONVERSION_ERRORS:
+                    invalid.add(value)
+            for index in positions(invalid) if invalid else ():
+                reject(index, f"{name}: invalid {self.type} {values[index]!r}")
+            distinct = set(typed_of.values())
+
+        failures = []  # (reason, failing typed values)
+        for reason, accepts in checks:
+            bad = {value for value in distinct if not accepts(value)}
+            if bad:
+                failures.append((reason, bad))
+        if self.type == 'float' and distinct and not math.isfinite(sum(distinct)):
+            bad = {value for value in distinct if not math.isfinite(value)}
+            failures.append(("is not a finite number", bad))
+            distinct -= bad
+        for reason, extreme, fails in self.bound_checks:
+            if distinct and fails(extreme(distinct)):
+                failures.append((reason, {value for value in distinct if fails(value)}))
+
+        for reason, bad in failures:
+            if converted:
+                for index in positions(bad):
+                    reject(index, f"{name}: {self.show(values[index])} {reason}")
+            else:
+                for index in positions({value for value, typed in typed_of.items() if typed in bad}):
+                    reject(index, f"{name}: {values[index]!r} {reason}")
+
+
+class Schema:
+    """Compiled schema of one input file; pickles as its declaration so worker processes can use it"""
+
+    def __init__(self, name: str, spec: Dict):
+        self.name = name
+        self.spec = spec
+        self.records_key = spec.get('records')
+        self.columns = [Column(column, column_spec) for column, column_spec in spec['columns'].items()]
+        self.by_name = {column.name: column for column in self.columns}
+        self.names = [column.name for column in self.columns]
+        self.checked = [column.name for column in self.columns if not column.checks_nothing]
+        self.types = {column.name: column.type for column in self.columns}
+
+    def __reduce__(self):
+        return Schema, (self.name, self.spec)
+
+    def validate(self, columns: Dict[str, List], references: Optional[Dict] = None, converted=(),
+                 rejects: Optional[Dict[int, List[str]]] = None, names: Optional[Iterable[str]] = None
+                 ) -> Dict[int, List[str]]:
+        """
+        Validate columns of equal length (those in `names`, by default all
+        of `checked`); those named in `converted` already hold typed values.
+        Returns the reasons per rejected row index, added to `rejects` if given.
+        """
+        rejects = {} if rejects is None else rejects
+
+        def reject(index: int, reason: str) -> None:
+            rejects.setdefault(index, []).append(reason)
+
+        for name in self.checked if names is None else names:
+            self.by_name[name].validate(columns[name], reject, references or {}, name in converted)
+        return rejects
+
+    def typed_records(self, records: List, rejects: Dict[int, List[str]] = None) -> List[Dict]:
+        """
+        Copies of the records (but those in `rejects`) holding the typed values
+        of the declared columns, as the CSV reader returns them; missing
+        values are left as they are. Raises ValueError for a value that does
+        not convert.
+        """
+        rejects = rejects or {}
+        converters = [(column.name, column.convert) for column in self.columns]
+        typed = []
+        for index, record in enumerate(records):
+            if index in rejects:
+                continue
+            if not isinstance(record, dict):
+                raise ValueError(f"{self.name}: record {index + 1} is not an object")
+            record = dict(record)
+            for name, convert in converters:
+                value = record.get(name)
+                if _is_missing(value):
+                    continue
+                try:
+                    record[name] = convert(value)
+                except _CONVERSION_ERRORS:
+                    raise ValueError(f"{self.name}: record {index + 1}: invalid {self.types[name]} {value!r}") from None
+            typed.append(record)
+        return typed
+
+    def validate_records(self, records: List, references: Optional[Dict] = None) -> Tuple[List, List[List]]:
+        """
+        Validate JSON records; returns the accepted records with typed column
+        values and quarantine rows for the rejected ones
+        """
+        columns = {name: [record.get(name) if isinstance(record, dict) else None for record in records]
+                   for name in self.names}
+        rejects = self.validate(columns, references)
+        accepted = self.typed_records(records, rejects)
+        rejected = [[index + 1, "; ".join(reasons)] + [columns[name][index] for name in self.names]
+                    for index, reasons in sorted(rejects.items())]
+        return accepted, rejected
+
+
+def load_schemas(path=None) -> Dict[str, Schema]:
+    """Compile the declared schemas once per process, keyed by input file name"""
+    global _schemas
+    with _schemas_lock:
+        if _schemas is None or path is not None:
+            with open(path or settings.INPUT_SCHEMAS_FILE, 'r') as f:
+                declared = json.load(f)
+            _schemas = {name: Schema(name, spec) for name, spec in declared.items()}
+        return _schemas
+
+
+def schema_for(path) -> Optional[Schema]:
+    """The schema declared for an input file (by file name), or None when validation is off"""
+    if not settings.INPUT_VALIDATION_ENABLED:
+        return None
+    return load_schemas().get(Path(path).name)
+
+
+class Quarantine:
+    """
+    Collects the rejected rows of one input file. close() writes them to the
+    quarantine file (or removes a stale one) unless `persist` is False, e.g.
+    when only part of the file was read.
+    """
+
+    def __init__(self, source, schema: Optional[Schema] = None, persist: bool = True):
+        self.source = Path(source)
+        self.schema = schema or schema_for(source)
+        self.persist = persist
+        self.rows = 0
+        self.rejected: List[List] = []
+
+    @property
+    def path(self) -> Path:
+        return Path(settings.QUARANTINE_DIR) / f"{self.source.name}.rejected.csv"
+
+    def add(self, rows: int, rejected: List[List]) -> None:
+        self.rows += rows
+        self.rejected.extend(rejected)
+
+    def close(self) -> None:
+        if self.schema is None:
+            return
+        if self.persist:
+            with _stats_lock:
+                _stats[self.source.name] = {'rows': self.rows, 'rejected': len(self.rejected),
+                                            'quarantine': str(self.path) if self.rejected else None}
+            if self.rejected:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with atomic_write(self.path, newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['ROW', 'REASONS'] + self.schema.names)
+                    writer.writerows(sorted(self.rejected, key=lambda row: row[0]))
+            elif self.path.exists():
+                self.path.unlink()
+        else:
+            with _stats_lock:
+                entry = _partial.setdefault(self.source.name, {'rows': 0, 'rejected': []})
+                entry['rows'] += self.rows
+                entry['rejected'].extend(self.rejected)
+        if self.rejected:
+            where = f", see {self.path}" if self.persist else ""
+            logger.warning(f"{self.source.name}: rejected {len(self.rejected)} of {self.rows} rows{where}")
+
+
+def read_json_records(path, references: Optional[Dict] = None, persist: bool = True) -> List:
+    """
+    Load the records of a JSON input file with the declared column types,
+    quarantining those that fail its schema. With validation off the values
+    are still converted, and one that does not convert raises ValueError.
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    schema = load_schemas().get(Path(path).name)
+    if schema is None:
+        return data['records'] if isinstance(data, dict) and 'records' in data else data
+    records = data[schema.records_key] if schema.records_key else data
+    if not settings.INPUT_VALIDATION_ENABLED:
+        return schema.typed_records(records)
+    quarantine = Quarantine(path, schema, persist)
+    accepted, rejected = schema.validate_records(records, references)
+    quarantine.add(len(records), rejected)
+    quarantine.close()
+    return accepted
+
+
+def _customer_ids(columns: Dict) -> set:
+    return set(columns['CUSTOMER_ID'])
+
+
+def _union(first: set, second: set) -> set:
+    first |= second
+    return first
+
+
+def known_customers(path=None, persist: bool = False) -> frozenset:
+    """Valid customer IDs of the customer list, for "references": "customers" checks"""
+    path = path or settings.CUSTOMER_LIST_FILE
+    quarantine = Quarantine(path, persist=persist)
+    return frozenset(parse_csv(path, {'CUSTOMER_ID': 'str'}, _customer_ids, _union, quarantine=quarantine))
+
+
+def validation_report() -> Dict[str, Dict]:
+    """Rows read and rejected per validated input file in this process"""
+    with _stats_lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
+
+
+def take_partial_rejections() -> Dict[str, Dict]:
+    """
+    Rows read and rejected rows ({'rows', 'rejected'}) per input file of the
+    partial reads since the last call, e.g. for a cluster shard to return
+    so the coordinator can write the complete quarantine file.
+    """
+    global _partial
+    with _stats_lock:
+        taken, _partial = _partial, {}
+    return taken
@@ -0,0 +1,235 @@
+"""
+Output Serialization
+====================
+Shared writer and reader for every JSON artifact the agents exchange.
+
+Formats (settings.OUTPUT_FORMAT):
+    json     - pretty-printed JSON, the historical layout (default)
+    compact  - single-line JSON without whitespace
+    ndjson   - one record per line, streamed record by record
+
+Compression (settings.OUTPUT_COMPRESSION):
+    none | gzip | zstd   ('.gz' / '.zst' is appended to the file name;
+                          zstd needs the optional `zstandard` package)
+
+All writes go to a temp file in the target directory and are renamed into
+place, so a crash never leaves a half-written output behind. Readers detect
+compression and format from the file contents, so any stage can consume the
+output of any other regardless of how it was written.
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+from config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMATS = ('json', 'compact', 'ndjson')
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_COMPACT_SEPARATORS = (',', ':')
+
+logger = logging.getLogger("OutputSerialization")
+
+# Read once: os.umask can only be queried by setting it, which is not safe while
+# other threads create files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _target_mode(path: Path) -> int:
+    """Permissions of the existing `path`, or the umask default for a new file"""
+    try:
+        return path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+@contextmanager
+def atomic_write(path, binary: bool = False, newline: Optional[str] = None):
+    """Yield a file handle on a temp file that replaces `path` only on success"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        if binary:
+            f = os.fdopen(fd, 'wb')
+        else:
+            f = os.fdopen(fd, 'w', newline=newline, encoding='utf-8')
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file 0600; give it the mode a plain open() would
+        os.chmod(tmp_path, _target_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class OutputWriter:
+    """Writes agent outputs in the configured format and compression"""
+
+    def __init__(self, fmt: Optional[str] = None, compression: Optional[str] = None):
+        self.fmt = (fmt or settings.OUTPUT_FORMAT).lower()
+        self.compression = (compression or settings.OUTPUT_COMPRESSION or 'none').lower()
+        if self.fmt not in FORMATS:
+            raise ValueError(f"Unsupported output format '{self.fmt}'. Expected one of {FORMATS}.")
+        if self.compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported output compression '{self.compression}'. "
+                             f"Expected one of {tuple(COMPRESSION_SUFFIXES)}.")
+        if self.compression == 'zstd' and zstandard is None:
+            logger.warning("zstandard is not installed; falling back to gzip compression.")
+            self.compression = 'gzip'
+
+    def output_path(self, path) -> Path:
+        """The file name actually written for `path` (compression adds a suffix)"""
+        return Path(f"{path}{COMPRESSION_SUFFIXES[self.compression]}")
+
+    @contextmanager
+    def _open(self, path):
+        with atomic_write(path, binary=True) as raw:
+            if self.compression == 'gzip':
+                stream = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0)
+            elif self.compression == 'zstd':
+                stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+            else:
+                stream = raw
+            text = io.TextIOWrapper(stream, encoding='utf-8')
+            yield text
+            text.flush()
+            if stream is raw:
+                text.detach()
+            else:
+                # Closing the compressor writes its trailer; the raw file stays open
+                text.close()
+
+    def write(self, path, data, indent: int = 4) -> Path:
+        """
+        Write a list of records or a single document. `indent` only applies to
+        the pretty 'json' format. Returns the path that was written.
+        """
+        target = self.output_path(path)
+        with self._open(target) as f:
+            if self.fmt == 'ndjson':
+                records = data if isinstance(data, list) else [data]
+                for record in records:
+                    f.write(json.dumps(record, separators=_COMPACT_SEPARATORS))
+                    f.write('\n')
+            elif self.fmt == 'compact':
+                json.dump(data, f, separators=_COMPACT_SEPARATORS)
+            else:
+                json.dump(data, f, indent=indent)
+        return target
+
+    def write_records(self, path, records: Iterable[Dict], indent: int = 4) -> Path:
+        """Stream records from an iterable; only NDJSON avoids materializing them"""
+        if self.fmt != 'ndjson':
+            return self.write(path, list(records), indent=indent)
+        target = self.output_path(path)
+        with self._open(target) as f:
+            for record in records:
+                f.write(json.dumps(record, separators=_COMPACT_SEPARATORS))
+                f.write('\n')
+        return target
+
+
+def write_csv(path, fieldnames: List[str], rows: Iterable[Dict]) -> Path:
+    """Atomically write rows to a plain CSV file"""
+    with atomic_write(path, newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    return Path(path)
+
+
+def resolve_output_path(path) -> Path:
+    """
+    Find the file that holds the output for `path`, trying the currently
+    configured compression first and then any other known suffix.
+    """
+    configured = OutputWriter().output_path(path)
+    candidates = [configured] + [Path(f"{path}{suffix}") for suffix in COMPRESSION_SUFFIXES.values()]
+    for candidate in candidates:
+        if candidate.exists():
+            return candidate
+    return configured
+
+
+@contextmanager
+def _open_for_read(path):
+    with open(path, 'rb') as raw:
+        magic = raw.read(4)
+        raw.seek(0)
+        if magic.startswith(_GZIP_MAGIC):
+            stream = gzip.GzipFile(fileobj=raw, mode='rb')
+        elif magic == _ZSTD_MAGIC:
+            if zstandard is None:
+                raise ImportError(f"{path} is zstd-compressed but the zstandard package is not installed.")
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            stream = raw
+        yield io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def _iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_records(path) -> List[Dict]:
+    """Read a list of records written in any supported format"""
+    return list(iter_records(path))
+
+
+def iter_records(path) -> Iterator[Dict]:
+    """Iterate the records of `path`; NDJSON is streamed, JSON arrays are loaded whole"""
+    path = resolve_output_path(path)
+    with _open_for_read(path) as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if not head:
+            return
+        if head == '[':
+            yield from json.loads(head + f.read())
+            return
+        yield json.loads(head + f.readline())
+        yield from _iter_ndjson(f)
+
+
+def read_document(path):
+    """Read a single JSON document (e.g. the unified log) written in any supported format"""
+    path = resolve_output_path(path)
+    with _open_for_read(path) as f:
+        text = f.read()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        return records[0] if len(records) == 1 else records
+
+
+def upsert_records(existing: List[Dict], updates: Iterable[Dict], key: str = 'customer_id') -> List[Dict]:
+    """Replace records of `existing` that share `key` with `updates`, keeping order; new keys are appended"""
+    updates = {record[key]: record for record in updates}
+    merged = [updates.pop(record.get(key), record) for record in existing]
+    return merged + list(updates.values())
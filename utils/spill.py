@@ -0,0 +1,235 @@
+"""
+Memory-Budget Aggregation
+=========================
+Per-customer aggregation that spills to disk when the process exceeds a
+memory budget (settings.MEMORY_BUDGET_MB; 0 disables the budget).
+
+SpillingAggregator keeps partial aggregates in a dict. Every
+settings.SPILL_CHECK_EVERY additions it samples the process RSS; once the
+budget is exceeded, the dict is written to a key-sorted run file and
+cleared, and from then on it spills whenever it holds as many keys as it
+did at that point. items() merges the run files and the in-memory
+remainder externally (k-way, by key) and combines equal keys in the order
+they were added, so the result does not depend on when spills happened.
+
+memory_report() returns the configured budget, the peak RSS of the process
+and per-aggregator spill counts for the run report.
+"""
+
+import heapq
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from config import settings
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("MemoryBudget")
+
+# Maximum number of run files merged at once; more runs are merged in passes
+MAX_MERGE_FAN_IN = 64
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None if it cannot be measured"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    return None
+
+
+class MemoryBudget:
+    """Process-wide RSS limit shared by all aggregators"""
+
+    def __init__(self, limit_mb: Optional[float] = None):
+        self.limit_mb = settings.MEMORY_BUDGET_MB if limit_mb is None else limit_mb
+        self.limit_bytes = int(self.limit_mb * 1024 * 1024)
+        if self.enabled and current_rss_bytes() is None:
+            logger.warning("Process memory cannot be measured on this platform (install psutil); "
+                           "the memory budget is ignored.")
+            self.limit_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit_bytes > 0
+
+    def rss(self) -> int:
+        return current_rss_bytes() or 0
+
+
+def _record_stats(name: str, **counts) -> None:
+    with _stats_lock:
+        entry = _stats.setdefault(name, {'spills': 0, 'spilled_records': 0, 'merge_passes': 0})
+        for key, value in counts.items():
+            entry[key] += value
+
+
+def memory_report() -> Dict[str, Any]:
+    """Configured budget, peak RSS and spill statistics of this process"""
+    peak = peak_rss_bytes()
+    with _stats_lock:
+        spilling = {name: dict(entry) for name, entry in _stats.items()}
+    return {
+        'budget_mb': settings.MEMORY_BUDGET_MB or None,
+        'peak_rss_mb': round(peak / (1024 * 1024), 1) if peak else None,
+        'spilling': spilling,
+    }
+
+
+def _read_run(path: Path) -> Iterator[Tuple[Any, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            key, value = json.loads(line)
+            yield key, value
+
+
+def _write_run(path: Path, items) -> int:
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for key, value in items:
+            f.write(json.dumps([key, value], separators=(',', ':')))
+            f.write('\n')
+            count += 1
+    return count
+
+
+class SpillingAggregator:
+    """
+    Dict of partial aggregates bounded by a MemoryBudget.
+    `combine(earlier, later)` merges two partials for the same key. Keys must
+    be mutually comparable (e.g. all str); values must survive a JSON round
+    trip (numbers, strings, lists, dicts).
+    """
+
+    def __init__(self, name: str, combine: Callable[[Any, Any], Any], budget: MemoryBudget,
+                 check_every: Optional[int] = None, spill_dir=None):
+        self.name = name
+        self.combine = combine
+        self.budget = budget
+        self.check_every = check_every or settings.SPILL_CHECK_EVERY
+        self.spill_dir = Path(spill_dir or settings.SPILL_DIR)
+        self.data: Dict[Any, Any] = {}
+        self.runs: List[Path] = []
+        self.merges = 0
+        self.capacity: Optional[int] = None
+        self.rss_after_spill = 0
+        self.additions = 0
+        self.workdir: Optional[Path] = None
+
+    def add(self, key, value) -> None:
+        data = self.data
+        if key in data:
+            data[key] = self.combine(data[key], value)
+        else:
+            data[key] = value
+            if self.capacity is not None and len(data) >= self.capacity:
+                self.spill()
+        self.additions += 1
+        if self.budget.enabled and self.additions % self.check_every == 0:
+            self._check_budget()
+
+    def update(self, partials: Dict) -> None:
+        for key, value in partials.items():
+            self.add(key, value)
+
+    def _check_budget(self) -> None:
+        rss = self.budget.rss()
+        # Memory freed by a spill is reused by the next entries rather than returned
+        # to the OS, so only growth beyond the post-spill level counts
+        if rss > self.budget.limit_bytes and rss > self.rss_after_spill and self.data:
+            self.capacity = len(self.data) if self.capacity is None else min(self.capacity, len(self.data))
+            self.spill()
+
+    def spill(self) -> None:
+        if not self.data:
+            return
+        if self.workdir is None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self.workdir = Path(tempfile.mkdtemp(prefix=f"{self.name}.", dir=self.spill_dir))
+        path = self.workdir / f"run-{len(self.runs):05d}.jsonl"
+        count = _write_run(path, sorted(self.data.items()))
+        self.runs.append(path)
+        self.data = {}
+        self.rss_after_spill = self.budget.rss()
+        _record_stats(self.name, spills=1, spilled_records=count)
+        logger.info(f"{self.name}: spilled {count} partial aggregates to {path.name} "
+                    f"(budget {self.budget.limit_mb} MB, RSS {self.rss_after_spill / (1024 * 1024):.0f} MB)")
+
+    def _merge(self, sources) -> Iterator[Tuple[Any, Any]]:
+        """Merge key-sorted sources, combining equal keys in source order"""
+        merged = heapq.merge(*sources, key=lambda item: item[0])
+        current_key, current_value, started = None, None, False
+        for key, value in merged:
+            if started and key == current_key:
+                current_value = self.combine(current_value, value)
+            else:
+                if started:
+                    yield current_key, current_value
+                current_key, current_value, started = key, value, True
+        if started:
+            yield current_key, current_value
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        """All (key, aggregate) pairs in key order"""
+        if not self.runs:
+            yield from sorted(self.data.items())
+            return
+        while len(self.runs) > MAX_MERGE_FAN_IN:
+            merged_runs = []
+            for start in range(0, len(self.runs), MAX_MERGE_FAN_IN):
+                group = self.runs[start:start + MAX_MERGE_FAN_IN]
+                path = self.workdir / f"merge-{self.merges:05d}.jsonl"
+                self.merges += 1
+                _write_run(path, self._merge([_read_run(run) for run in group]))
+                for run in group:
+                    run.unlink()
+                merged_runs.append(path)
+            # The grouped runs are gone; later calls read the merged runs
+            self.runs = merged_runs
+            _record_stats(self.name, merge_passes=1)
+        yield from self._merge([_read_run(run) for run in self.runs] + [iter(sorted(self.data.items()))])
+
+    def close(self) -> None:
+        """Remove the run files"""
+        if self.workdir is not None:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
+        self.runs = []
+        self.data = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()